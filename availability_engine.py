@@ -0,0 +1,366 @@
+import heapq
+import numpy as np
+
+from node_behavior import RollingBehaviorProfile
+from online_schedule import OnlineSchedule
+
+SEEK_DRAWS = 512    # a per-node probe seek costs about as much as this many bulk draws
+COUNTER_WINDOW = 64  # ticks of counter draws hashed per call when scanning one node
+
+class AvailabilityEngine:
+    """
+    Computes the online status of every node for a tick in one pass.
+
+    mode="vectorized" keeps the rolling profile parameters as NumPy arrays and
+    draws the daylight coin flips for all nodes from one seeded generator.
+    mode="reference" walks the nodes and calls `is_online` per node, which
+    reproduces the original main-loop results draw for draw.
+    mode="precomputed" draws the daylight coins for a window of ticks up
+    front into an OnlineSchedule bitset, so any tick's status in the window
+    is a lookup; the window is as long as `config.schedule_memory_mb` allows
+    and rolls forward with the run. It matches the vectorized mode draw for
+    draw.
+    """
+
+    MODES = ("vectorized", "reference", "precomputed")
+
+    def __init__(self, config, nodes, mode="vectorized"):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown availability mode: {mode}")
+
+        self.config = config
+        self.nodes = nodes  # NodeStore; its arrays are shared, not copied
+        self.mode = mode
+        self.index = nodes.position
+
+        count = len(nodes)
+        self._bind_store_views()
+
+        # -1 marks nodes without a timezone (no daylight draw)
+        self.has_timezone = self.timezone_offset >= 0
+
+        # The per-node loop keeps one profile object per node
+        self.profiles = [node.behavior_profile_instance for node in nodes] if mode == "reference" else None
+
+        self.daylight_curve = np.asarray(config.daylight_curve, dtype=np.float64)
+        self.rng = np.random.default_rng(config.child_rng("availability").getrandbits(64))
+
+        # Tick t always consumes draws [t*N, (t+1)*N) of the stream, so a second
+        # generator can seek to any tick's draws without replaying the ones before.
+        self.probe = np.random.Generator(np.random.PCG64())
+        self.probe.bit_generator.state = self.rng.bit_generator.state
+        self.probe_position = 0
+
+        # Counter-based daylight draws (config.random_streams == "counter") are a
+        # function of (node, tick); every path reads them directly, in any order
+        self.counter = nodes.daylight_stream
+
+        # The bitset covers a window of ticks sized to schedule_memory_mb and is
+        # rebuilt from the probe when a run moves past it
+        self.schedule = None
+        if mode == "precomputed":
+            self.schedule_ticks = OnlineSchedule.window_ticks(count, config.schedule_memory_mb)
+            self.schedule = self._build_schedule(0)
+
+        self.online = nodes.online[:count].copy()
+        self.was_online = np.zeros(count, dtype=bool)
+        self.came_online = np.zeros(count, dtype=bool)
+        self.went_offline = np.zeros(count, dtype=bool)
+
+        nodes.was_online_last_tick[:] = False
+
+        # Rolling-cycle status alone, kept current by per-node flip events for
+        # `sync`; built on its first call, so tick runs never pay for it
+        self.base_online = None
+        self.base_flips = None  # min-heap of (next cycle flip tick, node index)
+
+        self.connected_count = int(np.count_nonzero(self.online & self.has_joined))
+
+    # NodeStore columns read and written in place through views of the first
+    # len(nodes) rows. 0 in force_offline_until means "not forced offline",
+    # same as the falsy check in is_online.
+    STORE_VIEWS = ("cycle_length", "uptime_ticks", "offset", "timezone_offset",
+                   "force_offline_until", "has_joined")
+
+    def _bind_store_views(self):
+        count = len(self.nodes)
+        for name in self.STORE_VIEWS:
+            setattr(self, name, getattr(self.nodes, name)[:count])
+
+    def __getstate__(self):
+        # A pickled view would come back as a copy detached from the store
+        state = self.__dict__.copy()
+        for name in self.STORE_VIEWS:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bind_store_views()
+
+    def _build_schedule(self, start):
+        stop = min(start + self.schedule_ticks, max(start + 1, self.config.total_ticks))
+        return OnlineSchedule(
+            self.cycle_length, self.uptime_ticks, self.offset, self.timezone_offset,
+            self.daylight_curve, self.draws_between, start, stop,
+        )
+
+    def _schedule_at(self, tick):
+        """The precomputed window holding `tick`, built anew once the run passes the current one."""
+        schedule = self.schedule
+        if schedule is None:
+            return None
+        if tick >= schedule.stop and tick < self.config.total_ticks:
+            schedule = self.schedule = self._build_schedule(tick)
+        return schedule if schedule.covers(tick) else None
+
+    def set_force_offline(self, indices, until):
+        """Mirror a blackout override (None clears it) into the engine arrays."""
+        self.force_offline_until[indices] = until or 0
+
+    def compute_online(self, tick, draws=None):
+        """Return the online mask for `tick` without touching engine state."""
+        schedule = self._schedule_at(tick) if draws is None else None
+        if schedule is not None:
+            return schedule.online_mask(tick, self.force_offline_until)
+
+        base_online = (tick + self.offset) % self.cycle_length < self.uptime_ticks
+        forced = tick < self.force_offline_until
+
+        local_time = (tick + self.timezone_offset) % 86400
+        daylight = self.daylight_curve[local_time]
+        if draws is None:
+            sequential = self.schedule is None and self.counter is None
+            draws = self.rng.random(len(self.nodes)) if sequential else self.draws_at(tick)
+        lit = ~self.has_timezone | (draws < daylight)
+
+        return base_online & ~forced & lit
+
+    def _seek(self, tick, index=0):
+        target = tick * len(self.nodes) + index
+        self.probe.bit_generator.advance((target - self.probe_position) % 2**128)
+        self.probe_position = target
+
+    def _draw(self, i, tick):
+        if self.counter is not None:
+            return self.counter.uniform(i, tick)
+        self._seek(tick, i)
+        self.probe_position += 1
+        return self.probe.random()
+
+    def draws_between(self, start, stop):
+        """The (stop - start, N) daylight draws of ticks [start, stop), read like `draws_at`."""
+        count = len(self.nodes)
+        if self.counter is not None:
+            return self.counter.uniform(np.arange(count), np.arange(start, stop)[:, None])
+        self._seek(start)
+        self.probe_position += (stop - start) * count
+        return self.probe.random((stop - start, count))
+
+    def draws_at(self, tick):
+        """The daylight draws `step(tick)` uses, read without replaying earlier ticks."""
+        if self.counter is not None:
+            return self.counter.uniform(np.arange(len(self.nodes)), tick)
+        self._seek(tick)
+        self.probe_position += len(self.nodes)
+        return self.probe.random(len(self.nodes))
+
+    def first_online(self, i, start, stop):
+        """
+        First tick in [start, stop) at which node `i` is online under the
+        current force-offline overrides, or None. Offline stretches of the
+        rolling cycle are skipped whole; inside them it probes one draw per tick,
+        hashes a window of counter draws, or scans the precomputed bitset.
+        """
+        schedule = self.schedule
+        if schedule is not None and schedule.covers(start):
+            hit = schedule.first_online(i, start, stop, int(self.force_offline_until[i]))
+            if hit is not None or stop <= schedule.stop:
+                return hit
+            start = schedule.stop
+
+        cycle = int(self.cycle_length[i])
+        uptime = int(self.uptime_ticks[i])
+        offset = int(self.offset[i])
+        timezone_offset = int(self.timezone_offset[i])
+
+        tick = max(start, int(self.force_offline_until[i]))
+        while tick < stop:
+            position = (tick + offset) % cycle
+            if position >= uptime:
+                tick += cycle - position
+                continue
+
+            if timezone_offset < 0:
+                return tick
+
+            if self.counter is not None:
+                # Counter draws hash a window of ticks in one array call
+                ticks = np.arange(tick, min(stop, tick + uptime - position, tick + COUNTER_WINDOW))
+                daylight = self.daylight_curve[(ticks + timezone_offset) % 86400]
+                hits = np.flatnonzero(self.counter.uniform(np.array([i]), ticks) < daylight)
+                if len(hits):
+                    return tick + int(hits[0])
+                tick += len(ticks)
+                continue
+
+            if self._draw(i, tick) < self.daylight_curve[(tick + timezone_offset) % 86400]:
+                return tick
+            tick += 1
+
+        return None
+
+    def online_of(self, indices, tick):
+        """
+        Online status at `tick` of the nodes at `indices`, without touching
+        engine state. Daylight draws are read only for nodes inside their
+        rolling-cycle uptime: seeked one by one for a few nodes, or as the
+        tick's whole block of draws for many.
+        """
+        online = (tick + self.offset[indices]) % self.cycle_length[indices] < self.uptime_ticks[indices]
+        online &= tick >= self.force_offline_until[indices]
+        coin = online & self.has_timezone[indices]
+        if not coin.any():
+            return online
+
+        at = indices[coin]
+        schedule = self._schedule_at(tick)
+        if schedule is not None:
+            online[coin] = schedule.lit_of(at, tick)
+            return online
+        if self.counter is not None:
+            draws = self.counter.uniform(at, tick)
+        elif len(at) * SEEK_DRAWS < len(self.nodes):
+            draws = np.array([self._draw(int(i), tick) for i in at])
+        else:
+            draws = self.draws_at(tick)[at]
+        online[coin] = draws < self.daylight_curve[(tick + self.timezone_offset[at]) % 86400]
+        return online
+
+    def _advance_base(self, tick):
+        """Bring `base_online` to `tick` by popping the rolling-cycle flips due by then."""
+        if self.base_flips is None:
+            position = (tick + self.offset) % self.cycle_length
+            self.base_online = position < self.uptime_ticks
+            # RollingBehaviorProfile.next_transition for every node at once
+            cycling = np.flatnonzero((self.uptime_ticks > 0) & (self.uptime_ticks < self.cycle_length))
+            flip = tick + np.where(self.base_online, self.uptime_ticks - position, self.cycle_length - position)
+            self.base_flips = list(zip(flip[cycling].tolist(), cycling.tolist()))
+            heapq.heapify(self.base_flips)
+            return
+
+        flips = self.base_flips
+        while flips and flips[0][0] <= tick:
+            i = heapq.heappop(flips)[1]
+            cycle = RollingBehaviorProfile(int(self.cycle_length[i]), int(self.uptime_ticks[i]), int(self.offset[i]))
+            self.base_online[i] = cycle.is_online(tick)
+            heapq.heappush(flips, (cycle.next_transition(tick), i))
+
+    def _update(self, indices, online):
+        changed = online != self.online[indices]
+        self.online[indices] = online
+        self.nodes.online[indices] = online
+        return indices[changed & online], indices[changed & ~online]
+
+    def sync(self, tick):
+        """
+        Jump every SimNode view straight to `tick`, for event-driven runs that
+        skip ticks. Joins are left to `join`. Returns the indices that flipped
+        since each node was last synced, as (came_online, went_offline).
+
+        Only nodes inside their rolling-cycle uptime or still marked online
+        are evaluated; every other node is offline and stays so.
+        """
+        self._advance_base(tick)
+        indices = np.flatnonzero(self.base_online | self.online)
+        came_online, went_offline = self._update(indices, self.online_of(indices, tick))
+        self.connected_count = int(np.count_nonzero(self.online & self.has_joined))
+        return came_online, went_offline
+
+    def sync_nodes(self, indices, tick):
+        """`sync` for the nodes at `indices` (ascending) alone; the rest keep their last synced status."""
+        indices = np.asarray(indices, dtype=np.int64)
+        came_online, went_offline = self._update(indices, self.online_of(indices, tick))
+        joined = self.has_joined
+        self.connected_count += int(np.count_nonzero(joined[came_online]) - np.count_nonzero(joined[went_offline]))
+        return came_online, went_offline
+
+    def join(self, i, tick):
+        """Join node `i` at `tick`, as `step` does on a node's first online tick."""
+        node = self.nodes[i]
+        node.attempt_join(tick)
+        node.last_bootstrap_tick = tick
+
+        self.has_joined[i] = True
+        if self.online[i]:
+            self.connected_count += 1
+
+    def step(self, tick):
+        """
+        Advance every node to `tick`. Returns the indices of nodes whose
+        online status flipped, as (came_online, went_offline), in node order.
+        """
+        if self.mode == "reference":
+            return self._step_reference(tick)
+
+        online = self.compute_online(tick)
+        np.greater(online, self.was_online, out=self.came_online)
+        np.less(online, self.was_online, out=self.went_offline)
+
+        # On the first tick the generator's initial status can differ from both
+        changed = online ^ self.online
+        self.online = online
+        store = self.nodes
+        store.online[:len(online)] = online
+        store.was_online_last_tick[:len(online)] = online
+
+        for i in np.flatnonzero(online & ~self.has_joined):
+            node = store[i]
+            node.attempt_join(tick)
+            node.last_bootstrap_tick = tick
+
+        self.has_joined |= online
+        self.connected_count += int(
+            np.count_nonzero(self.came_online & self.has_joined)
+            - np.count_nonzero(self.went_offline & self.has_joined)
+        )
+        self.was_online = online
+        return np.flatnonzero(changed & online), np.flatnonzero(changed & ~online)
+
+    def _step_reference(self, tick):
+        came_online = []
+        went_offline = []
+
+        # Bookkeeping runs on plain lists; only flips are written to the store
+        # before attempt_join, which reads the node's online state
+        store = self.nodes
+        online = store.online[:len(store)].tolist()
+        was_online = store.was_online_last_tick[:len(store)].tolist()
+        has_joined = self.has_joined.tolist()
+
+        for i, node in enumerate(store):
+            previous = online[i]
+            online[i] = now = self.profiles[i].is_online(tick, node)
+            if now != previous:
+                store.online[i] = now
+
+            if not has_joined[i] and now:
+                node.attempt_join(tick)
+                node.last_bootstrap_tick = tick
+                has_joined[i] = True
+
+            came = now and not was_online[i]
+            went = not now and was_online[i]
+
+            if came and has_joined[i]:
+                self.connected_count += 1
+            elif went and has_joined[i]:
+                self.connected_count -= 1
+
+            if now != previous:
+                (came_online if now else went_offline).append(i)
+
+        self.online[:] = online
+        store.was_online_last_tick[:len(store)] = online
+        self.was_online[:] = self.online
+        return came_online, went_offline
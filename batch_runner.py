@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import math
+import argparse
+import contextlib
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+
+from simulation import Simulation
+
+def run_seed(seed, overrides=None, engine="tick", availability_mode="vectorized", blackout=False):
+    """
+    Run one seed headless and return its summary as a flat record:
+    {"seed": ..., "upload_<metric>": ..., "download_<metric>": ...}.
+    """
+    # Per-event prints would interleave across workers; only the record is kept
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        sim = Simulation.from_seed(seed, overrides, engine=engine,
+                                   availability_mode=availability_mode, blackout=blackout)
+        sim.run()
+        sim.nal.close()
+
+    record = {"seed": seed}
+    for section, metrics in sim.summary().items():
+        for key, value in metrics.items():
+            record[f"{section}_{key}"] = value
+    return record
+
+def run_batch(seeds, overrides=None, processes=None, **kwargs):
+    """
+    Run every seed across a process pool (all cores by default) and return
+    the records in seed order. Each run seeds itself from its own seed, so a
+    record does not depend on the worker or the pool size.
+    """
+    seeds = list(seeds)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_seed, seed, overrides, **kwargs) for seed in seeds]
+        return [future.result() for future in futures]
+
+SMALL_DF = 10  # the expansion degrades at small df (11% low at df=1); up to this df, invert the exact CDF
+
+def _t_central(t, df):
+    """P(|T| < t) for integer df: the closed-form series of Abramowitz & Stegun 26.7.3-4."""
+    theta = math.atan(t / math.sqrt(df))
+    c2 = math.cos(theta) ** 2
+    if df % 2 == 0:
+        term = total = 1.0
+        for k in range(2, df, 2):
+            term *= c2 * (k - 1) / k
+            total += term
+        return math.sin(theta) * total
+    if df == 1:
+        return 2 * theta / math.pi
+    term = total = 1.0
+    for k in range(3, df, 2):
+        term *= c2 * (k - 1) / k
+        total += term
+    return 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * total)
+
+def _t_quantile(p, df):
+    """
+    Student-t quantile. Small df bisect the exact CDF; larger df use the
+    Cornish-Fisher expansion of the normal quantile.
+    """
+    if df <= SMALL_DF:
+        target = abs(2 * p - 1)
+        lo, hi = 0.0, 1.0
+        while _t_central(hi, df) < target:
+            hi *= 2
+        for _ in range(100):
+            mid = (lo + hi) / 2
+            if _t_central(mid, df) < target:
+                lo = mid
+            else:
+                hi = mid
+        return math.copysign((lo + hi) / 2, p - 0.5)
+
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+def aggregate(records, confidence=0.95):
+    """
+    Mean, sample standard deviation and a two-sided Student-t confidence
+    interval for every numeric metric across `records`.
+    """
+    if not records:
+        return {}
+
+    stats = {}
+    for key in records[0]:
+        if key == "seed":
+            continue
+        values = [r[key] for r in records]
+        n = len(values)
+        mean = sum(values) / n
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1)) if n > 1 else 0.0
+        half = _t_quantile(0.5 + confidence / 2, n - 1) * std / math.sqrt(n) if n > 1 else 0.0
+        stats[key] = {"n": n, "mean": mean, "std": std, "ci_low": mean - half, "ci_high": mean + half}
+    return stats
+
+def parse_override(text):
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected key=value, got {text!r}")
+    try:
+        value = json.loads(value)
+    except json.JSONDecodeError:
+        pass  # plain strings, e.g. chunk_storage=metadata
+    return key, value
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run many Wormhole simulation seeds in parallel.")
+    parser.add_argument("--seeds", type=int, default=os.cpu_count() or 1, help="number of seeds to run")
+    parser.add_argument("--start-seed", type=int, default=1, help="first seed; seeds are consecutive")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--engine", choices=Simulation.ENGINES, default="event")
+    parser.add_argument("--blackout", action="store_true", help="enable the regional blackout scenario")
+    parser.add_argument("--set", dest="overrides", type=parse_override, action="append", default=[],
+                        metavar="KEY=VALUE", help="override a SimulationConfig setting, e.g. replication_factor=5")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--json", action="store_true", help="print records and aggregates as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    seeds = range(args.start_seed, args.start_seed + args.seeds)
+    records = run_batch(seeds, dict(args.overrides), args.processes,
+                        engine=args.engine, blackout=args.blackout)
+    stats = aggregate(records, args.confidence)
+
+    if args.json:
+        json.dump({"records": records, "aggregate": stats}, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"\n[BATCH SUMMARY] {len(records)} seeds, {100 * args.confidence:.0f}% CI")
+    for key, s in stats.items():
+        print(f"  {key:32s}: {s['mean']:12.2f}  [{s['ci_low']:.2f}, {s['ci_high']:.2f}]  sd {s['std']:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Scaling benchmarks for the simulator core.
+
+    python benchmark.py --suite quick --output bench.json
+    python benchmark.py --suite full --baseline bench.json --threshold 0.2
+
+Macro scenarios run the tick loop at several node and tick counts and report
+ticks per second, seconds per phase and peak RSS. Each scenario runs in a
+fresh process, so its peak memory is its own. Microbenchmarks time the hot
+lookups on a warmed-up network, and the transfer benchmark runs the chunk
+transfer path of the in-memory and loopback TCP network backends.
+
+Results are flat {name: {"value", "unit", "better", "gate"}} records in
+JSON. With --baseline every shared metric is compared, and the run fails
+(exit 1) if any gated one is worse than the baseline by more than
+--threshold. While one is, the suite runs again, up to --attempts times,
+keeping each metric's best value, so only a regression that reproduces
+fails. Nanosecond-scale lookups and the loopback transfer path jitter by
+more than any useful threshold between runs, so they are reported but never
+gate.
+"""
+import gc
+import io
+import sys
+import json
+import time
+import random
+import platform
+import statistics
+import argparse
+import resource
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import SimulationConfig
+from simulation import Simulation
+from node_generator import generate_nodes
+from network.memory_backend import InMemoryNetwork
+
+SUITES = {
+    "quick": {"nodes": (1000,), "ticks": (200,), "micro_nodes": 1000, "transfer_chunks": 500},
+    "full": {"nodes": (1000, 10_000, 100_000), "ticks": (200, 1000), "micro_nodes": 10_000, "transfer_chunks": 2000},
+}
+
+# Simulation components and methods the tick loop calls once per tick, by phase
+PHASES = (
+    ("download", "downloader", "tick"),
+    ("blackout", "blackout_manager", "apply_blackout"),
+    ("availability", "availability", "step"),
+    ("host_index", "host_index", "apply_transitions"),
+    ("network", "nal", "apply_transitions"),
+    ("metrics", None, "sample"),
+    ("upload", "uploader", "tick"),
+)
+
+def _timed(obj, name, totals, phase):
+    """Wrap the bound method `obj.name` so its run time adds to totals[phase]."""
+    method = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            totals[phase] += time.perf_counter() - start
+
+    setattr(obj, name, wrapper)
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+def run_scenario(nodes, ticks, seed=1, blackout=True, min_seconds=1.0, max_repeat=5):
+    """
+    Run one macro scenario in this process and return its metrics. A short
+    scenario runs again, up to `max_repeat` times, until `min_seconds` of
+    run time is spent, and each metric is the median over the runs.
+    """
+    runs = []
+    while len(runs) < max_repeat and sum(run["run_seconds"][0] for run in runs) < min_seconds:
+        runs.append(_run_scenario_once(nodes, ticks, seed, blackout))
+    return {key: (statistics.median(run[key][0] for run in runs),) + record[1:] for key, record in runs[0].items()}
+
+def _run_scenario_once(nodes, ticks, seed, blackout):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        sim = Simulation.from_seed(
+            seed, {"total_nodes": nodes, "total_ticks": ticks, "chunk_storage": "metadata"}, blackout=blackout
+        )
+        build_seconds = time.perf_counter() - start
+
+        totals = dict.fromkeys((phase for phase, _, _ in PHASES), 0.0)
+        for phase, component, method in PHASES:
+            obj = sim if component is None else getattr(sim, component)
+            if obj is not None:
+                _timed(obj, method, totals, phase)
+
+        start = time.perf_counter()
+        sim.run()
+        run_seconds = time.perf_counter() - start
+
+    result = {
+        "build_seconds": (build_seconds, "s", "lower"),
+        "run_seconds": (run_seconds, "s", "lower"),
+        "ticks_per_second": (ticks / run_seconds, "ticks/s", "higher"),
+        "peak_rss_mb": (_peak_rss_mb(), "MB", "lower"),
+    }
+    for phase, seconds in totals.items():
+        result[f"phase.{phase}_us_per_tick"] = (1e6 * seconds / ticks, "us", "lower")
+    return result
+
+def _median_per_call(fn, repeat=7, min_seconds=0.05):
+    """
+    Median seconds per call of fn() over `repeat` timed runs. The calls per
+    run double from one until a run takes `min_seconds`, so fast functions
+    are timed over enough calls to rise above timer and scheduler jitter.
+    The garbage collector is off while timing, as in timeit: its pauses
+    depend on everything else alive in the process.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _median_runs(fn, repeat, min_seconds)
+    finally:
+        if enabled:
+            gc.enable()
+
+def _median_runs(fn, repeat, min_seconds):
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+        calls *= 2
+
+    runs = [elapsed / calls]  # the run that settled the call count is the first timed one
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        runs.append((time.perf_counter() - start) / calls)
+    return statistics.median(runs)
+
+def run_micro(nodes, seed=1):
+    """Microbenchmarks of the hot lookups, on a network warmed up for 300 ticks."""
+    result = {}
+
+    config = SimulationConfig(seed=seed).apply_overrides({"total_nodes": nodes, "chunk_storage": "metadata"})
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_nodes(config.child_rng("nodes"), nodes, config, InMemoryNetwork(seed=seed, config=config))
+    result["generate_nodes_seconds"] = (time.perf_counter() - start, "s", "lower")
+
+    config.apply_overrides({"node_generation": "bulk"})
+    start = time.perf_counter()
+    generate_nodes(config.child_rng("nodes"), nodes, config, InMemoryNetwork(seed=seed, config=config))
+    result["generate_nodes_bulk_seconds"] = (time.perf_counter() - start, "s", "lower")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulation.from_seed(seed, {"total_nodes": nodes, "total_ticks": 300, "chunk_storage": "metadata"})
+        sim.run()
+
+    rng = random.Random(seed)
+    nal = sim.nal
+    result["get_eligible_upload_targets_us"] = (
+        1e6 * _median_per_call(lambda: nal.get_eligible_upload_targets(min_free_gb=0.01)), "us", "lower"
+    )
+    result["sample_upload_targets_us"] = (
+        1e6 * _median_per_call(lambda: nal.sample_upload_targets(rng, 20, min_free_gb=0.01)), "us", "lower"
+    )
+
+    # Per-node profile check with the daylight coin, as the reference availability mode runs it
+    store = sim.nodes
+    views = list(store)[:1000]
+    profiles = [node.behavior_profile_instance for node in views]
+    pairs = list(zip(profiles, views))
+    tick = sim.clock.tick
+
+    def check_all():
+        for profile, node in pairs:
+            profile.is_online(tick, node)
+
+    result["is_online_ns"] = (1e9 * _median_per_call(check_all) / len(pairs), "ns", "lower", False)
+
+    chunk_ids = [chunk_id for name in sim.registry.files for chunk_id in nal.manifest.chunk_ids(name)]
+    if chunk_ids:
+        pick = random.Random(seed)  # its own generator: the timed calls above use `rng` a varying number of times
+        sample = [chunk_ids[pick.randrange(len(chunk_ids))] for _ in range(10_000)]
+        host_index = sim.host_index
+
+        def lookup_all():
+            for chunk_id in sample:
+                host_index.online_hosts(chunk_id)
+
+        result["chunk_lookup_ns"] = (1e9 * _median_per_call(lookup_all) / len(sample), "ns", "lower", False)
+
+    files = list(sim.registry.files)
+    if files:
+        # A fixed sample, so every timed run and every benchmark run reads the same mix of file sizes
+        manifest = nal.manifest
+        pick = random.Random(seed)
+        sample = [files[pick.randrange(len(files))] for _ in range(200)]
+
+        def chunk_ids_all():
+            for name in sample:
+                manifest.chunk_ids(name)
+
+        result["manifest_chunk_ids_us"] = (1e6 * _median_per_call(chunk_ids_all) / len(sample), "us", "lower")
+    return result
+
+def run_transfer(chunks, peers=4, chunk_kb=64, seed=1):
+    """
+    The chunk transfer path of each network backend: upload_chunks calls of
+    a new `chunks`-chunk file of `chunk_kb` KB chunks to `peers` peers, then
+    every chunk of the last file downloaded from the first peer. The
+    loopback peers keep every byte sent, so loopback times a single upload;
+    its metrics are reported but do not gate.
+    """
+    result = {}
+    payload = bytes(chunk_kb * 1024)
+    for backend in Simulation.BACKENDS:
+        config = SimulationConfig(seed=seed).apply_overrides({"total_nodes": peers, "network_backend": backend})
+        nal = Simulation.network_class(backend)(seed=seed, config=config)
+        with contextlib.redirect_stdout(io.StringIO()):
+            nodes = generate_nodes(config.child_rng("nodes"), peers, config, nal)
+        for node in nodes:
+            node.free_space_gb = node.total_space_gb = chunks * chunk_kb  # room for every chunk
+            nal.register_peer(node.id, node)
+
+        targets = [node.id for node in nodes]
+        data = [payload] * chunks
+        uploaded = []
+
+        def upload():
+            file_id = f"transfer-{len(uploaded)}"
+            uploaded.append(nal.assign_chunk_ids(file_id, chunks))
+            nal.upload_chunks(file_id, uploaded[-1], data, targets, "bench", chunk_kb / 1024 ** 2)
+
+        def download():
+            for chunk_id in uploaded[-1]:
+                nal.download_chunk(chunk_id, targets[0])
+
+        gate = backend != "loopback"
+        upload_seconds = _median_per_call(upload) if gate else _median_per_call(upload, repeat=1, min_seconds=0)
+        download_seconds = _median_per_call(download)
+        nal.close()
+
+        result[f"{backend}_upload_mb_s"] = (chunks * peers * chunk_kb / 1024 / upload_seconds, "MB/s", "higher", gate)
+        result[f"{backend}_download_us"] = (1e6 * download_seconds / chunks, "us", "lower", gate)
+    return result
+
+def _isolated(fn, *args):
+    # A fresh process per scenario keeps each peak RSS separate
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(fn, *args).result()
+
+def run_suite(suite, log=print):
+    spec = SUITES[suite]
+    results = {}
+
+    for nodes in spec["nodes"]:
+        for ticks in spec["ticks"]:
+            log(f"[BENCH] macro nodes={nodes} ticks={ticks}")
+            for key, record in _isolated(run_scenario, nodes, ticks).items():
+                results[f"macro.nodes={nodes}.ticks={ticks}.{key}"] = record
+
+    log(f"[BENCH] micro nodes={spec['micro_nodes']}")
+    for key, record in _isolated(run_micro, spec["micro_nodes"]).items():
+        results[f"micro.nodes={spec['micro_nodes']}.{key}"] = record
+
+    log(f"[BENCH] transfer chunks={spec['transfer_chunks']}")
+    for key, record in _isolated(run_transfer, spec["transfer_chunks"]).items():
+        results[f"transfer.chunks={spec['transfer_chunks']}.{key}"] = record
+
+    return {
+        "meta": {
+            "suite": suite,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        # A record's optional fourth field, False, makes it report-only
+        "results": {
+            name: {"value": record[0], "unit": record[1], "better": record[2],
+                   "gate": record[3] if len(record) > 3 else True}
+            for name, record in results.items()
+        },
+    }
+
+# Absolute differences below these are run-to-run jitter, never a regression
+NOISE_FLOOR = {"s": 0.1, "us": 20.0, "ns": 200.0, "MB": 10.0, "MB/s": 20.0, "ticks/s": 5.0}
+
+def compare(current, baseline, threshold):
+    """
+    Compare every metric present in both runs. Returns (rows, passed), one
+    row per metric: (name, baseline value, current value, relative change,
+    regressed). A positive change is always a regression; changes within
+    the unit's NOISE_FLOOR never are, and report-only metrics (gate false)
+    never fail the run. `regressed` is None for those.
+    """
+    rows = []
+    passed = True
+    for name, record in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (record["value"] - base["value"]) / base["value"]
+        if record["better"] == "higher":
+            change = -change
+        if not record.get("gate", True):
+            rows.append((name, base["value"], record["value"], change, None))
+            continue
+        noise = abs(record["value"] - base["value"]) < NOISE_FLOOR.get(record["unit"], 0)
+        regressed = change > threshold and not noise
+        passed = passed and not regressed
+        rows.append((name, base["value"], record["value"], change, regressed))
+    return rows, passed
+
+def best_of(first, second):
+    """`first` with each metric replaced by the better value of the two runs."""
+    results = dict(first["results"])
+    for name, record in second["results"].items():
+        kept = results.get(name)
+        if kept is None or (record["value"] > kept["value"]) == (record["better"] == "higher"):
+            results[name] = record
+    return {**first, "results": results}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Wormhole simulator core.")
+    parser.add_argument("--suite", choices=SUITES, default="quick")
+    parser.add_argument("--output", metavar="FILE", help="write the results as JSON to FILE")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a stored results file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fail when a metric is worse than the baseline by more than this fraction")
+    parser.add_argument("--attempts", type=int, default=3,
+                        help="run the suite up to this many times while a metric regresses, keeping each "
+                             "metric's best value, so a regression has to reproduce to fail")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    current = run_suite(args.suite)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, passed = compare(current, baseline, args.threshold)
+        for attempt in range(2, args.attempts + 1):
+            if passed:
+                break
+            # A slow spell on the host rarely hits the same metric in every run; a real regression does
+            print(f"[BENCH] regression; running again, attempt {attempt} of {args.attempts}")
+            current = best_of(current, run_suite(args.suite))
+            rows, passed = compare(current, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if not args.baseline:
+        for name, record in current["results"].items():
+            print(f"  {name:60s}: {record['value']:12.2f} {record['unit']}")
+        return 0
+
+    for name, base, value, change, regressed in rows:
+        flag = "info" if regressed is None else "FAIL" if regressed else "ok"
+        print(f"  {name:60s}: {base:12.2f} -> {value:12.2f}  (regression {100 * change:+6.1f}%)  {flag}")
+    print(f"\n[BENCH] {'PASS' if passed else 'FAIL'} at {100 * args.threshold:.0f}% threshold")
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,61 @@
 import random
+import numpy as np
+
+from event_log import NO_EVENTS, DEBUG
 
 class BlackoutManager:
-    def __init__(self, config, nodes):
+    def __init__(self, config, nodes, availability=None, events=None):
         self.config = config
         self.nodes = nodes
+        self.availability = availability
+        self.events = events if events is not None else NO_EVENTS
         self.blackout_triggered = False
         self.blackout_active = False
         self.blackout_region = None
         self.blackout_start_tick = None
         self.blackout_end_tick = None
         self.ramp_duration = 2000  # ticks over which nodes will ramp back online (e.g. ~1.5 hours)
+        self.trigger_tick = 1000   # blackout begins on the first tick at or after this
 
         self.rng = config.child_rng("blackout_manager")
 
         # Choose a region to blackout based on presence
-        regions = list(set(n.timezone_offset for n in nodes if n.timezone_offset is not None))
+        timezones = nodes.timezone_offset[:len(nodes)]
+        regions = list(set(timezones[timezones >= 0].tolist()))
         self.blackout_region = self.rng.choice(regions)
 
         # Duration: in ticks
         self.blackout_duration = 4000
 
-        print(f"🌐 Blackout scheduled for region {self.blackout_region // 3600}h offset")
-        print(f"🌒 Duration will be {self.blackout_duration} ticks (~{self.blackout_duration // 3600:.1f} hours)")
-
-        region_count = sum(1 for n in nodes if n.timezone_offset == self.blackout_region)
-        print(f"📊 {region_count} nodes assigned to region {self.blackout_region // 3600}h")
+        # Cache positions of the nodes affected by this region
+        self.affected_index = np.flatnonzero(timezones == self.blackout_region)
 
-        # Cache nodes affected by this region
-        self.affected_nodes = [n for n in self.nodes if n.timezone_offset == self.blackout_region]
+        if self.events.blackout:
+            self.events.emit(
+                None, "blackout", "scheduled",
+                region_h=self.blackout_region // 3600, duration=self.blackout_duration,
+                nodes=len(self.affected_index),
+                message="🌐 Blackout scheduled for region {region_h}h offset\n"
+                        "🌒 Duration will be {duration} ticks (~{duration_h:.1f} hours)\n"
+                        "📊 {nodes} nodes assigned to region {region_h}h",
+                duration_h=self.blackout_duration // 3600,
+            )
 
     def apply_blackout(self, tick):
-        if not self.blackout_triggered and tick < 1000:
+        if not self.blackout_triggered and tick < self.trigger_tick:
             return
 
-        if not self.blackout_triggered and tick >= 1000:
+        if not self.blackout_triggered and tick >= self.trigger_tick:
             self.blackout_triggered = True
             self.blackout_active = True
             self.blackout_start_tick = tick
             self.blackout_end_tick = tick + self.blackout_duration
 
-            print(f"Blackout begins at tick {tick} for region {self.blackout_region // 3600}h")
+            if self.events.blackout:
+                self.events.emit(tick, "blackout", "begin", region_h=self.blackout_region // 3600,
+                                 message="Blackout begins at tick {tick} for region {region_h}h")
 
-            for node in self.affected_nodes:
-                node.force_offline_until = self.blackout_end_tick + self.ramp_duration
+            self._set_force_offline(self.affected_index, self.blackout_end_tick + self.ramp_duration)
 
             return
 
@@ -52,14 +65,40 @@ class BlackoutManager:
         elapsed = tick - self.blackout_end_tick
         ramp_ratio = min(elapsed / self.ramp_duration, 1.0)
 
-        still_offline = [n for n in self.affected_nodes if n.force_offline_until is not None]
-        target_unlock_count = int(len(self.affected_nodes) * ramp_ratio)
+        still_offline = self._still_offline()
+        target_unlock_count = int(len(self.affected_index) * ramp_ratio)
         unlock_now = still_offline[:target_unlock_count]
 
-        for node in unlock_now:
-            node.force_offline_until = None
+        self._set_force_offline(unlock_now, None)
+        if self.events.blackout and len(unlock_now):
+            self.events.emit(tick, "blackout", "unlock", level=DEBUG, nodes=len(unlock_now))
 
         if ramp_ratio >= 1.0:
-            print(f"Region {self.blackout_region // 3600}h fully recovered at tick {tick}")
+            if self.events.blackout:
+                self.events.emit(tick, "blackout", "recovered", region_h=self.blackout_region // 3600,
+                                 message="Region {region_h}h fully recovered at tick {tick}")
             self.blackout_active = False
 
+    def next_apply_tick(self, tick):
+        """
+        First tick after `tick` at which `apply_blackout` changes anything, or
+        None once the region has recovered. Lets an event loop skip the ticks
+        in between.
+        """
+        if not self.blackout_triggered:
+            return max(tick + 1, self.trigger_tick)
+        if not self.blackout_active:
+            return None
+        if tick < self.blackout_end_tick:
+            return self.blackout_end_tick + 1
+        if len(self._still_offline()):
+            return tick + 1
+        return max(tick + 1, self.blackout_end_tick + self.ramp_duration)
+
+    def _still_offline(self):
+        affected = self.affected_index
+        return affected[self.nodes.force_offline_until[affected] != 0]
+
+    def _set_force_offline(self, indices, until):
+        # The availability engine shares this array with the node store
+        self.nodes.force_offline_until[indices] = until or 0
@@ -2,6 +2,8 @@ import random
 import hashlib
 import math
 
+from counter_rng import CounterRNG
+
 class SimulationConfig:
     def __init__(self, seed: int):
         self.seed = seed
@@ -16,6 +18,23 @@ class SimulationConfig:
         self.disk_write_speed_mb_s = 200
         self.chunk_size_mb = 10
         self.replication_factor = 10  # ✅ New: number of peers to upload each chunk to
+        self.storage_mode = "replication"  # "erasure": Reed-Solomon stripes of k data + m parity fragments
+        self.erasure_data_fragments = 6    # k
+        self.erasure_parity_fragments = 4  # m
+        self.chunk_storage = "payload"  # "metadata": interned int chunk ids, no payload bytes
+        self.node_generation = "sequential"  # "bulk": whole-array draws, a different population per seed
+        self.random_streams = "sequential"  # "counter": daylight draws keyed by (seed, node, tick)
+        self.schedule_memory_mb = 256  # cap on the precomputed availability bitset; it rolls forward in windows
+        self.network_backend = "memory"  # "loopback": chunk bytes over asyncio TCP peers on localhost
+        self.loopback_connections_per_peer = 2
+        self.loopback_max_inflight_per_peer = 32  # pipelined requests outstanding per peer
+        self.loopback_max_connections = 64  # pooled connections in all; idle peers close past it
+        self.loopback_timeout_s = 10.0  # a connection with requests but no reply for this long fails them
+
+        self.repair_enabled = False       # re-replicate chunks that lost online replicas
+        self.repair_interval_ticks = 60   # ticks between repair rounds
+        self.repair_bandwidth_mb_s = 50   # repair copy budget, spent per round as rate × interval
+        self.repair_holder_limit = 2      # stop copying at this many × replication_factor holders, online or not
 
         self.bootstrap_peer_sample_size = 5
         self.join_announcement_size_kb = 2
@@ -36,12 +55,45 @@ class SimulationConfig:
         self.behavior_distribution = self._build_behavior_distribution()
         self.daylight_curve = self._generate_daylight_curve()
 
+    # Derived in __init__ or set while running; never overridden directly
+    DERIVED = ("rng", "behavior_distribution", "daylight_curve", "current_tick")
+
+    def apply_overrides(self, overrides: dict):
+        """
+        Replace settings by name. A dotted key sets one entry of a dict setting,
+        e.g. "profile_uptime_estimates.flaky". Derived settings are rebuilt.
+        """
+        for key, value in overrides.items():
+            name, _, entry = key.partition(".")
+            if name in self.DERIVED or name == "seed" or not hasattr(self, name):
+                raise AttributeError(f"SimulationConfig has no overridable setting {name!r}")
+            if entry:
+                setting = dict(getattr(self, name))
+                setting[entry] = value
+                value = setting
+            setattr(self, name, value)
+
+        if overrides:
+            self.behavior_distribution = self._build_behavior_distribution()
+        return self
+
+    def settings(self):
+        """Every overridable setting and its current value."""
+        return {
+            name: value for name, value in vars(self).items()
+            if name not in self.DERIVED and name != "seed"
+        }
+
     def child_rng(self, namespace: str):
         full_seed = f"{self.seed}_{namespace}".encode()
         digest = hashlib.sha256(full_seed).digest()
         int_seed = int.from_bytes(digest[:4], byteorder="big")
         return random.Random(int_seed)
 
+    def counter_rng(self, namespace: str):
+        """Counter-based counterpart of child_rng: values keyed by (node, tick), not stream position."""
+        return CounterRNG(self.seed, namespace)
+
     def _generate_daylight_curve(self):
         curve = []
         for t in range(86400):  # One value per second in a 24-hour cycle
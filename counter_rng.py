@@ -0,0 +1,58 @@
+import hashlib
+
+import numpy as np
+
+MASK = (1 << 64) - 1
+NODE_STEP = 0x9E3779B97F4A7C15  # odd constants spreading each counter over 64 bits
+TICK_STEP = 0xD1B54A32D192ED03
+DRAW_STEP = 0xAEF17502108EF2D9
+
+def _mix(x):
+    """SplitMix64 finalizer on a Python int."""
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+def _mix_array(x):
+    """SplitMix64 finalizer on a uint64 array; multiplication wraps modulo 2**64."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+class CounterRNG:
+    """
+    Counter-based random numbers: `uniform(node, tick)` is a pure function of
+    (seed, namespace, node, tick, draw), not a position in a stream. Values do
+    not depend on which other draws were made, in what order, in what batch
+    shape or on which worker, so any subset of (node, tick) pairs can be
+    evaluated out of order and still reproduce bit for bit.
+
+    Each value hashes the counters into the namespace key with SplitMix64
+    finalizer rounds and keeps the top 53 bits, like Generator.random.
+    Arguments are Python ints, or arrays that broadcast together.
+    """
+
+    def __init__(self, seed, namespace):
+        self.seed = seed
+        self.namespace = namespace
+        digest = hashlib.sha256(f"{seed}_{namespace}".encode()).digest()
+        self.key = int.from_bytes(digest[:8], byteorder="big")
+
+    def bits(self, node, tick, draw=0):
+        """64 random bits per (node, tick, draw), as an int or a uint64 array."""
+        if all(isinstance(v, (int, np.integer)) for v in (node, tick, draw)):
+            h = _mix((self.key + int(node) * NODE_STEP) & MASK)
+            h = _mix((h ^ (int(tick) * TICK_STEP)) & MASK)
+            return _mix((h + int(draw) * DRAW_STEP) & MASK)
+
+        node, tick, draw = (np.asarray(v).astype(np.uint64) for v in (node, tick, draw))
+        h = _mix_array(np.uint64(self.key) + node * np.uint64(NODE_STEP))
+        h = _mix_array(h ^ (tick * np.uint64(TICK_STEP)))
+        return _mix_array(h + draw * np.uint64(DRAW_STEP))
+
+    def uniform(self, node, tick, draw=0):
+        """Floats in [0, 1) per (node, tick, draw)."""
+        h = self.bits(node, tick, draw)
+        if isinstance(h, int):
+            return (h >> 11) * 2.0 ** -53
+        return (h >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
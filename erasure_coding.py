@@ -0,0 +1,99 @@
+import numpy as np
+
+# GF(2**8) with the Reed-Solomon primitive polynomial x^8 + x^4 + x^3 + x^2 + 1
+PRIMITIVE = 0x11D
+
+def _tables():
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int64)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= PRIMITIVE
+    exp[255:510] = exp[:255]
+
+    # MUL[a][b] = a * b, so multiplying a buffer by a constant is one fancy index
+    mul = exp[(log[:, None] + log[None, :]) % 255]
+    mul[0, :] = 0
+    mul[:, 0] = 0
+    return exp, log, mul.astype(np.uint8)
+
+EXP, LOG, MUL = _tables()
+
+def gf_inverse(a):
+    if a == 0:
+        raise ZeroDivisionError("0 has no inverse in GF(256)")
+    return int(EXP[255 - LOG[a]])
+
+def gf_matmul(matrix, data):
+    """
+    matrix (r, k) of GF(256) coefficients times data (..., k, L) of byte
+    buffers, giving (..., r, L). Each term is a table lookup over a whole
+    buffer; sums are XOR.
+    """
+    out = np.zeros(data.shape[:-2] + (matrix.shape[0], data.shape[-1]), dtype=np.uint8)
+    for i, row in enumerate(matrix):
+        for j, coefficient in enumerate(row):
+            if coefficient:
+                out[..., i, :] ^= MUL[coefficient][data[..., j, :]]
+    return out
+
+def gf_invert_matrix(matrix):
+    """Inverse of a square GF(256) matrix by Gauss-Jordan elimination."""
+    n = len(matrix)
+    work = np.concatenate([np.asarray(matrix, dtype=np.uint8), np.eye(n, dtype=np.uint8)], axis=1)
+    for col in range(n):
+        pivot = next((r for r in range(col, n) if work[r, col]), None)
+        if pivot is None:
+            raise ValueError("Singular matrix over GF(256)")
+        work[[col, pivot]] = work[[pivot, col]]
+        work[col] = MUL[gf_inverse(int(work[col, col]))][work[col]]
+        for r in range(n):
+            if r != col and work[r, col]:
+                work[r] ^= MUL[work[r, col]][work[col]]
+    return work[:, n:]
+
+class ReedSolomon:
+    """
+    Systematic Reed-Solomon code over GF(256) with k data and m parity
+    fragments per stripe.
+
+    The generator is the identity over a Cauchy matrix, so any k of the
+    k + m fragments determine the stripe. Fragments are equal-length byte
+    buffers; shorter data is zero-padded by the caller.
+    """
+
+    def __init__(self, k, m):
+        if k < 1 or m < 0 or k + m > 256:
+            raise ValueError(f"Unsupported Reed-Solomon parameters k={k}, m={m}")
+        self.k = k
+        self.m = m
+        # Cauchy rows 1 / (x_i + y_j) with x_i = k + i and y_j = j, all distinct
+        parity = np.array(
+            [[gf_inverse((k + i) ^ j) for j in range(k)] for i in range(m)], dtype=np.uint8
+        ).reshape(m, k)
+        self.generator = np.concatenate([np.eye(k, dtype=np.uint8), parity])
+        self.inverses = {}  # tuple of present fragment indices -> decode matrix
+
+    def encode(self, data):
+        """Parity fragments (..., m, L) for data fragments (..., k, L)."""
+        return gf_matmul(self.generator[self.k:], data)
+
+    def decode(self, indices, fragments):
+        """
+        Data fragments (..., k, L) from k fragments (..., k, L) whose stripe
+        positions are `indices`. Stripes stacked along the leading axes
+        must all have the same fragments present.
+        """
+        indices = tuple(indices)
+        if len(indices) != self.k:
+            raise ValueError(f"Need exactly {self.k} fragments, got {len(indices)}")
+        if indices == tuple(range(self.k)):
+            return fragments
+        inverse = self.inverses.get(indices)
+        if inverse is None:
+            inverse = self.inverses[indices] = gf_invert_matrix(self.generator[list(indices)])
+        return gf_matmul(inverse, fragments)
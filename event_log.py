@@ -0,0 +1,103 @@
+import json
+from itertools import islice
+from collections import Counter, deque
+
+DEBUG, INFO, WARNING = 10, 20, 30
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING}
+CATEGORIES = ("join", "upload", "download", "blackout", "repair")
+
+class EventLog:
+    """
+    Structured simulation events, kept in a ring buffer of the last
+    `capacity` records and flushed to a JSONL file in batches of that size.
+
+    Each category has a boolean attribute (`log.join`, `log.upload`, ...)
+    that hot paths check before building an event, so a disabled category
+    costs one attribute test:
+
+        if events.join:
+            events.emit(tick, "join", "join", node=node_id)
+
+    Categories listed in `echo` are also printed using the event's
+    `message` template, formatted only when it is printed.
+    """
+
+    def __init__(self, path=None, level="info", categories=CATEGORIES, capacity=4096, echo=()):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        enabled = set(categories)
+        unknown = enabled - set(CATEGORIES)
+        if unknown:
+            raise ValueError(f"Unknown event categories: {sorted(unknown)}")
+        for category in CATEGORIES:
+            setattr(self, category, category in enabled)
+
+        self.echo = set(echo) & enabled
+        self.ring = deque(maxlen=capacity)
+        self.unflushed = 0  # newest records in the ring not yet written
+        self.counts = Counter()  # (category, event) -> records emitted
+        self.path = None
+        self.file = None
+        if path is not None:
+            self.open(path)
+
+    def open(self, path, mode="w"):
+        self.close()
+        self.path = path
+        self.file = open(path, mode)
+
+    def emit(self, tick, category, event, level=INFO, message=None, **fields):
+        if level < self.level:
+            return
+        self.ring.append((tick, category, event, fields))
+        self.counts[category, event] += 1
+
+        if message is not None and category in self.echo:
+            print(message.format(tick=tick, **fields))
+
+        if self.file is not None:
+            self.unflushed += 1
+            if self.unflushed == self.ring.maxlen:
+                self.flush()
+
+    def flush(self):
+        if self.file is None or not self.unflushed:
+            return
+        lines = [
+            json.dumps({"tick": tick, "cat": category, "event": event, **fields})
+            for tick, category, event, fields in islice(self.ring, len(self.ring) - self.unflushed, None)
+        ]
+        self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+        self.unflushed = 0
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def recent(self, category=None):
+        """Records still in the ring buffer, oldest first, as dicts."""
+        return [
+            {"tick": tick, "cat": cat, "event": event, **fields}
+            for tick, cat, event, fields in self.ring
+            if category is None or cat == category
+        ]
+
+    def __getstate__(self):
+        # Snapshots keep the buffer and counts; the resumed run opens its own file
+        self.flush()
+        state = self.__dict__.copy()
+        state.update(file=None, path=None, unflushed=0)
+        return state
+
+
+def read_events(path):
+    """Yield the records of a JSONL event log as dicts."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+# Shared stand-in for components built without an event log
+NO_EVENTS = EventLog(categories=())
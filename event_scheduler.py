@@ -0,0 +1,221 @@
+import heapq
+
+# Phases order the work inside one tick the same way the tick loop in main.py does
+CHUNK_READY, DOWNLOAD, BLACKOUT, JOIN, REPAIR, SAMPLE, UPLOAD = range(7)
+
+class EventQueue:
+    """
+    Time-ordered queue of (tick, phase, order) keyed events. Events with equal
+    keys pop in insertion order.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.pushed = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, tick, phase, order=0, payload=None):
+        heapq.heappush(self.heap, (tick, phase, order, self.pushed, payload))
+        self.pushed += 1
+
+    def pop(self):
+        tick, phase, _, _, payload = heapq.heappop(self.heap)
+        return tick, phase, payload
+
+
+class EventScheduler:
+    """
+    Event-driven replacement for the fixed one-tick main loop.
+
+    Only ticks that carry an event are visited: chunk transfers landing, a
+    node's next download turn, blackout phases, node joins, repair rounds,
+    connected-count samples on log ticks, and upload triggers. Node state is
+    not flipped per tick; the daylight coin makes every node flicker, so it
+    is synced lazily. Downloads and joins sync only the nodes they read (the
+    node itself and the file's holders); samples, repair rounds and uploads
+    read every node and sync all of them, which only evaluates nodes inside
+    their rolling-cycle uptime. Every generator is consumed in the same
+    order as the tick loop, so a seed gives the same summaries in both
+    engines.
+
+    The daylight coin is drawn afresh per node and tick, so online counts
+    cannot be carried between visited ticks; each sample and upload costs
+    O(N) like a tick of the tick loop. With the default upload rate and log
+    interval nearly every tick is visited and neither engine is faster; the
+    event engine wins when samples and uploads are sparse.
+    """
+
+    def __init__(self, config, nodes, availability, downloader, uploader, host_index, nal, blackout_manager=None,
+                 sample=None, repair=None):
+        if availability.mode == "reference":
+            raise ValueError("The event engine needs the vectorized or precomputed availability mode")
+
+        self.config = config
+        self.nodes = nodes
+        self.availability = availability
+        self.downloader = downloader
+        self.uploader = uploader
+        self.host_index = host_index
+        self.nal = nal
+        self.blackout_manager = blackout_manager
+        self.sample = sample  # sample(tick) records metrics on log ticks
+        self.repair = repair  # RepairScheduler, if enabled
+
+        self.queue = EventQueue()
+        self.handlers = {
+            CHUNK_READY: self._chunk_ready,
+            DOWNLOAD: self._download,
+            BLACKOUT: self._blackout,
+            JOIN: self._join,
+            REPAIR: self._repair,
+            SAMPLE: self._sample,
+            UPLOAD: self._upload,
+        }
+
+        self.total_ticks = 0
+        self.synced_tick = -1     # -1 is the generator's initial node state
+        self.ready_queued = set()  # ticks with a CHUNK_READY event queued
+        self.blackout_tick = None  # tick of the queued BLACKOUT event
+        self.blackout_indices = set()
+        if blackout_manager is not None:
+            self.blackout_indices = set(blackout_manager.affected_index.tolist())
+        self.parked = []           # (phase, node index, start tick) waiting on the next blackout phase
+
+        self.uploaded_files = []
+        downloader.refresh_hosts = self._refresh_hosts
+
+    def run(self, total_ticks):
+        self.start(total_ticks)
+        self.advance(total_ticks)
+
+    def start(self, total_ticks):
+        """Queue the initial events for a run of `total_ticks` ticks."""
+        self.total_ticks = total_ticks
+
+        if self.blackout_manager is not None:
+            self.blackout_tick = self.blackout_manager.next_apply_tick(-1)
+            self._push(self.blackout_tick, BLACKOUT)
+
+        for i, node in enumerate(self.nodes):
+            if node.online:
+                self._push(0, DOWNLOAD, i)
+            self._search(JOIN, i, 0)
+
+        if self.repair is not None:
+            self._push(0, REPAIR)
+        self._push(0, SAMPLE)
+        upload_tick = self.uploader.next_trigger(0, total_ticks)
+        if upload_tick is not None:
+            self._push(upload_tick, UPLOAD)
+
+    def advance(self, until):
+        """Handle every queued event before tick `until`; later ones stay queued."""
+        queue = self.queue
+        while queue and queue.heap[0][0] < until:
+            tick, phase, payload = queue.pop()
+            self.handlers[phase](tick, payload)
+
+    def _push(self, tick, phase, i=None):
+        if tick < self.total_ticks:
+            self.queue.push(tick, phase, i or 0, i)
+
+    def _sync(self, tick):
+        if tick <= self.synced_tick:
+            return
+        self._apply_transitions(*self.availability.sync(tick))
+        self.config.current_tick = tick
+        self.synced_tick = tick
+
+    def _sync_nodes(self, indices, tick):
+        # After a full sync at or past `tick` every node is already there
+        if tick > self.synced_tick:
+            self._apply_transitions(*self.availability.sync_nodes(indices, tick))
+
+    def _apply_transitions(self, came_online, went_offline):
+        self.host_index.apply_transitions(came_online, went_offline)
+        self.nal.apply_transitions(self.nodes, came_online, went_offline)
+        if self.repair is not None:
+            self.repair.apply_transitions(came_online, went_offline)
+
+    def _refresh_hosts(self, chunk_ids, tick):
+        # The downloader's hook: a turn at `tick` reads the holders as of tick - 1
+        self._sync_nodes(self.host_index.holder_positions(chunk_ids), tick - 1)
+
+    def _horizon(self, i):
+        # Force-offline overrides only hold until the next blackout phase
+        if i in self.blackout_indices and self.blackout_tick is not None:
+            return self.blackout_tick
+        return self.total_ticks
+
+    def _search(self, phase, i, start):
+        """
+        Queue node `i`'s next JOIN or DOWNLOAD turn, found from its first online
+        tick at or after `start`. Downloads act on the previous tick's state, so
+        they land one tick after it.
+        """
+        lag = 1 if phase == DOWNLOAD else 0
+        limit = self.total_ticks - lag
+        horizon = self._horizon(i)
+
+        tick = self.availability.first_online(i, start, min(horizon, limit))
+        if tick is not None:
+            self._push(tick + lag, phase, i)
+        elif horizon < limit:
+            self.parked.append((phase, i, max(start, horizon)))
+
+    def _queue_ready(self):
+        tick = self.downloader.next_ready_tick()
+        if tick is not None and tick not in self.ready_queued:
+            self.ready_queued.add(tick)
+            self._push(tick, CHUNK_READY)
+
+    def _chunk_ready(self, tick, _):
+        self.ready_queued.discard(tick)
+        self.downloader.complete_ready(tick)
+        self._queue_ready()
+
+    def _download(self, tick, i):
+        self._sync_nodes([i], tick - 1)
+        node = self.nodes[i]
+        self.downloader.visit(node, tick)
+        self._queue_ready()
+        self._search(DOWNLOAD, i, int(self.downloader.next_download_tick[i]) - 1)
+
+    def _blackout(self, tick, _):
+        self.blackout_manager.apply_blackout(tick)
+        self.blackout_tick = self.blackout_manager.next_apply_tick(tick)
+        if self.blackout_tick is not None:
+            self._push(self.blackout_tick, BLACKOUT)
+
+        parked, self.parked = self.parked, []
+        for phase, i, start in parked:
+            self._search(phase, i, start)
+
+    def _join(self, tick, i):
+        self._sync_nodes([i], tick)
+        self.availability.join(i, tick)
+
+        # Nodes online from the start were already seen by the downloader at tick 0
+        if self.downloader.next_download_tick[i] < 0:
+            self._push(tick + 1, DOWNLOAD, i)
+
+    def _repair(self, tick, _):
+        self._sync(tick)
+        self.repair.run(tick)
+        self._push(tick + self.repair.interval, REPAIR)
+
+    def _sample(self, tick, _):
+        self._sync(tick)
+        if self.sample is not None:
+            self.sample(tick)
+        self._push(tick + self.config.log_interval, SAMPLE)
+
+    def _upload(self, tick, _):
+        self._sync(tick)
+        self.uploaded_files.extend(self.uploader.upload(tick))
+
+        upload_tick = self.uploader.next_trigger(tick + 1, self.total_ticks)
+        if upload_tick is not None:
+            self._push(upload_tick, UPLOAD)
@@ -1,23 +1,41 @@
+import heapq
 import random
+import numpy as np
+
+from event_log import NO_EVENTS, DEBUG
+from erasure_coding import ReedSolomon
 
 class FileDownloader:
-    def __init__(self, config, nodes, nal, reverse_index, rng):
+    def __init__(self, config, nodes, nal, reverse_index, rng, host_index, registry, events=None):
         self.config = config
         self.nodes = nodes
         self.nal = nal
         self.reverse_index = reverse_index
         self.rng = rng
+        self.host_index = host_index  # chunk_id → online replica holders
+        self.registry = registry      # FileRegistry shared with the uploader
+        self.events = events if events is not None else NO_EVENTS
+        # refresh_hosts(chunk_ids, tick) brings the holders' online state up to
+        # date before a lookup; set by the event engine, which syncs lazily
+        self.refresh_hosts = None
 
         self.download_interval_range = (60, 300)  # 1–5 minutes in ticks
-        self.next_download_tick = {}  # node_id → next scheduled tick
-        self.pending_downloads = []
+        self.next_download_tick = np.full(len(nodes), -1, dtype=np.int64)  # position → next scheduled tick, -1 before first seen
+        self.pending_downloads = []   # min-heap of (ready_at, seq, file_name, chunk_id, node_id)
+        self.pending_seq = 0          # keeps same-tick jobs in the order they were queued
 
         # Tracking
         self.total_requests = 0
         self.successful_downloads = 0
         self.failed_downloads = 0
-        self.total_download_time = 0
-        self.download_durations = []
+        self.total_download_time = 0  # summed over completed downloads
+        self.completed_downloads = 0
+        self.reconstructed_stripes = 0  # erasure-coded stripes fetched with parity in place of data
+        self.decode_errors = 0          # reconstructions that did not give back the original chunks
+
+        self.coder = None
+        if getattr(config, "storage_mode", "replication") == "erasure":
+            self.coder = ReedSolomon(config.erasure_data_fragments, config.erasure_parity_fragments)
 
         self.downloaded_files = {}  # node_id → list of file names
         self.active_downloads = {}  # file_name → metadata
@@ -26,114 +44,238 @@ class FileDownloader:
         min_t, max_t = self.download_interval_range
         return current_tick + self.rng.randint(min_t, max_t)
 
-    def schedule_next(self, node_id, current_tick):
-        self.next_download_tick[node_id] = self._next_trigger(current_tick)
+    def schedule_next(self, i, current_tick):
+        self.next_download_tick[i] = self._next_trigger(current_tick)
 
     def tick(self, current_tick):
-        still_pending = []
+        self.complete_ready(current_tick)
 
-        for job in self.pending_downloads:
-            if current_tick < job["ready_at"]:
-                still_pending.append(job)
-                continue
+        # Online nodes seen for the first time or whose download is due, in node order
+        online = self.nodes.online[:len(self.nodes)]
+        due = online & (self.next_download_tick <= current_tick)
+        for i in np.flatnonzero(due):
+            self.visit(self.nodes[i], current_tick)
 
-            file_name = job["file_name"]
+    def next_ready_tick(self):
+        """Earliest tick at which a pending chunk transfer lands, or None."""
+        return self.pending_downloads[0][0] if self.pending_downloads else None
+
+    def complete_ready(self, current_tick):
+        pending = self.pending_downloads
+
+        while pending and pending[0][0] <= current_tick:
+            file_name = heapq.heappop(pending)[2]
             if file_name in self.active_downloads:
                 self.active_downloads[file_name]["chunks_downloaded"] += 1
                 if self.active_downloads[file_name]["chunks_downloaded"] >= self.active_downloads[file_name]["chunks_total"]:
+                    first = not self.active_downloads[file_name]["completed"]
                     self.active_downloads[file_name]["completed"] = True
                     duration = current_tick - self.active_downloads[file_name]["start_tick"]
-                    self.download_durations.append(duration)
+                    self.total_download_time += duration
+                    self.completed_downloads += 1
+                    if first and self.events.download:
+                        self.events.emit(current_tick, "download", "complete", file=file_name, duration=duration)
 
-        self.pending_downloads = still_pending
+    def visit(self, node, current_tick):
+        """Run one online node's download turn for `current_tick`."""
+        i = node.index
+        if self.next_download_tick[i] < 0:
+            self.schedule_next(i, current_tick)
 
-        for node in self.nodes:
-            if not node.online:
-                continue
+        if current_tick < self.next_download_tick[i]:
+            return
 
-            if node.id not in self.next_download_tick:
-                self.schedule_next(node.id, current_tick)
+        eligible_files = self.registry.replicated_files(node.id)
 
-            if current_tick < self.next_download_tick[node.id]:
-                continue
+        if not eligible_files:
+            self.schedule_next(i, current_tick)
+            return
 
-            eligible_files = [
-                f.file_name for f in node.files_uploaded
-                if getattr(node, "replication_status", {}).get(f.file_name) == "replicated"
-            ]
+        file_name = self.rng.choice(eligible_files)
+        file = self.registry.get(file_name)
+        if file.erasure is not None:
+            self._fetch_stripes(node, file, current_tick)
+            self.schedule_next(i, current_tick)
+            return
 
-            if not eligible_files:
-                self.schedule_next(node.id, current_tick)
-                continue
+        chunk_ids = self.nal.manifest.chunk_ids(file_name)
 
-            file_name = self.rng.choice(eligible_files)
-            chunk_ids = [
-                cid for cid in self.reverse_index
-                if cid.startswith(file_name + "_chunk_") and "replica" not in cid
-            ]
+        if not chunk_ids:
+            self.failed_downloads += 1
+            self.total_requests += 1
+            self.schedule_next(i, current_tick)
+            return
 
-            if not chunk_ids:
-                self.failed_downloads += 1
-                self.total_requests += 1
-                self.schedule_next(node.id, current_tick)
+        chunks_downloaded = set()
+        self.active_downloads[file_name] = {
+            "start_tick": current_tick,
+            "chunks_total": len(chunk_ids),
+            "chunks_downloaded": 0,
+            "completed": False
+        }
+
+        if self.refresh_hosts is not None:
+            self.refresh_hosts(chunk_ids, current_tick)
+        for chunk_id, hosts in zip(chunk_ids, self.host_index.online_hosts_each(chunk_ids)):
+            if chunk_id in chunks_downloaded:
                 continue
 
-            chunks_downloaded = set()
-            self.active_downloads[file_name] = {
-                "start_tick": current_tick,
-                "chunks_total": len(chunk_ids),
-                "chunks_downloaded": 0,
-                "completed": False
-            }
+            if not hosts:
+                continue  # silently skip this chunk
 
-            for chunk_id in chunk_ids:
-                if chunk_id in chunks_downloaded:
-                    continue
+            source = self.rng.choice(hosts)
+            self._queue_transfer(node, file_name, chunk_id, source, current_tick)
+            chunks_downloaded.add(chunk_id)
 
-                hosts = [
-                    peer for peer in self.nodes
-                    if peer.id in self.reverse_index.get(chunk_id, []) and peer.online
-                ]
-                if not hosts:
-                    continue  # silently skip this chunk
+        self.total_requests += 1
+        if len(chunks_downloaded) == len(chunk_ids):
+            self.successful_downloads += 1
+            self.downloaded_files.setdefault(node.id, []).append(file_name)
+            if self.events.download:
+                self.events.emit(current_tick, "download", "start", level=DEBUG, file=file_name,
+                                 node=node.id, chunks=len(chunk_ids))
+        else:
+            self.failed_downloads += 1
+            if self.events.download:
+                self.events.emit(current_tick, "download", "failed", file=file_name, node=node.id,
+                                 missing=len(chunk_ids) - len(chunks_downloaded))
 
-                source = self.rng.choice(hosts)
-                speed = min(source.upload_speed_mb_s, node.download_speed_mb_s)
-                ticks = max(1, int(self.config.chunk_size_mb / speed))
+        self.schedule_next(i, current_tick)
 
-                self.pending_downloads.append({
-                    "chunk_id": chunk_id,
-                    "file_name": file_name,
-                    "node_id": node.id,
-                    "ready_at": current_tick + ticks
-                })
+    def _queue_transfer(self, node, file_name, chunk_id, source, current_tick):
+        speed = min(self.nodes.upload_speed_mb_s[source.index], node.download_speed_mb_s)
+        ticks = max(1, int(self.config.chunk_size_mb / speed))
+        heapq.heappush(
+            self.pending_downloads,
+            (current_tick + ticks, self.pending_seq, file_name, chunk_id, node.id)
+        )
+        self.pending_seq += 1
 
-                chunks_downloaded.add(chunk_id)
+    def _fetch_stripes(self, node, file, current_tick):
+        """
+        Download turn for an erasure-coded file: every stripe needs any k of
+        its k + m fragments online. Data fragments are preferred, so parity
+        is only fetched in place of a missing one; the file succeeds when
+        every stripe can be rebuilt. One transfer per fetched fragment, so a
+        complete fetch is as many transfers as the file has chunks.
+        """
+        k, m, stripes = file.erasure
+        ids = file.chunk_ids  # fragment j of stripe s is ids[j * stripes + s]
+        num_chunks = max(1, -(-file.file_size // self.config.chunk_size_mb))
+        if self.refresh_hosts is not None:
+            self.refresh_hosts(ids, current_tick)
+        hosts = list(self.host_index.online_hosts_each(ids))
 
-            self.total_requests += 1
-            if len(chunks_downloaded) == len(chunk_ids):
-                self.successful_downloads += 1
-                self.downloaded_files.setdefault(node.id, []).append(file_name)
-            else:
-                self.failed_downloads += 1
+        self.active_downloads[file.file_name] = {
+            "start_tick": current_tick,
+            "chunks_total": num_chunks,
+            "chunks_downloaded": 0,
+            "completed": False
+        }
 
-            self.schedule_next(node.id, current_tick)
+        missing = 0
+        patterns = {}  # fragment positions used -> [(stripe, sources), ...] for stripes needing parity
+        for s in range(stripes):
+            chosen = []
+            for j in range(k + m):
+                if j < k and s * k + j >= num_chunks:
+                    chosen.append((j, None))  # zero padding, nothing to fetch
+                elif hosts[j * stripes + s]:
+                    chosen.append((j, hosts[j * stripes + s]))
+                if len(chosen) == k:
+                    break
+            if len(chosen) < k:
+                missing += 1
+                continue
 
-    def print_summary(self, total_ticks):
-        sim_minutes = total_ticks / 60
+            sources = []
+            for j, stripe_hosts in chosen:
+                if stripe_hosts is not None:
+                    source = self.rng.choice(stripe_hosts)
+                    self._queue_transfer(node, file.file_name, ids[j * stripes + s], source, current_tick)
+                    sources.append(source)
+                else:
+                    sources.append(None)
+            if chosen[-1][0] >= k:
+                self.reconstructed_stripes += 1
+                patterns.setdefault(tuple(j for j, _ in chosen), []).append((s, sources))
+
+        if self.nal.store_payloads:
+            for indices, group in patterns.items():
+                self._reconstruct(file, num_chunks, indices, group)
+
+        self.total_requests += 1
+        if not missing:
+            self.successful_downloads += 1
+            self.downloaded_files.setdefault(node.id, []).append(file.file_name)
+            if self.events.download:
+                self.events.emit(current_tick, "download", "start", level=DEBUG, file=file.file_name,
+                                 node=node.id, chunks=num_chunks, reconstructed=len(patterns))
+        else:
+            self.failed_downloads += 1
+            if self.events.download:
+                self.events.emit(current_tick, "download", "failed", file=file.file_name, node=node.id,
+                                 missing_stripes=missing)
+
+    def _reconstruct(self, file, num_chunks, indices, group):
+        """
+        Rebuild the data fragments of stripes that share one set of fetched
+        fragment positions, in one vectorized GF(256) decode, and check them
+        against the chunks that were uploaded.
+        """
+        k, _, stripes = file.erasure
+        ids = file.chunk_ids
+        buffers = [
+            [self.nal.download_chunk(ids[j * stripes + s], source.id) if source is not None else b""
+             for j, source in zip(indices, sources)]
+            for s, sources in group
+        ]
+        length = max(len(buffer) for row in buffers for buffer in row)
+        fragments = np.zeros((len(group), k, length), dtype=np.uint8)
+        for g, row in enumerate(buffers):
+            for r, buffer in enumerate(row):
+                fragments[g, r, :len(buffer)] = np.frombuffer(buffer, dtype=np.uint8)
+
+        data = self.coder.decode(indices, fragments)
+        for g, (s, _) in enumerate(group):
+            for j in range(k):
+                if j in indices:
+                    continue
+                expected = self.nal.chunk_payload(ids[j * stripes + s]) if s * k + j < num_chunks else b""
+                rebuilt = data[g, j]
+                if rebuilt[:len(expected)].tobytes() != expected or rebuilt[len(expected):].any():
+                    self.decode_errors += 1
+
+    def summary(self, total_ticks):
+        """The metrics `print_summary` reports, as a flat dict."""
         completed_downloads = self.successful_downloads
-        in_progress_downloads = len([
-            d for d in self.active_downloads.values()
-            if not d.get("completed", False)
-        ])
+        return {
+            "sim_minutes": total_ticks / 60,
+            "files_requested": self.total_requests,
+            "files_downloaded": completed_downloads,
+            "success_rate": 100 * completed_downloads / max(1, self.total_requests),
+            "avg_download_time": (
+                self.total_download_time / self.completed_downloads if self.completed_downloads else 0
+            ),
+            "in_progress": len([
+                d for d in self.active_downloads.values()
+                if not d.get("completed", False)
+            ]),
+            "failed_downloads": self.failed_downloads,
+            "reconstructed_stripes": self.reconstructed_stripes,
+            "decode_errors": self.decode_errors,
+        }
+
+    def print_summary(self, total_ticks):
+        summary = self.summary(total_ticks)
 
         print(f"\n[DOWNLOAD SUMMARY]")
-        print(f"  Simulation time     : {sim_minutes:.2f} min")
-        print(f"  Files requested     : {self.total_requests}")
-        print(f"  Files downloaded    : {completed_downloads}")
-        print(f"  Success rate        : {100 * completed_downloads / max(1, self.total_requests):.2f}%")
-
-        avg_time = (sum(self.download_durations) / len(self.download_durations)) if self.download_durations else 0
-        print(f"  Avg download time   : {avg_time:.2f} ticks")
-        print(f"  In-progress (excluded): {in_progress_downloads}")
-        print(f"  Failed downloads    : {self.failed_downloads}")
+        print(f"  Simulation time     : {summary['sim_minutes']:.2f} min")
+        print(f"  Files requested     : {summary['files_requested']}")
+        print(f"  Files downloaded    : {summary['files_downloaded']}")
+        print(f"  Success rate        : {summary['success_rate']:.2f}%")
+        print(f"  Avg download time   : {summary['avg_download_time']:.2f} ticks")
+        print(f"  In-progress (excluded): {summary['in_progress']}")
+        print(f"  Failed downloads    : {summary['failed_downloads']}")
+        if self.coder is not None:
+            print(f"  Rebuilt stripes     : {summary['reconstructed_stripes']} ({summary['decode_errors']} decode errors)")
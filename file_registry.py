@@ -0,0 +1,39 @@
+import numpy as np
+
+class FileRegistry:
+    """
+    Every file handed to the uploader, with its replication state.
+
+    Files that reach "replicated" are also listed per owner in upload order,
+    so the downloader can pick one without rescanning the owner's history.
+    """
+
+    def __init__(self):
+        self.files = {}                # file_name → SimFile
+        self.replicated_by_owner = {}  # owner node_id → [file_name, ...]
+
+    def register(self, file, num_chunks):
+        file.replication_status = "pending"
+        file.init_chunks(num_chunks)
+        self.files[file.file_name] = file
+
+    def record_replica(self, file, chunk_index):
+        file.chunk_replicas[chunk_index] += 1
+
+    def record_replicas(self, file, count, start=0):
+        """One more replica of each of the `count` chunks from index `start`."""
+        replicas = np.frombuffer(file.chunk_replicas, dtype=np.uint16)
+        replicas[start:start + count] += 1
+
+    def mark_failed(self, file):
+        file.replication_status = "failed"
+
+    def mark_replicated(self, file):
+        file.replication_status = "replicated"
+        self.replicated_by_owner.setdefault(file.owner.id, []).append(file.file_name)
+
+    def replicated_files(self, owner_id):
+        return self.replicated_by_owner.get(owner_id, [])
+
+    def get(self, file_name):
+        return self.files.get(file_name)
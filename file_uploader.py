@@ -1,12 +1,23 @@
+import math
+import numpy as np
+
 from import_files import receive_files
+from erasure_coding import ReedSolomon
+from file_registry import FileRegistry
+from event_log import NO_EVENTS, WARNING
 
 class FileUploader:
-    def __init__(self, rng, config, nodes, nal, reverse_index):
+    def __init__(self, rng, config, nodes, nal, reverse_index, host_index=None, registry=None, events=None,
+                 repair=None):
         self.rng = rng
         self.config = config
         self.nodes = nodes
         self.nal = nal
         self.reverse_index = reverse_index
+        self.host_index = host_index
+        self.registry = registry if registry is not None else FileRegistry()
+        self.events = events if events is not None else NO_EVENTS
+        self.repair = repair  # RepairScheduler tracking replicated placements, if enabled
 
         self.next_file_index = 0
         self.total_attempts = 0
@@ -15,21 +26,59 @@ class FileUploader:
         self.total_files_successful = 0
         self.total_data_uploaded_mb = 0
         self.disk_full_skips = 0
+        self.logical_data_mb = 0  # sizes of the files uploaded, before replication or coding
+
+        # A trigger fires each tick with probability file_upload_rate, so the
+        # gap to the next one is geometric: one draw per trigger, not per tick
+        self.trigger_rng = config.child_rng("upload_trigger")
+        self.next_upload_tick = self._trigger_gap()
+
+        mode = getattr(config, "storage_mode", "replication")
+        if mode not in ("replication", "erasure"):
+            raise ValueError(f"Unknown storage mode: {mode}")
+        self.storage_mode = mode
+        self.coder = (
+            ReedSolomon(config.erasure_data_fragments, config.erasure_parity_fragments) if mode == "erasure" else None
+        )
 
     def tick(self, current_tick):
-        ready_files = []
-
         # Exit early if upload is not triggered this tick
-        if self.rng.random() >= self.config.file_upload_rate:
-            return ready_files
+        if self.next_trigger(current_tick, current_tick + 1) is None:
+            return []
+
+        return self.upload(current_tick)
+
+    def _trigger_gap(self):
+        """Idle ticks before the next trigger: Bernoulli failures before the first success."""
+        rate = self.config.file_upload_rate
+        if rate >= 1:
+            return 0
+        if rate <= 0:
+            return math.inf
+        return int(math.log1p(-self.trigger_rng.random()) / math.log1p(-rate))
+
+    def next_trigger(self, start_tick, end_tick):
+        """
+        First upload trigger in [start_tick, end_tick), or None. Triggers
+        before `start_tick` are skipped; calling `tick` on every tick and
+        jumping between triggers consume the same draws.
+        """
+        while self.next_upload_tick < start_tick:
+            self.next_upload_tick += 1 + self._trigger_gap()
+        return self.next_upload_tick if self.next_upload_tick < end_tick else None
+
+    def upload(self, current_tick):
+        ready_files = []
 
         # Find eligible uploaders
         num_files = self.rng.randint(1, self.config.max_files_per_tick)
-        online_nodes = [n for n in self.nodes if n.online and n.free_space_gb > 0]
-        if not online_nodes:
+        count = len(self.nodes)
+        online_nodes = np.flatnonzero(self.nodes.online[:count] & (self.nodes.free_space_gb[:count] > 0))
+        if not len(online_nodes):
             return ready_files
 
-        chosen_node = self.rng.choice(online_nodes)
+        # Same draw as choosing from the list of online node objects, in node order
+        chosen_node = self.nodes[self.rng.choice(online_nodes)]
         files = receive_files(self.rng, self.next_file_index, num_files, chosen_node)
         self.next_file_index += num_files
         self.total_files_attempted += len(files)
@@ -37,64 +86,155 @@ class FileUploader:
         for file in files:
             chosen_node.files_uploaded.append(file)
             chunk_size = self.config.chunk_size_mb
-            replication_factor = self.config.replication_factor
             num_chunks = max(1, file.file_size // chunk_size + int(file.file_size % chunk_size > 0))
-
-            eligible_peers = self.nal.get_eligible_upload_targets(
+            if self.coder is not None:
+                stripes = -(-num_chunks // self.coder.k)
+                width = self.coder.k + self.coder.m  # one peer per fragment of a stripe
+                self.registry.register(file, stripes * width)
+            else:
+                width = self.config.replication_factor
+                self.registry.register(file, num_chunks)
+
+            # Targets are drawn from the live upload pool (registered online peers with free space) instead of
+            # sampling a full list of them, so a seed places replicas differently than runs before the pool.
+            # Returns min(eligible, 2 × width) peers, about 2 × width × N / eligible draws
+            candidates = self.nal.sample_upload_targets(
+                self.rng,
+                width * 2,
                 exclude_ids={chosen_node.id},
                 min_free_gb=(chunk_size / 1024)
             )
 
-            if len(eligible_peers) < replication_factor:
+            if len(candidates) < width:
+                self.registry.mark_failed(file)
+                if self.events.upload:
+                    self.events.emit(current_tick, "upload", "file_failed", file=file.file_name,
+                                     owner=chosen_node.id, candidates=len(candidates))
                 continue  # Not enough replication targets
 
             selected_peers = sorted(
-                self.rng.sample(eligible_peers, min(len(eligible_peers), replication_factor * 2)),
+                candidates,
                 key=lambda p: (p.free_space_gb, -p.upload_speed_mb_s)
-            )[:replication_factor]
-
-            for i in range(num_chunks):
-                chunk_id = f"{file.file_name}_chunk_{i}"
-                chunk_data = f"chunkdata:{chunk_id}".encode("utf-8")
-
+            )[:width]
+
+            if self.coder is not None:
+                self._place_fragments(file, num_chunks, stripes, selected_peers, chosen_node, current_tick)
+            else:
+                chunk_ids = self.nal.assign_chunk_ids(file.file_name, num_chunks)
+                # Metadata mode stores no payload; the network derives it on demand
+                chunk_data = [self.nal.chunk_payload(c) for c in chunk_ids] if self.nal.store_payloads else None
+
+                placed = self.nal.upload_chunks(file.file_name, chunk_ids, chunk_data,
+                                                [peer.id for peer in selected_peers], chosen_node.id,
+                                                chunk_size / 1024)
                 for peer in selected_peers:
-                    if peer.free_space_gb < (chunk_size / 1024):
-                        self.disk_full_skips += 1
-                        continue
-
-                    success = self.nal.upload_chunk(chunk_id, chunk_data, peer.id, uploader_id=chosen_node.id)
-                    self.total_attempts += 1
-
-                    if success:
-                        self.total_successes += 1
-                        peer.hosted_chunks.add(chunk_id)
-                        peer.free_space_gb -= (chunk_size / 1024)
-                        self.reverse_index.setdefault(chunk_id, set()).add(peer.id)
-                        self.total_data_uploaded_mb += chunk_size
-                    else:
-                        print(f"[UPLOAD FAILED] {chunk_id} to {peer.id}")
+                    self._record_placement(file, peer, placed[peer.id], chunk_ids, 0, current_tick)
+                if self.repair is not None:
+                    self.repair.track(file, chunk_ids, placed, selected_peers)
+
+            # The pool is only sampled between files, so re-class each peer once
+            for peer in selected_peers:
+                self.nal.update_free_space(peer)
 
             self.total_files_successful += 1
+            self.logical_data_mb += file.file_size
             ready_files.append(file)
-            for node in self.nodes:
-                if file.file_name in [f.file_name for f in node.files_uploaded]:
-                    node.replication_status[file.file_name] = "replicated"
+            self.registry.mark_replicated(file)
+            if self.events.upload:
+                self.events.emit(current_tick, "upload", "file_uploaded", file=file.file_name,
+                                 owner=chosen_node.id, chunks=num_chunks)
 
         return ready_files
 
-    def print_summary(self, total_ticks):
+    def _record_placement(self, file, peer, placed, chunk_ids, start, current_tick):
+        """Account for one peer's share of an upload_chunks call over `chunk_ids`."""
+        stored, skipped, failed = placed
+        self.disk_full_skips += skipped
+        self.total_attempts += stored + failed
+        self.total_successes += stored
+        self.total_data_uploaded_mb += stored * self.config.chunk_size_mb
+        self.registry.record_replicas(file, stored, start)
+        if self.host_index is not None:
+            self.host_index.add_replicas(chunk_ids[:stored], peer.id)
+        if failed and self.events.upload:
+            self.events.emit(current_tick, "upload", "chunk_failed", level=WARNING,
+                             file=file.file_name, peer=peer.id, chunks=failed,
+                             message="[UPLOAD FAILED] {chunks} chunk(s) of {file} to {peer}")
+
+    def _place_fragments(self, file, num_chunks, stripes, selected_peers, chosen_node, current_tick):
+        """
+        Erasure-coded placement: stripe s holds chunks [s*k, (s+1)*k) plus m
+        parity fragments, and fragment j of every stripe goes to
+        selected_peers[j]. Fragment j of stripe s is chunk id
+        ids[j * stripes + s], so each peer gets one contiguous id range.
+        Data slots past the last chunk are implicit zeros and not stored.
+        """
+        k, m = self.coder.k, self.coder.m
+        chunk_gb = self.config.chunk_size_mb / 1024
+        ids = self.nal.assign_chunk_ids(file.file_name, stripes * (k + m))
+        file.erasure = (k, m, stripes)
+        file.chunk_ids = ids
+        payloads = self._encode(ids, num_chunks, stripes) if self.nal.store_payloads else None
+
+        for j, peer in enumerate(selected_peers):
+            count = stripes if j >= k else (num_chunks - 1 - j) // k + 1
+            start = j * stripes
+            column = ids[start:start + count]
+            data = payloads[start:start + count] if payloads is not None else None
+            placed = self.nal.upload_chunks(file.file_name, column, data, [peer.id], chosen_node.id, chunk_gb)
+            self._record_placement(file, peer, placed[peer.id], column, start, current_tick)
+
+    def _encode(self, ids, num_chunks, stripes):
+        """Fragment payloads aligned with `ids`: data chunks as is, parity from the GF(256) encoder."""
+        k = self.coder.k
+        buffers = [
+            [self.nal.chunk_payload(ids[j * stripes + s]) if s * k + j < num_chunks else b"" for j in range(k)]
+            for s in range(stripes)
+        ]
+        length = max(len(buffer) for stripe in buffers for buffer in stripe)
+        data = np.zeros((stripes, k, length), dtype=np.uint8)
+        for s, stripe in enumerate(buffers):
+            for j, buffer in enumerate(stripe):
+                data[s, j, :len(buffer)] = np.frombuffer(buffer, dtype=np.uint8)
+        parity = self.coder.encode(data)
+
+        payloads = [None] * len(ids)
+        for s, stripe in enumerate(buffers):
+            for j, buffer in enumerate(stripe):
+                payloads[j * stripes + s] = buffer
+            for i in range(self.coder.m):
+                payloads[(k + i) * stripes + s] = parity[s, i].tobytes()
+        return payloads
+
+    def summary(self, total_ticks):
+        """The metrics `print_summary` reports, as a flat dict."""
         total_gb = self.total_data_uploaded_mb / 1024
-        avg_file_size_gb = total_gb / max(1, self.total_files_successful)
-        sim_hours = total_ticks / 3600
+        return {
+            "sim_hours": total_ticks / 3600,
+            "files_attempted": self.total_files_attempted,
+            "files_uploaded": self.total_files_successful,
+            "success_rate": 100 * self.total_files_successful / max(1, self.total_files_attempted),
+            "data_uploaded_gb": total_gb,
+            "avg_file_size_gb": total_gb / max(1, self.total_files_successful),
+            "disk_full_skips": self.disk_full_skips,
+            "logical_data_gb": self.logical_data_mb / 1024,
+            "storage_overhead": self.total_data_uploaded_mb / max(1, self.logical_data_mb),
+            "underutilized_peers": sum(1 for n in self.nodes if len(n.hosted_chunks) < 100),
+        }
+
+    def print_summary(self, total_ticks):
+        summary = self.summary(total_ticks)
 
         print(f"\n[SUMMARY]")
-        print(f"  Simulation time  : {sim_hours:.2f} hours")
-        print(f"  Files attempted  : {self.total_files_attempted}")
-        print(f"  Files uploaded   : {self.total_files_successful}")
-        print(f"  Success rate     : {100 * self.total_files_successful / max(1, self.total_files_attempted):.2f}%")
-        print(f"  Data uploaded    : {total_gb:.2f} GB")
-        print(f"  Avg file size    : {avg_file_size_gb:.2f} GB")
-        print(f"  Disk full skips  : {self.disk_full_skips}")
+        print(f"  Simulation time  : {summary['sim_hours']:.2f} hours")
+        print(f"  Files attempted  : {summary['files_attempted']}")
+        print(f"  Files uploaded   : {summary['files_uploaded']}")
+        print(f"  Success rate     : {summary['success_rate']:.2f}%")
+        print(f"  Data uploaded    : {summary['data_uploaded_gb']:.2f} GB")
+        print(f"  Avg file size    : {summary['avg_file_size_gb']:.2f} GB")
+        print(f"  Disk full skips  : {summary['disk_full_skips']}")
+        print(f"  Storage mode     : {self.storage_mode}")
+        print(f"  Storage overhead : {summary['storage_overhead']:.2f}x")
 
         print(f"\n[HOSTED CHUNKS PER NODE]")
         sorted_nodes = sorted(
@@ -107,5 +247,4 @@ class FileUploader:
             gb = (count * self.config.chunk_size_mb) / 1024
             print(f"{node.id} (score: {node.score}) : {count} chunk(s), {gb:.2f} GB")
 
-        underutilized = [n for n in self.nodes if len(n.hosted_chunks) < 100]
-        print(f"\n[UNDERUTILIZED PEERS]: {len(underutilized)} nodes with < 100 chunks")
+        print(f"\n[UNDERUTILIZED PEERS]: {summary['underutilized_peers']} nodes with < 100 chunks")
@@ -2,23 +2,93 @@ import os
 import random
 import datetime
 import argparse
-import csv
-import matplotlib.pyplot as plt
-import pandas as pd
-
-from config import SimulationConfig
-from sim_clock import SimClock
-from file_uploader import FileUploader
-from node_generator import generate_nodes
-from blackout_manager import BlackoutManager
-from network.memory_backend import InMemoryNetwork
-from file_downloader import FileDownloader
+import json
+
+from availability_engine import AvailabilityEngine
+from simulation import Simulation
+from batch_runner import run_seed
+from simulation_state import save_snapshot, load_snapshot
+from tick_profiler import TickProfiler
+from event_log import EventLog, CATEGORIES, LEVELS
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Run Wormhole simulation.")
     parser.add_argument("--seed", type=int, help="use seed to generate a repeatable simulation outcome")
     parser.add_argument("--blackout", action="store_true", help="enable a regional blackout scenario after day 1")
-    return parser.parse_args()
+    parser.add_argument("--availability", choices=AvailabilityEngine.MODES, default="vectorized",
+                        help="'reference' reproduces the per-node is_online loop exactly for a seed")
+    parser.add_argument("--engine", choices=("tick", "event"), default="tick",
+                        help="'event' only visits ticks with scheduled work; same summaries for a seed. Samples "
+                             "and upload triggers still sync every node, so it only pays off when both are sparse")
+    parser.add_argument("--chunk-storage", choices=("payload", "metadata"), default="payload",
+                        help="'metadata' keeps interned chunk ids only and derives payloads on demand")
+    parser.add_argument("--node-generation", choices=("sequential", "bulk"), default="sequential",
+                        help="'bulk' draws node attributes as whole arrays; fast, but a different population per seed")
+    parser.add_argument("--random-streams", choices=("sequential", "counter"), default="sequential",
+                        help="'counter' keys daylight draws by (node, tick) so every availability mode agrees")
+    parser.add_argument("--storage", choices=("replication", "erasure"), default="replication",
+                        help="'erasure' stores Reed-Solomon stripes instead of full replicas")
+    parser.add_argument("--compare-storage", action="store_true",
+                        help="also run the other storage mode with the same seed and churn and compare the two")
+    parser.add_argument("--network", choices=("memory", "loopback"), default="memory",
+                        help="'loopback' moves chunk bytes over asyncio TCP peers on localhost; slow, for protocol measurements")
+    parser.add_argument("--repair", action="store_true",
+                        help="re-replicate chunks that lost online replicas, under a bandwidth budget")
+    parser.add_argument("--plot", action="store_true", help="show the connected-nodes plot when the run ends")
+    parser.add_argument("--plot-file", metavar="FILE", help="save the connected-nodes plot to FILE when the run ends")
+    parser.add_argument("--events", default=",".join(CATEGORIES),
+                        help=f"comma-separated event categories to log to logs/events.jsonl ({', '.join(CATEGORIES)}), or 'none'")
+    parser.add_argument("--log-level", choices=LEVELS, default="info")
+    parser.add_argument("--echo", default="blackout",
+                        help="comma-separated logged categories to also print, or 'none'")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every phase and network call; writes logs/profile.json")
+    parser.add_argument("--cprofile", metavar="START:STOP",
+                        help="also run cProfile over ticks [START, STOP); implies --profile")
+    parser.add_argument("--snapshot", metavar="DIR", help="save the full simulation state to DIR at --snapshot-at")
+    parser.add_argument("--snapshot-at", type=int, metavar="TICK", help="tick at which to save --snapshot")
+    parser.add_argument("--resume", metavar="DIR", help="continue the run saved in snapshot DIR; other run options are ignored")
+    args = parser.parse_args()
+    if (args.snapshot is None) != (args.snapshot_at is None):
+        parser.error("--snapshot and --snapshot-at go together")
+    if args.snapshot and args.network == "loopback":
+        parser.error("--snapshot needs the memory network; loopback peers hold live sockets")
+    return args
+
+METRICS_PATH = "logs/metrics.bin"
+EVENTS_PATH = "logs/events.jsonl"
+
+def _categories(text):
+    return () if text == "none" else tuple(c for c in text.split(",") if c)
+
+# (summary section, metric, label) rows of the storage comparison
+STORAGE_COMPARISON = (
+    ("upload", "storage_overhead", "Storage overhead (x)"),
+    ("upload", "data_uploaded_gb", "Upload volume (GB)"),
+    ("upload", "files_uploaded", "Files uploaded"),
+    ("download", "files_requested", "Downloads requested"),
+    ("download", "success_rate", "Download success (%)"),
+)
+
+def compare_storage(sim, overrides, args):
+    """Run the other storage mode headless on the same seed and print both side by side."""
+    mode = sim.uploader.storage_mode
+    other = "erasure" if mode == "replication" else "replication"
+    record = run_seed(sim.config.seed, {**overrides, "storage_mode": other}, engine=args.engine,
+                      availability_mode=args.availability, blackout=args.blackout)
+
+    summary = sim.summary()
+    comparison = {
+        mode: {f"{section}_{key}": summary[section][key] for section, key, _ in STORAGE_COMPARISON},
+        other: {f"{section}_{key}": record[f"{section}_{key}"] for section, key, _ in STORAGE_COMPARISON},
+    }
+
+    print(f"\n[STORAGE COMPARISON] seed {sim.config.seed}, same churn")
+    print(f"  {'':22s}  {'replication':>12s}  {'erasure':>12s}")
+    for section, key, label in STORAGE_COMPARISON:
+        name = f"{section}_{key}"
+        print(f"  {label:22s}  {comparison['replication'][name]:12.2f}  {comparison['erasure'][name]:12.2f}")
+    return comparison
 
 def save_seed(seed: int, output_dir: str = "logs/seeds"):
     os.makedirs(output_dir, exist_ok=True)
@@ -29,97 +99,68 @@ def save_seed(seed: int, output_dir: str = "logs/seeds"):
 
 def main():
     args = parse_args()
-    seed = args.seed if args.seed is not None else random.randint(1, 1_000_000)
-    save_seed(seed)
-
-    config = SimulationConfig(seed=seed)
-    nal = InMemoryNetwork(seed=seed, config=config)
-    clock = SimClock()
-
-    node_rng = config.child_rng("nodes")
-    nodes = generate_nodes(node_rng, config.total_nodes, config, nal)
-
-    reverse_index = {}
-    file_rng = config.child_rng("file")
-    uploader = FileUploader(file_rng, config, nodes, nal, reverse_index)
-
-    file_downloader = FileDownloader(
-        config=config,
-        nodes=nodes,
-        nal=nal,
-        reverse_index=reverse_index,
-        rng=config.child_rng("downloader_rng")
-    )
-
-    blackout_manager = BlackoutManager(config, nodes) if args.blackout else None
-
-    for node in nodes:
-        node.was_online_last_tick = False
-
-    all_uploaded_files = []
-    connected_counts = []
-    connected_count = sum(1 for n in nodes if n.online and n.has_joined)
-
-    for _ in range(config.total_ticks):
-        current_tick = clock.current()
-        file_downloader.tick(current_tick)
-
-        if current_tick == 0:
-            for profile, weight in config.behavior_distribution.items():
-                print(f"  - {profile:15s}: {weight*100:.1f}%")
-
-        if blackout_manager:
-            blackout_manager.apply_blackout(current_tick)
-
-        for node in nodes:
-            node.online = node.behavior_profile_instance.is_online(current_tick, node)
-
-            if not node.has_joined and node.online:
-                node.attempt_join(current_tick)
-                node.last_bootstrap_tick = current_tick
-
-            came_online = node.online and not node.was_online_last_tick
-            went_offline = not node.online and node.was_online_last_tick
-
-            if came_online and node.has_joined:
-                connected_count += 1
-            elif went_offline and node.has_joined:
-                connected_count -= 1
-
-            node.was_online_last_tick = node.online
-
-        connected_counts.append((current_tick, connected_count))
-        nal.config.current_tick = current_tick
-
-        new_files = uploader.tick(current_tick)
-        all_uploaded_files.extend(new_files)
-
-        clock.advance()
-
-    uploader.print_summary(clock.tick)
-    file_downloader.print_summary(clock.tick)
 
     os.makedirs("logs", exist_ok=True)
-    with open("logs/connected_counts.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["tick", "connected_nodes"])
-        for tick, count in connected_counts:
-            if tick % config.log_interval == 0:
-                writer.writerow([tick, count])
-
-    df = pd.read_csv("logs/connected_counts.csv")
-    df["smoothed"] = df["connected_nodes"].rolling(window=100, min_periods=1).mean()
-
-    plt.plot(df["tick"], df["connected_nodes"], alpha=0.3, label="Raw Data", linewidth=0.5)
-    plt.plot(df["tick"], df["smoothed"], label="Smoothed (100 tick avg)", linewidth=1.5)
-
-    plt.xlabel("Tick")
-    plt.ylabel("Connected Nodes")
-    plt.title("Connected Node Count Over Time")
-    plt.grid(True)
-    plt.legend()
-    plt.tight_layout()
-    plt.show()
+
+    if args.resume:
+        sim = load_snapshot(args.resume)
+        sim.metrics.attach(METRICS_PATH)
+        sim.events.open(EVENTS_PATH)
+        print(f"[RESUME] seed {sim.config.seed} at tick {sim.clock.tick} from {args.resume}")
+    else:
+        seed = args.seed if args.seed is not None else random.randint(1, 1_000_000)
+        save_seed(seed)
+
+        overrides = {"chunk_storage": args.chunk_storage, "node_generation": args.node_generation,
+                     "random_streams": args.random_streams, "storage_mode": args.storage,
+                     "repair_enabled": args.repair, "network_backend": args.network}
+        sim = Simulation.from_seed(
+            seed,
+            overrides=overrides,
+            engine=args.engine,
+            availability_mode=args.availability,
+            blackout=args.blackout,
+            metrics_path=METRICS_PATH,
+            events=EventLog(EVENTS_PATH, args.log_level, _categories(args.events), echo=_categories(args.echo))
+        )
+
+    profiler = None
+    if args.profile or args.cprofile:
+        window = tuple(int(t) for t in args.cprofile.split(":")) if args.cprofile else None
+        profiler = TickProfiler(cprofile_window=window).attach(sim)
+
+    if args.snapshot:
+        sim.run(args.snapshot_at)
+        if profiler is not None:
+            profiler.detach()  # the timing shims are not part of the saved state
+        meta = save_snapshot(sim, args.snapshot)
+        if profiler is not None:
+            profiler.attach(sim)
+        print(f"[SNAPSHOT] tick {meta['tick']} saved to {args.snapshot}")
+
+    config = sim.config
+    sim.run()
+    sim.metrics.close()
+    sim.events.close()
+    sim.nal.close()
+    sim.print_summary()
+
+    if profiler is not None:
+        profiler.finish()
+        profiler.print_summary()
+        profiler.write("logs/profile.json")
+
+    run_summary = {"seed": config.seed, "ticks": sim.clock.tick, "engine": sim.engine, **sim.summary()}
+    if args.compare_storage and not args.resume:
+        run_summary["storage_comparison"] = compare_storage(sim, overrides, args)
+
+    with open("logs/run_summary.json", "w") as f:
+        json.dump(run_summary, f, indent=2)
+
+    # Plotting pulls in pandas and matplotlib, so the report stage loads only on request
+    if args.plot or args.plot_file:
+        import report
+        report.plot_connected_counts(report.load_metrics(METRICS_PATH), args.plot_file)
 
 if __name__ == "__main__":
     main()
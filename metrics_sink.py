@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+
+import numpy as np
+
+MAGIC = b"WHMETRIC"
+HEADER_ALIGN = 64  # records start on an aligned offset so reads can memory-map them
+
+COLUMNS = np.dtype([
+    ("tick", np.int64),
+    ("connected_nodes", np.int64),
+    ("files_uploaded", np.int64),      # cumulative
+    ("files_downloaded", np.int64),    # cumulative
+    ("in_flight", np.int64),           # chunk transfers queued but not landed
+    ("free_capacity_gb", np.float64),  # free space across online nodes
+])
+
+class MetricsSink:
+    """
+    Streams per-tick time series into fixed-size binary records.
+
+    Only ticks on `interval` are kept. Rows collect in a block of
+    `block_rows` and are appended to `path` when the block fills, so memory
+    stays flat and a reader can follow the file while the run goes on. With
+    no path the blocks stay in memory instead.
+
+    File layout: MAGIC, a uint32 header length, a JSON header with the
+    column dtype, padding to HEADER_ALIGN bytes, then the raw records.
+    """
+
+    def __init__(self, path=None, interval=1, block_rows=64, meta=None):
+        self.interval = interval
+        self.block = np.zeros(block_rows, dtype=COLUMNS)
+        self.pending = 0   # rows in self.block not yet written out
+        self.rows_written = 0
+        self.blocks = []   # flushed blocks, when there is no file
+        self.meta = dict(meta or {})
+        self.path = None
+        self.file = None
+        if path is not None:
+            self.attach(path)
+
+    def attach(self, path):
+        """Start writing to `path`, beginning with every row recorded so far."""
+        history = self.rows() if self.rows_written or self.pending else None
+        self.close()
+
+        header = json.dumps({"columns": COLUMNS.descr, "interval": self.interval, **self.meta}).encode()
+        size = len(MAGIC) + 4 + len(header)
+        header += b" " * (-size % HEADER_ALIGN)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.path = path
+        self.blocks = []
+        self.pending = 0
+        self.rows_written = 0
+
+        if history is not None:
+            self.file.write(history.tobytes())
+            self.rows_written = len(history)
+        self.file.flush()
+
+    def record(self, tick, connected_nodes, files_uploaded, files_downloaded, in_flight, free_capacity_gb):
+        if tick % self.interval:
+            return
+        self.block[self.pending] = (tick, connected_nodes, files_uploaded, files_downloaded,
+                                    in_flight, free_capacity_gb)
+        self.pending += 1
+        if self.pending == len(self.block):
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = self.block[:self.pending]
+        if self.file is not None:
+            self.file.write(rows.tobytes())
+            self.file.flush()
+        else:
+            self.blocks.append(rows.copy())
+        self.rows_written += self.pending
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def rows(self):
+        """Every row recorded so far, as a structured array."""
+        self.flush()
+        if self.path is not None:
+            return np.array(read_metrics(self.path)[:self.rows_written])
+        if not self.blocks:
+            return np.zeros(0, dtype=COLUMNS)
+        return np.concatenate(self.blocks)
+
+    def __len__(self):
+        return self.rows_written + self.pending
+
+    def __getstate__(self):
+        # Snapshots carry the rows so far instead of the open file; attach()
+        # on the restored sink writes them out to the resumed run's file
+        state = self.__dict__.copy()
+        state.update(blocks=[self.rows()], pending=0, path=None, file=None)
+        state["rows_written"] = len(state["blocks"][0])
+        return state
+
+
+def _read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a metrics file")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + 4 + length
+
+def read_metrics(path, start=0):
+    """
+    Rows from `start` on, memory-mapped read-only. Safe while the file is
+    being written: a partly written last record is left out.
+    """
+    header, offset = _read_header(path)
+    dtype = np.dtype([tuple(column) for column in header["columns"]])
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count <= start:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))[start:]
+
+def follow(path, poll_seconds=1.0, idle_timeout=None):
+    """Yield blocks of new rows as a running simulation appends them."""
+    seen = 0
+    idle_since = time.monotonic()
+    while True:
+        rows = read_metrics(path, seen) if os.path.exists(path) else ()
+        if len(rows):
+            seen += len(rows)
+            idle_since = time.monotonic()
+            yield rows
+        elif idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+            return
+        else:
+            time.sleep(poll_seconds)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the rows of a metrics file, optionally as they arrive.")
+    parser.add_argument("path", nargs="?", default="logs/metrics.bin")
+    parser.add_argument("--follow", action="store_true", help="keep printing rows as the run appends them")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="stop following after this many idle seconds")
+    args = parser.parse_args(argv)
+
+    print("  ".join(COLUMNS.names))
+    blocks = follow(args.path, idle_timeout=args.idle_timeout) if args.follow else [read_metrics(args.path)]
+    for rows in blocks:
+        for row in rows:
+            print("  ".join(f"{row[name]:.2f}" if name == "free_capacity_gb" else str(row[name])
+                            for name in COLUMNS.names))
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
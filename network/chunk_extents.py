@@ -0,0 +1,113 @@
+# network/chunk_extents.py
+
+from bisect import bisect_left, bisect_right, insort
+
+class ChunkExtentIndex:
+    """
+    Chunk id -> hosts, stored as [start, stop) extents of interned ids that
+    share one host tuple.
+
+    Every chunk of an upload goes to the same peers, so a file placed on r
+    peers is one extent per distinct prefix length (usually one), not
+    chunks x replicas entries. An extent is split only where chunks
+    diverge, e.g. when one replica is removed, and neighbours that end up
+    with the same hosts again are merged. Lookups bisect the extent
+    starts. Hosts are kept as sorted tuples, so a lookup returns them in a
+    fixed order; `get` mirrors dict.get for code written against a
+    chunk_id -> hosts mapping.
+    """
+
+    def __init__(self):
+        self.starts = []  # ascending; extents are disjoint
+        self.stops = []
+        self.hosts = []   # sorted tuple of hosts per extent
+
+    def _find(self, chunk_id):
+        i = bisect_right(self.starts, chunk_id) - 1
+        return i if i >= 0 and chunk_id < self.stops[i] else None
+
+    def _split(self, at):
+        """Make `at` an extent boundary; returns the index of the first extent starting at or after it."""
+        i = bisect_right(self.starts, at) - 1
+        if i >= 0 and self.starts[i] < at < self.stops[i]:
+            self.starts.insert(i + 1, at)
+            self.stops.insert(i + 1, self.stops[i])
+            self.hosts.insert(i + 1, self.hosts[i])
+            self.stops[i] = at
+        return bisect_left(self.starts, at)
+
+    def add(self, start, stop, host):
+        """Add `host` to every chunk in [start, stop)."""
+        if start >= stop:
+            return
+        starts, stops, hosts = self.starts, self.stops, self.hosts
+        if not starts or start >= stops[-1]:
+            starts.append(start)
+            stops.append(stop)
+            hosts.append((host,))
+            self._merge(len(starts) - 2, len(starts) - 1)
+            return
+
+        first = i = self._split(start)
+        self._split(stop)
+        at = start
+        while at < stop:
+            if i < len(starts) and starts[i] == at:
+                if host not in hosts[i]:
+                    merged = list(hosts[i])
+                    insort(merged, host)
+                    hosts[i] = tuple(merged)
+                at = stops[i]
+            else:
+                # Gap up to the next extent, or to stop
+                end = min(stop, starts[i]) if i < len(starts) else stop
+                starts.insert(i, at)
+                stops.insert(i, end)
+                hosts.insert(i, (host,))
+                at = end
+            i += 1
+        self._merge(first - 1, i)
+
+    def discard(self, chunk_id, host):
+        """Remove `host` from one chunk, splitting its extent if needed."""
+        i = self._find(chunk_id)
+        if i is None or host not in self.hosts[i]:
+            return
+        self._split(chunk_id)
+        i = self._split(chunk_id + 1) - 1
+        self.hosts[i] = tuple(h for h in self.hosts[i] if h != host)
+        self._merge(i - 1, i + 1)
+
+    def _merge(self, lo, hi):
+        """Merge touching extents with equal hosts among extents lo..hi."""
+        starts, stops, hosts = self.starts, self.stops, self.hosts
+        i = max(lo, 0)
+        hi = min(hi, len(starts) - 1)
+        while i < hi:
+            if stops[i] == starts[i + 1] and hosts[i] == hosts[i + 1]:
+                stops[i] = stops[i + 1]
+                del starts[i + 1], stops[i + 1], hosts[i + 1]
+                hi -= 1
+            else:
+                i += 1
+
+    def get(self, chunk_id, default=None):
+        i = self._find(chunk_id)
+        return default if i is None else self.hosts[i]
+
+    def extent(self, chunk_id):
+        """(start, stop, hosts) of the extent holding `chunk_id`, or None."""
+        i = self._find(chunk_id)
+        return None if i is None else (self.starts[i], self.stops[i], self.hosts[i])
+
+    def extents(self):
+        return zip(self.starts, self.stops, self.hosts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __sizeof__(self):
+        size = object.__sizeof__(self)
+        for column in (self.starts, self.stops, self.hosts):
+            size += column.__sizeof__()
+        return size + sum(hosts.__sizeof__() for hosts in self.hosts)
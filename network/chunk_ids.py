@@ -0,0 +1,166 @@
+# network/chunk_ids.py
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+class ChunkIdTable:
+    """
+    Interns chunks as integer ids, one contiguous range per file.
+
+    Only the first id of each file is stored, so a file with 100k chunks costs
+    one entry here. Chunk names are derived on demand as
+    "<file_id>_chunk_<index>", the same string ids the payload mode uses.
+    """
+
+    def __init__(self):
+        self.bases = []     # first chunk id of each file, ascending
+        self.file_ids = []  # file_id for each entry in bases
+        self.next_id = 0
+
+    def register_file(self, file_id: str, num_chunks: int) -> range:
+        base = self.next_id
+        self.bases.append(base)
+        self.file_ids.append(file_id)
+        self.next_id += num_chunks
+        return range(base, base + num_chunks)
+
+    def locate(self, chunk_id: int) -> tuple[str, int]:
+        """(file_id, chunk index) for an interned id."""
+        if not 0 <= chunk_id < self.next_id:
+            raise KeyError(chunk_id)
+        i = bisect_right(self.bases, chunk_id) - 1
+        return self.file_ids[i], chunk_id - self.bases[i]
+
+    def name(self, chunk_id: int) -> str:
+        file_id, index = self.locate(chunk_id)
+        return f"{file_id}_chunk_{index}"
+
+    def __len__(self):
+        return self.next_id
+
+
+class ChunkIdSet:
+    """
+    Set of interned chunk ids held as a sorted array of int64, 8 bytes per id.
+
+    Ids are handed out in ascending order and placed in upload order, so `add`
+    is almost always an append; membership is a bisect.
+    """
+
+    def __init__(self, chunk_ids=()):
+        self.ids = array("q", sorted(set(chunk_ids)))
+
+    def add(self, chunk_id: int) -> None:
+        ids = self.ids
+        if not ids or chunk_id > ids[-1]:
+            ids.append(chunk_id)
+            return
+        i = bisect_left(ids, chunk_id)
+        if ids[i] != chunk_id:
+            ids.insert(i, chunk_id)
+
+    def update(self, chunk_ids) -> None:
+        """Add ascending ids; a run above the current maximum is one extend."""
+        ids = self.ids
+        if len(chunk_ids) and (not ids or chunk_ids[0] > ids[-1]):
+            ids.extend(array("q", chunk_ids))
+            return
+        for chunk_id in chunk_ids:
+            self.add(chunk_id)
+
+    def discard(self, chunk_id: int) -> None:
+        ids = self.ids
+        i = bisect_left(ids, chunk_id)
+        if i < len(ids) and ids[i] == chunk_id:
+            del ids[i]
+
+    def __contains__(self, chunk_id) -> bool:
+        ids = self.ids
+        i = bisect_left(ids, chunk_id)
+        return i < len(ids) and ids[i] == chunk_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self.ids.__sizeof__()
+
+
+class ChunkRangeSet:
+    """
+    Set of interned chunk ids held as sorted, disjoint [start, stop) runs.
+
+    A file's chunks placed on one peer are one run of ids, so holding them
+    costs two ints however large the file is. Removing a chunk from inside
+    a run splits it in two.
+    """
+
+    def __init__(self, chunk_ids=()):
+        self.starts = array("q")
+        self.stops = array("q")
+        self.count = 0
+        for chunk_id in sorted(set(chunk_ids)):
+            self.add(chunk_id)
+
+    def add_run(self, start: int, stop: int) -> None:
+        """Add every id in [start, stop), merging with the runs it touches."""
+        if start >= stop:
+            return
+        starts, stops = self.starts, self.stops
+        if not starts or start > stops[-1]:
+            starts.append(start)
+            stops.append(stop)
+            self.count += stop - start
+            return
+
+        i = bisect_left(stops, start)   # first run ending at or after start
+        j = bisect_right(starts, stop)  # runs from i up to j touch [start, stop]
+        if i < j:
+            removed = sum(stops[k] - starts[k] for k in range(i, j))
+            start, stop = min(start, starts[i]), max(stop, stops[j - 1])
+        else:
+            removed = 0
+        starts[i:j] = array("q", (start,))
+        stops[i:j] = array("q", (stop,))
+        self.count += stop - start - removed
+
+    def add(self, chunk_id: int) -> None:
+        self.add_run(chunk_id, chunk_id + 1)
+
+    def update(self, chunk_ids) -> None:
+        if isinstance(chunk_ids, range) and chunk_ids.step == 1:
+            self.add_run(chunk_ids.start, chunk_ids.stop)
+            return
+        for chunk_id in chunk_ids:
+            self.add(chunk_id)
+
+    def discard(self, chunk_id: int) -> None:
+        starts, stops = self.starts, self.stops
+        i = bisect_right(starts, chunk_id) - 1
+        if i < 0 or chunk_id >= stops[i]:
+            return
+        start, stop = starts[i], stops[i]
+        pieces = [(a, b) for a, b in ((start, chunk_id), (chunk_id + 1, stop)) if a < b]
+        starts[i:i + 1] = array("q", (a for a, _ in pieces))
+        stops[i:i + 1] = array("q", (b for _, b in pieces))
+        self.count -= 1
+
+    def runs(self):
+        return zip(self.starts, self.stops)
+
+    def __contains__(self, chunk_id) -> bool:
+        i = bisect_right(self.starts, chunk_id) - 1
+        return i >= 0 and chunk_id < self.stops[i]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for start, stop in self.runs():
+            yield from range(start, stop)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self.starts.__sizeof__() + self.stops.__sizeof__()
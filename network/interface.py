@@ -16,6 +16,10 @@ class PeerDiscoveryClient(ABC):
 class ChunkTransferClient(ABC):
     @abstractmethod
     def upload_chunk(self, chunk_id: str, chunk_data: bytes, target_peer: str) -> bool: ...
+
+    @abstractmethod
+    def upload_chunks(self, file_id: str, chunk_ids, chunk_data, target_peers: list[str], uploader_id: str,
+                      chunk_size_gb: float) -> dict[str, tuple[int, int, int]]: ...
     
     @abstractmethod
     def download_chunk(self, chunk_id: str, source_peer: str) -> bytes: ...
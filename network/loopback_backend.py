@@ -0,0 +1,541 @@
+# network/loopback_backend.py
+
+import time
+import struct
+import asyncio
+import threading
+import contextlib
+from collections import OrderedDict, defaultdict
+
+from network.memory_backend import InMemoryNetwork
+from network.chunk_ids import ChunkRangeSet
+from tick_profiler import LatencyHistogram
+
+REQUEST = struct.Struct("!BIHI")   # op, request id, key length, body length; then key and body
+RESPONSE = struct.Struct("!IBI")   # request id, status, body length; then body
+
+PUT, GET, DELETE, CLEAR = range(1, 5)
+OK, MISSING = 0, 1
+
+def _key(chunk_id) -> bytes:
+    return str(chunk_id).encode("utf-8")
+
+
+class PeerServer:
+    """
+    One simulated peer's chunk store behind an asyncio TCP server on
+    127.0.0.1. Requests on a connection are answered in arrival order.
+    """
+
+    def __init__(self):
+        self.chunks = {}   # key bytes -> payload bytes
+        self.server = None
+        self.port = None
+        self.ready = None  # task starting the server; awaited by every client
+        self.handlers = set()  # tasks serving open connections
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _serve(self, reader, writer):
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        try:
+            while True:
+                op, request_id, key_len, body_len = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                key = await reader.readexactly(key_len) if key_len else b""
+                body = await reader.readexactly(body_len) if body_len else b""
+                status, reply = self._handle(op, key, body)
+                writer.writelines((RESPONSE.pack(request_id, status, len(reply)), reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass  # client closed the connection, or the server is shutting down
+        finally:
+            self.handlers.discard(task)
+            writer.close()
+
+    def close(self, timeout=1.0):
+        """
+        Stop listening at once and return an awaitable that lets open
+        connections drain, cancelling those still open after `timeout`. The
+        chunks stay, and `start` listens again on a new port.
+        """
+        ready, self.ready = self.ready, None
+        server, self.server = self.server, None
+        if ready is not None and not ready.done():
+            ready.cancel()
+        if server is not None:
+            server.close()
+        return self._drain(list(self.handlers), timeout)
+
+    @staticmethod
+    async def _drain(handlers, timeout):
+        if handlers:
+            _, stuck = await asyncio.wait(handlers, timeout=timeout)
+            for task in stuck:
+                task.cancel()
+            await asyncio.gather(*stuck, return_exceptions=True)
+
+    def _handle(self, op, key, body):
+        chunks = self.chunks
+        if op == PUT:
+            chunks[key] = body
+            return OK, b""
+        if op == GET:
+            data = chunks.get(key)
+            return (OK, data) if data is not None else (MISSING, b"")
+        if op == DELETE:
+            return (OK, b"") if chunks.pop(key, None) is not None else (MISSING, b"")
+        if op == CLEAR:
+            count = len(chunks)
+            chunks.clear()
+            return OK, str(count).encode("utf-8")
+        raise ValueError(f"Unknown loopback request op {op}")
+
+
+class PeerConnection:
+    """
+    One pooled client connection. Requests are pipelined: each is written
+    as soon as it is issued, and a reader task matches replies to waiting
+    requests by id. Once the reader stops, pending and new requests fail
+    with ConnectionError. With a `timeout`, a connection whose requests get
+    no reply for that many seconds fails the same way, with TimeoutError.
+    """
+
+    def __init__(self, reader, writer, timeout=None):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.pending = {}  # request id -> future of (status, body)
+        self.next_id = 0
+        self.error = None  # why the reader stopped, once it has
+        self.loop = asyncio.get_running_loop()
+        self.last_reply = 0.0  # loop time of the latest reply, or of the request that ended an idle spell
+        self.watchdog = None   # timer checking for a stall while requests are pending
+        self.reader_task = self.loop.create_task(self._read())
+
+    @property
+    def alive(self):
+        return self.error is None
+
+    async def request(self, op, key, body=b""):
+        if self.error is not None:
+            raise self.error
+        self.next_id = request_id = (self.next_id + 1) & 0xFFFFFFFF
+        future = self.loop.create_future()
+        if not self.pending and self.timeout is not None:
+            self.last_reply = self.loop.time()
+            if self.watchdog is None:
+                self.watchdog = self.loop.call_at(self.last_reply + self.timeout, self._check)
+        self.pending[request_id] = future
+        try:
+            self.writer.writelines((REQUEST.pack(op, request_id, len(key), len(body)), key, body))
+            await self.writer.drain()
+            return await future
+        finally:
+            self.pending.pop(request_id, None)
+
+    def _check(self):
+        self.watchdog = None
+        if not self.pending or self.error is not None:
+            return  # the next request re-arms it
+        due = self.last_reply + self.timeout
+        if self.loop.time() < due:
+            self.watchdog = self.loop.call_at(due, self._check)
+        else:
+            self._fail(TimeoutError(f"No reply from the loopback peer in {self.timeout:.1f} s"))
+            self.reader_task.cancel()
+
+    async def _read(self):
+        try:
+            while True:
+                request_id, status, body_len = RESPONSE.unpack(await self.reader.readexactly(RESPONSE.size))
+                body = await self.reader.readexactly(body_len) if body_len else b""
+                self.last_reply = self.loop.time()
+                future = self.pending.pop(request_id, None)
+                if future is not None and not future.done():  # None or done: the caller gave up
+                    future.set_result((status, body))
+        except (asyncio.IncompleteReadError, ConnectionError) as exc:
+            self._fail(ConnectionError(f"Loopback peer closed the connection: {exc}"))
+        except asyncio.CancelledError:
+            self._fail(ConnectionError("Loopback connection closed"))
+        except Exception as exc:
+            self._fail(ConnectionError(f"Loopback connection failed: {exc!r}"))
+
+    def _fail(self, error):
+        if self.error is not None:
+            return
+        self.error = error
+        self.writer.close()
+        if self.watchdog is not None:
+            self.watchdog.cancel()
+            self.watchdog = None
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def close(self):
+        self.reader_task.cancel()
+        self.writer.close()
+        await asyncio.gather(self.reader_task, return_exceptions=True)
+
+
+class ConnectionPool:
+    """
+    Reused connections to each peer port: `connections_per_peer` sockets,
+    opened on the peer's first request and kept afterwards, with at most
+    `max_inflight` outstanding requests per peer. A request goes to the
+    peer's live connection with the fewest replies pending; once none is
+    left, the next request opens a fresh set.
+    """
+
+    def __init__(self, connections_per_peer=2, max_inflight=32, timeout=None):
+        self.connections_per_peer = connections_per_peer
+        self.max_inflight = max_inflight
+        self.timeout = timeout  # seconds without a reply before a busy connection is given up
+        self.connections = {}  # port -> task opening the peer's connections
+        self.limits = {}       # port -> Semaphore of max_inflight
+
+        self.opened = 0
+        self.requests = 0
+        self.failed = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = LatencyHistogram()  # from taking an inflight slot to the reply
+
+    async def _open(self, port):
+        connections = []
+        for _ in range(self.connections_per_peer):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            connections.append(PeerConnection(reader, writer, self.timeout))
+        self.opened += len(connections)
+        return connections
+
+    async def request(self, port, op, key, body=b""):
+        opening = self.connections.get(port)
+        if opening is None:
+            opening = self.connections[port] = asyncio.ensure_future(self._open(port))
+            self.limits[port] = asyncio.Semaphore(self.max_inflight)
+        limit = self.limits[port]
+        try:
+            connections = await opening
+            async with limit:
+                live = [c for c in connections if c.alive]
+                if not live:
+                    raise ConnectionError(f"No live loopback connection to port {port}")
+                connection = min(live, key=lambda c: len(c.pending))
+                start = time.perf_counter_ns()
+                status, reply = await connection.request(op, key, body)
+                self.latency.add(time.perf_counter_ns() - start)
+        except OSError:
+            self.failed += 1
+            if self.connections.get(port) is opening and not any(c.alive for c in self._opened(opening)):
+                # Failed to open, or every connection died: the next request opens a fresh set
+                del self.connections[port]
+                del self.limits[port]
+            raise
+
+        self.requests += 1
+        self.bytes_sent += REQUEST.size + len(key) + len(body)
+        self.bytes_received += RESPONSE.size + len(reply)
+        return status, reply
+
+    @staticmethod
+    def _opened(opening):
+        """The connections `opening` made, or none if it is still opening or failed."""
+        if opening.done() and not opening.cancelled() and opening.exception() is None:
+            return opening.result()
+        return []
+
+    def drop(self, port):
+        """
+        Forget the connections to `port` at once, so a later request opens
+        new ones; returns an awaitable that closes them.
+        """
+        opening = self.connections.pop(port, None)
+        self.limits.pop(port, None)
+        return self._close(opening)
+
+    async def _close(self, opening):
+        if opening is None:
+            return
+        if not opening.done():
+            opening.cancel()
+            await asyncio.gather(opening, return_exceptions=True)
+        for connection in self._opened(opening):
+            await connection.close()
+
+    async def close(self):
+        for port in list(self.connections):
+            await self.drop(port)
+
+
+class LoopbackNetwork(InMemoryNetwork):
+    """
+    InMemoryNetwork whose chunk bytes travel over real sockets: each peer
+    is a PeerServer on 127.0.0.1, started on its first transfer, and chunk
+    transfer and cleanup calls are length-prefixed requests through a
+    ConnectionPool. Discovery, the upload pool, the manifest and gossip
+    stay in memory, so a seed places chunks exactly as InMemoryNetwork
+    does, and only the transfer path is measured.
+
+    The asyncio loop runs on a daemon thread and the synchronous interface
+    methods block on it. One upload_chunks call sends to every target peer
+    at once, each peer's chunks pipelined over its pooled connections. Payloads
+    are sent in metadata mode too, derived from the chunk id. Call `close`
+    when done.
+
+    At most `loopback_max_connections` pooled connections stay open: past
+    that, the least recently used idle peers stop listening and drop their
+    connections, keeping their chunks, and reopen on their next transfer.
+    A request fails when its connection closes or its peer stops replying
+    for `loopback_timeout_s`; the interface methods report that rather
+    than raise: uploads count only the chunks delivered, and reads return
+    nothing.
+    """
+
+    def __init__(self, seed: int = 42, config=None):
+        super().__init__(seed, config)
+        # Bytes live on the peer servers; this only indexes which chunk ids each peer holds
+        self.peer_chunks = defaultdict(set if self.store_payloads else ChunkRangeSet)
+        self.servers = {}  # peer_id -> PeerServer
+        self.timeout = getattr(config, "loopback_timeout_s", 10.0)
+        self.pool = ConnectionPool(
+            getattr(config, "loopback_connections_per_peer", 2),
+            getattr(config, "loopback_max_inflight_per_peer", 32),
+            self.timeout,
+        )
+        # Peers with a listening server and pooled connections, least recently used first,
+        # mapped to their requests in progress; idle ones are closed past the connection cap
+        self.open_peers = OrderedDict()
+        self.max_open_peers = max(1, getattr(config, "loopback_max_connections", 64) // self.pool.connections_per_peer)
+        self.evictions = 0
+        self.failed_transfers = 0  # transfers to a peer that delivered fewer chunks than were sent
+        self.blocked_ns = 0  # wall time the caller spent waiting on transfers
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="loopback-network", daemon=True)
+        self.thread.start()
+
+    def __getstate__(self):
+        raise TypeError("LoopbackNetwork holds live sockets and threads; it cannot be snapshotted")
+
+    def _call(self, coroutine, timeout=None):
+        """
+        Run `coroutine` on the loop thread and wait for it, at most `timeout`
+        seconds if given; past that it is cancelled and TimeoutError raised.
+        """
+        start = time.perf_counter_ns()
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Loopback transfer gave up after {timeout:.1f} s") from None
+        finally:
+            self.blocked_ns += time.perf_counter_ns() - start
+
+    async def _port(self, peer_id):
+        server = self.servers.get(peer_id)
+        if server is None:
+            server = self.servers[peer_id] = PeerServer()
+        if server.ready is None:  # new, or closed by eviction
+            server.ready = asyncio.ensure_future(server.start())
+        await server.ready
+        return server.port
+
+    @contextlib.asynccontextmanager
+    async def _peer(self, peer_id):
+        """Port of `peer_id`'s server, held open (not evicted) for the duration of the block."""
+        open_peers = self.open_peers
+        open_peers[peer_id] = open_peers.get(peer_id, 0) + 1
+        open_peers.move_to_end(peer_id)
+        try:
+            if len(open_peers) > self.max_open_peers:
+                await self._evict()
+            yield await self._port(peer_id)
+        finally:
+            open_peers[peer_id] -= 1
+
+    async def _evict(self):
+        """Close idle peers, least recently used first, down to `max_open_peers`; their chunks stay."""
+        open_peers = self.open_peers
+        idle = [peer_id for peer_id, users in open_peers.items() if not users]
+        victims = idle[:len(open_peers) - self.max_open_peers]
+        closing = []
+        for peer_id in victims:
+            # Both detach before the first await, so a request arriving meanwhile reopens the peer
+            del open_peers[peer_id]
+            server = self.servers[peer_id]
+            closing.append(self.pool.drop(server.port))
+            closing.append(server.close())
+        self.evictions += len(victims)
+        await asyncio.gather(*closing)
+
+    async def _request(self, peer_id, op, key, body=b""):
+        async with self._peer(peer_id) as port:
+            return await self.pool.request(port, op, key, body)
+
+    async def _batch(self, port, requests):
+        """
+        Send `requests`, (op, key, body) triples, to `port` from at most
+        `max_inflight` senders, so a large batch does not flood the loop
+        with tasks; returns the replies in order. The batch stops at its
+        first failed request: that one and those not yet sent get None.
+        """
+        replies = [None] * len(requests)
+        queue = iter(enumerate(requests))
+        request = self.pool.request
+        failed = False
+
+        async def sender():
+            nonlocal failed
+            for i, (op, key, body) in queue:
+                if failed:
+                    return
+                try:
+                    replies[i] = await request(port, op, key, body)
+                except OSError:
+                    failed = True
+
+        await asyncio.gather(*(sender() for _ in range(min(len(requests), self.pool.max_inflight))))
+        return replies
+
+    async def _put(self, peer_id, chunk_ids, payloads):
+        """Send the chunks pipelined; returns how many leading ones the peer acknowledged."""
+        async with self._peer(peer_id) as port:
+            replies = await self._batch(port, [(PUT, _key(c), data) for c, data in zip(chunk_ids, payloads)])
+        stored = 0
+        for reply in replies:
+            if reply is None or reply[0] != OK:
+                break
+            stored += 1
+        return stored
+
+    async def _delete(self, peer_id, chunk_ids):
+        """Statuses of the deletes, MISSING for those that failed or were not sent."""
+        async with self._peer(peer_id) as port:
+            replies = await self._batch(port, [(DELETE, _key(c), b"") for c in chunk_ids])
+        return [MISSING if reply is None else reply[0] for reply in replies]
+
+    @staticmethod
+    async def _gather(coroutines):
+        return await asyncio.gather(*coroutines)
+
+    # --- ChunkTransferClient ---
+    def _send(self, coroutine, failed, timeout=None):
+        """`_call`, returning `failed` if the peer could not be reached or the call timed out."""
+        try:
+            return self._call(coroutine, timeout)
+        except OSError:  # ConnectionError and TimeoutError included
+            return failed
+
+    def upload_chunk(self, chunk_id, chunk_data, target_peer: str, uploader_id: str) -> bool:
+        data = self.chunk_payload(chunk_id) if chunk_data is None else chunk_data
+        if not self._send(self._put(target_peer, [chunk_id], [data]), 0):
+            self.failed_transfers += 1
+            return False
+        self.peer_chunks[target_peer].add(chunk_id)
+        return True
+
+    def _store_chunks(self, transfers) -> dict:
+        puts = []
+        for peer_id, placed, data in transfers:
+            if data is None:
+                data = [self.chunk_payload(c) for c in placed]
+            puts.append(self._put(peer_id, placed, data))
+
+        # Each _put gives up on its own once its peer stops replying
+        results = self._send(self._gather(puts), [0] * len(transfers))
+        delivered = {}
+        for (peer_id, placed, _), stored in zip(transfers, results):
+            self.peer_chunks[peer_id].update(placed[:stored])
+            delivered[peer_id] = stored
+            self.failed_transfers += stored < len(placed)
+        return delivered
+
+    def download_chunk(self, chunk_id, source_peer: str) -> bytes:
+        status, data = self._send(self._request(source_peer, GET, _key(chunk_id)), (MISSING, b""), self.timeout)
+        return data if status == OK else b""
+
+    def verify_chunk_integrity(self, chunk_id, hash_val: str, peer_id: str) -> bool:
+        status, data = self._send(self._request(peer_id, GET, _key(chunk_id)), (MISSING, b""), self.timeout)
+        return status == OK and hash(data) == hash(hash_val)
+
+    # --- ChunkCleanupClient ---
+    def acknowledge_download_complete(self, file_id: str, chunk_ids: list[str], source_peer: str) -> None:
+        # Failed deletes leave stray bytes on the peer server, but the chunks are gone from the index either way
+        self._send(self._delete(source_peer, chunk_ids), None)
+        chunks = self.peer_chunks[source_peer]
+        for chunk_id in chunk_ids:
+            self._drop_chunk(chunks, chunk_id)
+            self.manifest.remove_location(chunk_id, source_peer)
+
+    def delete_chunk(self, chunk_id, peer_id: str) -> bool:
+        self.manifest.remove_location(chunk_id, peer_id)
+        status, = self._send(self._delete(peer_id, [chunk_id]), [MISSING])
+        self._drop_chunk(self.peer_chunks[peer_id], chunk_id)
+        return status == OK
+
+    def cleanup_stale_chunks(self, peer_id: str) -> int:
+        status, reply = self._send(self._request(peer_id, CLEAR, b""), (MISSING, b""), self.timeout)
+        if status != OK:
+            return 0
+        for chunk_id in self.peer_chunks[peer_id]:
+            self.manifest.remove_location(chunk_id, peer_id)
+        self.peer_chunks[peer_id] = self.peer_chunks.default_factory()
+        return int(reply)
+
+    # --- Lifecycle ---
+    async def _shutdown(self):
+        await self.pool.close()
+        for server in self.servers.values():
+            await server.close()
+
+    def close(self) -> None:
+        """Close every connection and peer server and stop the loop thread."""
+        if self.loop.is_closed():
+            return
+        self._call(self._shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    # --- Reporting ---
+    def transfer_stats(self) -> dict:
+        """Protocol-level counters of the transfer path, with request latency percentiles."""
+        pool = self.pool
+        seconds = self.blocked_ns * 1e-9
+        latency = pool.latency.export()
+        return {
+            "peer_servers": len(self.servers),
+            "open_peers": len(self.open_peers),
+            "evictions": self.evictions,
+            "connections": pool.opened,
+            "requests": pool.requests,
+            "failed_requests": pool.failed,
+            "failed_transfers": self.failed_transfers,
+            "sent_mb": pool.bytes_sent / 1024 ** 2,
+            "received_mb": pool.bytes_received / 1024 ** 2,
+            "blocked_seconds": seconds,
+            "throughput_mb_s": (pool.bytes_sent + pool.bytes_received) / 1024 ** 2 / seconds if seconds else 0.0,
+            "requests_per_s": pool.requests / seconds if seconds else 0.0,
+            "latency_p50_us": latency["p50_us"],
+            "latency_p99_us": latency["p99_us"],
+        }
+
+    def print_summary(self):
+        super().print_summary()
+        stats = self.transfer_stats()
+
+        print(f"\n[LOOPBACK]")
+        print(f"  Peer servers        : {stats['peer_servers']} ({stats['open_peers']} open, "
+              f"{stats['evictions']} idle closes)")
+        print(f"  Connections opened  : {stats['connections']}")
+        print(f"  Requests            : {stats['requests']} ({stats['failed_requests']} failed)")
+        print(f"  Failed transfers    : {stats['failed_transfers']}")
+        print(f"  Bytes moved         : {stats['sent_mb']:.2f} MB sent, {stats['received_mb']:.2f} MB received")
+        print(f"  Throughput          : {stats['throughput_mb_s']:.2f} MB/s, {stats['requests_per_s']:.0f} req/s")
+        print(f"  Request latency     : p50 {stats['latency_p50_us']:.0f} us, p99 {stats['latency_p99_us']:.0f} us")
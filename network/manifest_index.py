@@ -0,0 +1,89 @@
+# network/manifest_index.py
+
+import json
+
+from network.chunk_ids import ChunkRangeSet
+from network.chunk_extents import ChunkExtentIndex
+
+class ChunkManifestIndex:
+    """
+    Per-file chunk manifest: file_id → ordered chunk ids → host peer ids.
+
+    `chunk_hosts` is a flat chunk_id → host set view over the same set
+    objects, so it can serve as the simulation's reverse index without
+    storing the locations twice.
+
+    With `extents=True` (interned int chunk ids) locations are kept as
+    ranges instead: each file's placed chunks as a ChunkRangeSet, and
+    `chunk_hosts` as a ChunkExtentIndex of peer id tuples.
+    """
+
+    def __init__(self, extents=False):
+        self.extents = extents
+        self.files = {}        # file_id -> {chunk_id: set(peer_id)}, insertion-ordered; or ChunkRangeSet
+        self.chunk_hosts = ChunkExtentIndex() if extents else {}  # chunk_id -> set(peer_id), shared with self.files
+        self.blobs = {}        # file_id -> pushed (encrypted) manifest bytes
+
+    def add_location(self, file_id: str, chunk_id: str, peer_id: str) -> None:
+        if self.extents:
+            self.files.setdefault(file_id, ChunkRangeSet()).add(chunk_id)
+            self.chunk_hosts.add(chunk_id, chunk_id + 1, peer_id)
+            return
+        hosts = self.chunk_hosts.get(chunk_id)
+        if hosts is None:
+            hosts = self.chunk_hosts[chunk_id] = set()
+            self.files.setdefault(file_id, {})[chunk_id] = hosts
+        hosts.add(peer_id)
+
+    def add_locations(self, file_id: str, chunk_ids, peer_id: str) -> None:
+        """add_location for each of `chunk_ids`, in order; one extent for a range."""
+        if self.extents and isinstance(chunk_ids, range) and chunk_ids.step == 1:
+            if chunk_ids:
+                self.files.setdefault(file_id, ChunkRangeSet()).update(chunk_ids)
+                self.chunk_hosts.add(chunk_ids.start, chunk_ids.stop, peer_id)
+            return
+        if self.extents:
+            for chunk_id in chunk_ids:
+                self.add_location(file_id, chunk_id, peer_id)
+            return
+
+        chunk_hosts = self.chunk_hosts
+        file_chunks = None
+        for chunk_id in chunk_ids:
+            hosts = chunk_hosts.get(chunk_id)
+            if hosts is None:
+                if file_chunks is None:
+                    file_chunks = self.files.setdefault(file_id, {})
+                hosts = chunk_hosts[chunk_id] = file_chunks[chunk_id] = set()
+            hosts.add(peer_id)
+
+    def remove_location(self, chunk_id: str, peer_id: str) -> None:
+        if self.extents:
+            self.chunk_hosts.discard(chunk_id, peer_id)
+            return
+        hosts = self.chunk_hosts.get(chunk_id)
+        if hosts is not None:
+            hosts.discard(peer_id)
+
+    def chunk_ids(self, file_id: str) -> list[str]:
+        """Chunk ids of `file_id` in upload order; O(chunks in file)."""
+        return list(self.files.get(file_id, ()))
+
+    def hosts(self, chunk_id: str) -> set:
+        if self.extents:
+            return set(self.chunk_hosts.get(chunk_id, ()))
+        return self.chunk_hosts.get(chunk_id, set())
+
+    def has_file(self, file_id: str) -> bool:
+        return file_id in self.files
+
+    def serialize(self, file_id: str) -> bytes:
+        chunks = self.files.get(file_id, {})
+        if self.extents:
+            located = [(chunk_id, self.chunk_hosts.get(chunk_id, ())) for chunk_id in chunks]
+        else:
+            located = chunks.items()
+        return json.dumps({
+            "file_id": file_id,
+            "chunks": [[chunk_id, sorted(hosts)] for chunk_id, hosts in located],
+        }).encode("utf-8")
@@ -1,7 +1,10 @@
 # network/memory_backend.py
 
+import sys
 import random
 from collections import defaultdict
+
+import numpy as np
 from network.interface import (
     PeerDiscoveryClient,
     ChunkTransferClient,
@@ -9,6 +12,9 @@ from network.interface import (
     ChunkCleanupClient,
     PeerGossipAgent,
 )
+from network.manifest_index import ChunkManifestIndex
+from network.chunk_ids import ChunkIdTable, ChunkRangeSet
+from network.peer_pool import CapacityBucketedPeerPool
 
 class InMemoryNetwork(
     PeerDiscoveryClient,
@@ -21,11 +27,21 @@ class InMemoryNetwork(
         self.rng = random.Random(seed)
         self.config = config or {}
         self.peers = {}  # peer_id -> metadata dict
-        self.peer_chunks = defaultdict(dict)  # peer_id -> {chunk_id: bytes}
-        self.manifests = defaultdict(dict)  # file_id -> manifest bytes
+
+        # "payload" stores chunk bytes per replica under string ids; "metadata"
+        # interns chunks as int ids and records placement as id ranges, payloads derived on demand
+        self.chunk_storage = getattr(config, "chunk_storage", "payload")
+        if self.chunk_storage not in ("payload", "metadata"):
+            raise ValueError(f"Unknown chunk storage mode: {self.chunk_storage}")
+        self.store_payloads = self.chunk_storage == "payload"
+        self.chunk_table = ChunkIdTable()
+        self.peer_chunks = defaultdict(dict if self.store_payloads else ChunkRangeSet)  # peer_id -> {chunk_id: bytes} or ChunkRangeSet
+
+        self.manifest = ChunkManifestIndex(extents=not self.store_payloads)  # file_id -> chunk_id -> host peer ids
         self.peer_scores = {}  # peer_id -> float
         self.uploads_this_tick = {}       # peer_id → chunk count this tick
         self.peer_nodes = {}              # peer_id → SimNode reference
+        self.upload_pool = CapacityBucketedPeerPool()  # online peers with free space
         self.last_tick = -1
 
     # --- PeerDiscoveryClient ---
@@ -35,13 +51,29 @@ class InMemoryNetwork(
         Return a list of online peers that have at least `min_free_gb` available.
         Optionally excludes peers by ID (e.g., uploader).
         """
-        exclude_ids = exclude_ids or set()
-        return [
-            node for node in self.peer_nodes.values()
-            if node.online
-            and node.free_space_gb >= min_free_gb
-            and node.id not in exclude_ids
-        ]
+        return self.upload_pool.eligible(min_free_gb, exclude_ids)
+
+    def sample_upload_targets(self, rng, k, exclude_ids=None, min_free_gb=0.01):
+        """
+        Draw up to `k` distinct eligible peers from the live upload pool by
+        rejection over node positions, instead of materializing every
+        eligible peer first.
+        """
+        return self.upload_pool.sample(rng, k, min_free_gb, exclude_ids)
+
+    def update_free_space(self, node) -> None:
+        """Re-class `node` in the upload pool after its free space changed."""
+        if node.online and node.id in self.peer_nodes:
+            self.upload_pool.add(node)
+
+    def apply_transitions(self, nodes, came_online, went_offline) -> None:
+        """Mirror a tick's online/offline flips (indices into `nodes`) into the upload pool."""
+        for i in came_online:
+            node = nodes[i]
+            if node.id in self.peer_nodes:
+                self.upload_pool.add(node)
+        for i in went_offline:
+            self.upload_pool.discard(nodes[i].id)
 
     def announce_self(self, peer_id: str, port: int, capabilities: dict) -> list:
         self.peers[peer_id] = {
@@ -76,42 +108,137 @@ class InMemoryNetwork(
     def refresh_peer_score(self, peer_id: str, score: float) -> None:
         self.peer_scores[peer_id] = score
 
+    # --- Chunk ids ---
+    def assign_chunk_ids(self, file_id: str, num_chunks: int):
+        """Chunk ids for a new file: strings in payload mode, an int range otherwise."""
+        if self.store_payloads:
+            return [f"{file_id}_chunk_{i}" for i in range(num_chunks)]
+        return self.chunk_table.register_file(file_id, num_chunks)
+
+    def chunk_name(self, chunk_id) -> str:
+        return chunk_id if self.store_payloads else self.chunk_table.name(chunk_id)
+
+    def chunk_payload(self, chunk_id) -> bytes:
+        """The bytes a chunk carries in the simulation, derived from its id."""
+        return f"chunkdata:{self.chunk_name(chunk_id)}".encode("utf-8")
+
     # --- ChunkTransferClient ---
-    def upload_chunk(self, chunk_id: str, chunk_data: bytes, target_peer: str, uploader_id: str) -> bool:
-        self.peer_chunks[target_peer][chunk_id] = chunk_data
+    def upload_chunk(self, chunk_id, chunk_data, target_peer: str, uploader_id: str) -> bool:
+        if self.store_payloads:
+            self.peer_chunks[target_peer][chunk_id] = chunk_data
+        else:
+            self.peer_chunks[target_peer].add(chunk_id)
         #print(f"[NAL] Uploaded {chunk_id} to {target_peer} from {uploader_id}")
         return True
 
-    def download_chunk(self, chunk_id: str, source_peer: str) -> bytes:
-        return self.peer_chunks[source_peer].get(chunk_id, b"")
+    def upload_chunks(self, file_id, chunk_ids, chunk_data, target_peers, uploader_id, chunk_size_gb) -> dict:
+        """
+        Offer every chunk of `chunk_ids` (one file's, in order) to each peer in
+        `target_peers`, as one upload_chunk per pair would. A peer stores
+        chunks while its free space is at least `chunk_size_gb` and skips the
+        rest as disk-full, so it always takes a prefix of the range. Updates
+        peer storage, each node's free_space_gb and hosted_chunks, and the
+        manifest in bulk. `chunk_data` lists payloads in payload mode, else None.
+
+        Returns peer_id -> (chunks stored, disk-full skips, failed transfers).
+        A failed transfer ends the peer's prefix: its chunks from there on are
+        neither stored nor skipped.
+        """
+        results = {}
+        transfers = []
+        offers = []
+        count = len(chunk_ids)
+        for peer_id in target_peers:
+            node = self.peer_nodes[peer_id]
+
+            # Free space before each chunk, subtracted in the same order as per chunk
+            free = np.full(count + 1, chunk_size_gb)
+            free[0] = node.store.free_space_gb[node.index]
+            np.subtract.accumulate(free, out=free)
+            fits = int(np.count_nonzero(free[:count] >= chunk_size_gb))
+
+            transfers.append((peer_id, chunk_ids[:fits], chunk_data[:fits] if chunk_data is not None else None))
+            offers.append((peer_id, node, free, fits))
 
-    def verify_chunk_integrity(self, chunk_id: str, hash_val: str, peer_id: str) -> bool:
-        chunk = self.peer_chunks[peer_id].get(chunk_id)
-        return chunk is not None and hash(chunk) == hash(hash_val)
+        delivered = self._store_chunks(transfers)
+        for peer_id, node, free, fits in offers:
+            stored = delivered[peer_id]
+            node.store.free_space_gb[node.index] = free[stored]
+            placed = chunk_ids[:stored]
+            node.hosted_chunks.update(placed)
+            self.manifest.add_locations(file_id, placed, peer_id)
+            results[peer_id] = (stored, count - fits, fits - stored)
+        return results
+
+    def _store_chunks(self, transfers) -> dict:
+        """
+        Put each (peer_id, chunk_ids, payloads or None) of an upload_chunks call
+        into peer storage. Returns peer_id -> how many leading chunks it stored.
+        """
+        delivered = {}
+        for peer_id, placed, data in transfers:
+            if self.store_payloads:
+                self.peer_chunks[peer_id].update(zip(placed, data))
+            else:
+                self.peer_chunks[peer_id].update(placed)
+            delivered[peer_id] = len(placed)
+        return delivered
+
+    def download_chunk(self, chunk_id, source_peer: str) -> bytes:
+        chunks = self.peer_chunks[source_peer]
+        if self.store_payloads:
+            return chunks.get(chunk_id, b"")
+        return self.chunk_payload(chunk_id) if chunk_id in chunks else b""
+
+    def verify_chunk_integrity(self, chunk_id, hash_val: str, peer_id: str) -> bool:
+        chunks = self.peer_chunks[peer_id]
+        if chunk_id not in chunks:
+            return False
+        chunk = chunks[chunk_id] if self.store_payloads else self.chunk_payload(chunk_id)
+        return hash(chunk) == hash(hash_val)
 
     # --- ManifestSyncClient ---
     def update_manifest_chunk_location(self, file_id: str, chunk_id: str, new_peer: str) -> None:
-        self.manifests[file_id][chunk_id] = new_peer
-        print(f"[MANIFEST] {file_id}: {chunk_id} → {new_peer}")
+        self.manifest.add_location(file_id, chunk_id, new_peer)
+        #print(f"[MANIFEST] {file_id}: {chunk_id} → {new_peer}")
 
     def push_full_manifest(self, file_id: str, encrypted_manifest: bytes, owner_peer: str) -> bool:
-        self.manifests[file_id]["manifest"] = encrypted_manifest
+        self.manifest.blobs[file_id] = encrypted_manifest
         return True
 
     def fetch_manifest(self, file_id: str, auth_token: str) -> bytes:
-        return self.manifests[file_id].get("manifest", b"")
+        if file_id in self.manifest.blobs:
+            return self.manifest.blobs[file_id]
+        if self.manifest.has_file(file_id):
+            return self.manifest.serialize(file_id)
+        return b""
 
     # --- ChunkCleanupClient ---
     def acknowledge_download_complete(self, file_id: str, chunk_ids: list[str], source_peer: str) -> None:
+        chunks = self.peer_chunks[source_peer]
         for chunk_id in chunk_ids:
-            self.peer_chunks[source_peer].pop(chunk_id, None)
+            self._drop_chunk(chunks, chunk_id)
+            self.manifest.remove_location(chunk_id, source_peer)
 
-    def delete_chunk(self, chunk_id: str, peer_id: str) -> bool:
-        return self.peer_chunks[peer_id].pop(chunk_id, None) is not None
+    def delete_chunk(self, chunk_id, peer_id: str) -> bool:
+        self.manifest.remove_location(chunk_id, peer_id)
+        return self._drop_chunk(self.peer_chunks[peer_id], chunk_id)
+
+    @staticmethod
+    def _drop_chunk(chunks, chunk_id) -> bool:
+        if chunk_id not in chunks:
+            return False
+        if isinstance(chunks, dict):
+            del chunks[chunk_id]
+        else:
+            chunks.discard(chunk_id)
+        return True
 
     def cleanup_stale_chunks(self, peer_id: str) -> int:
         count = len(self.peer_chunks[peer_id])
-        self.peer_chunks[peer_id] = {}
+        for chunk_id in self.peer_chunks[peer_id]:
+            self.manifest.remove_location(chunk_id, peer_id)
+        self.peer_chunks[peer_id] = self.peer_chunks.default_factory()
         return count
 
     # --- PeerGossipAgent ---
@@ -126,5 +253,53 @@ class InMemoryNetwork(
 
     def register_peer(self, peer_id: str, node) -> None:
         self.peer_nodes[peer_id] = node
+        if node.online:
+            self.upload_pool.add(node)
         if peer_id not in self.peer_chunks:
-            self.peer_chunks[peer_id] = {}
\ No newline at end of file
+            self.peer_chunks[peer_id] = self.peer_chunks.default_factory()
+
+    def close(self) -> None:
+        """Release network resources; nothing to do in memory."""
+
+    # --- Reporting ---
+    def storage_footprint(self) -> tuple[int, int]:
+        """
+        Approximate bytes held for chunk placement, and the replica count.
+
+        Counts the per-peer chunk containers and payloads, each node's
+        hosted_chunks set, and the manifest's host sets. Chunk id objects are
+        shared across those structures, so they are counted once per chunk.
+        """
+        size = sys.getsizeof
+        replicas = 0
+        total = 0
+
+        for chunks in self.peer_chunks.values():
+            replicas += len(chunks)
+            total += size(chunks)
+            if isinstance(chunks, dict):
+                total += sum(size(data) for data in chunks.values())
+
+        for node in self.peer_nodes.values():
+            total += size(node.hosted_chunks)
+
+        chunk_hosts = self.manifest.chunk_hosts
+        total += size(chunk_hosts)
+        if isinstance(chunk_hosts, dict):
+            total += sum(size(hosts) for hosts in chunk_hosts.values())
+            total += sum(size(chunk_id) for chunk_id in chunk_hosts)
+        else:
+            total += sum(size(files) for files in self.manifest.files.values())
+        total += size(self.chunk_table.bases) + size(self.chunk_table.file_ids)
+
+        return total, replicas
+
+    def print_summary(self):
+        total, replicas = self.storage_footprint()
+
+        print(f"\n[STORAGE]")
+        print(f"  Chunk storage       : {self.chunk_storage}")
+        print(f"  Replicas held       : {replicas}")
+        print(f"  Placement memory    : {total / 1024 ** 2:.2f} MB")
+        per_replica = f"{total / replicas:.1f} bytes" if replicas else "n/a"
+        print(f"  Memory per replica  : {per_replica}")
\ No newline at end of file
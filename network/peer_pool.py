@@ -0,0 +1,125 @@
+# network/peer_pool.py
+
+class CapacityBucketedPeerPool:
+    """
+    Live set of online peers with free space, bucketed by free-capacity class.
+
+    Class 0 holds peers with less than 1 GB free and class c >= 1 holds peers
+    with [2**(c-1), 2**c) GB free. Adds and removes are O(1): a bucket append
+    or a swap with its last entry. Random draws go through `by_position`, the
+    members indexed by node position, so a draw depends only on who is in the
+    pool and not on the order peers came and went.
+    """
+
+    def __init__(self):
+        self.buckets = []      # capacity class -> nodes, in no particular order
+        self.members = {}      # peer_id -> (capacity class, slot in its bucket)
+        self.by_position = []  # node position -> (capacity class, node), or None
+
+    @staticmethod
+    def capacity_class(free_gb):
+        if free_gb <= 0:
+            return None
+        return int(free_gb).bit_length()
+
+    @staticmethod
+    def class_bounds(capacity_class):
+        if capacity_class == 0:
+            return 0, 1
+        return 2 ** (capacity_class - 1), 2 ** capacity_class
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, peer_id):
+        return peer_id in self.members
+
+    def add(self, node):
+        """Insert or re-class `node`; nodes without free space are dropped."""
+        capacity_class = self.capacity_class(node.free_space_gb)
+        member = self.members.get(node.id)
+
+        if member is not None:
+            if member[0] == capacity_class:
+                return
+            self._remove(node.id, *member)
+
+        if capacity_class is None:
+            return
+
+        while len(self.buckets) <= capacity_class:
+            self.buckets.append([])
+        while len(self.by_position) <= node.index:
+            self.by_position.append(None)
+        bucket = self.buckets[capacity_class]
+        self.members[node.id] = (capacity_class, len(bucket))
+        bucket.append(node)
+        self.by_position[node.index] = (capacity_class, node)
+
+    def discard(self, peer_id):
+        member = self.members.get(peer_id)
+        if member is not None:
+            self._remove(peer_id, *member)
+
+    def _remove(self, peer_id, capacity_class, slot):
+        bucket = self.buckets[capacity_class]
+        node = bucket[slot]
+        last = bucket.pop()
+        if last is not node:
+            bucket[slot] = last
+            self.members[last.id] = (capacity_class, slot)
+        del self.members[peer_id]
+        self.by_position[node.index] = None
+
+    def eligible(self, min_free_gb=0.0, exclude_ids=None):
+        exclude_ids = exclude_ids or ()
+        lowest = self.capacity_class(min_free_gb) or 0
+        return [
+            node for bucket in self.buckets[lowest:] for node in bucket
+            if node.id not in exclude_ids and node.free_space_gb >= min_free_gb
+        ]
+
+    def sample(self, rng, k, min_free_gb=0.0, exclude_ids=None):
+        """
+        Draw up to `k` distinct peers with at least `min_free_gb` free,
+        uniformly. Draws node positions at random and rejects those not in the
+        pool or short of `min_free_gb`, about k x positions / eligible draws;
+        when the pool is too sparse for that, samples a sorted scan instead.
+        """
+        exclude_ids = exclude_ids or ()
+        if k <= 0:
+            return []
+
+        # Only part of the boundary class `lowest` may clear min_free_gb, so
+        # `available` is an upper bound and the draws below it are rejected
+        lowest = self.capacity_class(min_free_gb) or 0
+        total = sum(len(bucket) for bucket in self.buckets[lowest:])
+        excluded = sum(1 for pid in exclude_ids if pid in self.members and self.members[pid][0] >= lowest)
+        available = total - excluded
+        if available <= 0:
+            return []
+
+        picked = []
+        seen = set()
+        positions = len(self.by_position)
+        if available > 2 * k and k * positions < total * available:
+            budget = 4 * k * positions // available + 64
+            while len(picked) < k and budget > 0:
+                budget -= 1
+                member = self.by_position[rng.randrange(positions)]
+                if member is None or member[0] < lowest:
+                    continue
+                node = member[1]
+                if node.id in seen or node.id in exclude_ids or node.free_space_gb < min_free_gb:
+                    continue
+                seen.add(node.id)
+                picked.append(node)
+            if len(picked) == k:
+                return picked
+
+        # Too sparse, or the boundary class rejected too many draws
+        candidates = sorted(
+            (node for node in self.eligible(min_free_gb, exclude_ids) if node.id not in seen),
+            key=lambda node: node.index
+        )
+        return picked + rng.sample(candidates, min(k - len(picked), len(candidates)))
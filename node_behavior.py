@@ -25,32 +25,38 @@ class RollingBehaviorProfile(BaseBehaviorProfile):
         if node and node.timezone_offset is not None:
             local_time = (tick + node.timezone_offset) % 86400
             daylight = node.config.daylight_curve[local_time]
-            return base_online and node.cached_rng.random() < daylight
+            return base_online and node.daylight_draw(tick) < daylight
 
         return base_online
 
+    def next_transition(self, tick):
+        """First tick after `tick` where the rolling cycle flips, or None if it never does."""
+        if self.uptime_ticks >= self.cycle_length or self.uptime_ticks <= 0:
+            return None
+        position = (tick + self.offset) % self.cycle_length
+        if position < self.uptime_ticks:
+            return tick + self.uptime_ticks - position
+        return tick + self.cycle_length - position
+
+# profile type -> (cycle low, cycle high, uptime fraction low, high); always_online is a fixed 1/1 cycle
+PROFILE_PARAMETERS = {
+    "mostly_online": (12000, 18000, 0.88, 0.95),
+    "balanced":      (12000, 18000, 0.55, 0.7),
+    "flaky":         (6000, 10000, 0.2, 0.4),
+    "erratic":       (20000, 100000, 0.03, 0.1),
+}
+
 def generate_behavior_profile(profile_type, rng, total_ticks):
     if profile_type == "always_online":
         return RollingBehaviorProfile(cycle_length=1, uptime_ticks=1, offset=0)
 
-    elif profile_type == "mostly_online":
-        cycle = rng.randint(12000, 18000)
-        uptime = int(cycle * rng.uniform(0.88, 0.95))
-
-    elif profile_type == "balanced":
-        cycle = rng.randint(12000, 18000)
-        uptime = int(cycle * rng.uniform(0.55, 0.7))
-
-    elif profile_type == "flaky":
-        cycle = rng.randint(6000, 10000)
-        uptime = int(cycle * rng.uniform(0.2, 0.4))
-
-    elif profile_type == "erratic":
-        cycle = rng.randint(20000, 100000)
-        uptime = int(cycle * rng.uniform(0.03, 0.1))
-
-    else:
+    parameters = PROFILE_PARAMETERS.get(profile_type)
+    if parameters is None:
         raise ValueError(f"Unknown profile type: {profile_type}")
 
+    low, high, fraction_low, fraction_high = parameters
+    cycle = rng.randint(low, high)
+    uptime = int(cycle * rng.uniform(fraction_low, fraction_high))
+
     offset = rng.randint(0, cycle)
     return RollingBehaviorProfile(cycle, uptime, offset)
@@ -1,20 +1,35 @@
-from sim_node import SimNode
-from node_behavior import generate_behavior_profile
+import numpy as np
+
+from node_store import NodeStore
+from node_behavior import PROFILE_PARAMETERS, generate_behavior_profile
+
+UPLOAD_SPEEDS = [0.1, 0.5, 1, 5, 10, 25, 50, 100]
+UPLOAD_WEIGHTS = [5, 8, 20, 30, 20, 10, 5, 2]  # Steep drop-off at 25+
+DOWNLOAD_SPEEDS = [0.5, 1, 5, 10, 25, 50, 100, 250, 500]
+DOWNLOAD_WEIGHTS = [2, 5, 10, 20, 25, 20, 10, 6, 2]  # Favor 25–100 Mbps
+
+TIMEZONE_BUCKETS = [
+    0,     # UTC
+    10800, # UTC+3
+    21600, # UTC+6
+    32400, # UTC+9
+    43200, # UTC+12
+    54000, # UTC+15
+    64800, # UTC+18
+    75600  # UTC+21
+]
+TIMEZONE_WEIGHTS = [0.12, 0.08, 0.20, 0.25, 0.10, 0.10, 0.10, 0.05]
 
 def generate_nodes(rng, count, config, nal):
-    nodes = []
+    if getattr(config, "node_generation", "sequential") == "bulk":
+        return generate_nodes_bulk(rng, count, config, nal)
+
+    nodes = NodeStore(count, config, nal)
     for i in range(count):
         node_id = f"node_{i}"
 
-        upload_speed = rng.choices(
-            population=[0.1, 0.5, 1, 5, 10, 25, 50, 100],
-            weights=   [5,   8,   20, 30, 20, 10, 5, 2],  # Steep drop-off at 25+
-        )[0]
-
-        download_speed = rng.choices(
-            population=[0.5, 1, 5, 10, 25, 50, 100, 250, 500],
-            weights=   [2,   5, 10, 20, 25, 20, 10, 6, 2],  # Favor 25–100 Mbps
-        )[0]
+        upload_speed = rng.choices(population=UPLOAD_SPEEDS, weights=UPLOAD_WEIGHTS)[0]
+        download_speed = rng.choices(population=DOWNLOAD_SPEEDS, weights=DOWNLOAD_WEIGHTS)[0]
         
         total_space = rng.randint(10, 1000)  # GB
         is_new_user = rng.random() < 0.7    # 70% new users
@@ -30,40 +45,75 @@ def generate_nodes(rng, count, config, nal):
         if behavior_profile is None:
             raise ValueError(f"Behavior profile generation failed for {node_id} with type '{profile_type}'")
 
-        node = SimNode(
+        # Assign timezone offset
+        tz_rng = config.child_rng(f"timezone_offset_{node_id}")
+        timezone_offset = tz_rng.choices(TIMEZONE_BUCKETS, weights=TIMEZONE_WEIGHTS)[0]
+
+        node = nodes.add(
             node_id=node_id,
             upload_speed_mb_s=upload_speed,
             download_speed_mb_s=download_speed,
             total_space_gb=total_space,
             is_new_user=is_new_user,
             behavior_profile=profile_type,  # Pass the string type here
-            config=config,
-            nal=nal
+            profile_instance=behavior_profile,
+            timezone_offset=timezone_offset
         )
 
-        node.behavior_profile_instance = behavior_profile  # Store full instance separately
+        # Set initial online status
+        node.online = behavior_profile.is_online(0, node)
 
-        # Assign timezone offset
-        timezone_buckets = [
-            0,     # UTC
-            10800, # UTC+3
-            21600, # UTC+6
-            32400, # UTC+9
-            43200, # UTC+12
-            54000, # UTC+15
-            64800, # UTC+18
-            75600  # UTC+21
-        ]
-        tz_weights = [0.12, 0.08, 0.20, 0.25, 0.10, 0.10, 0.10, 0.05]
-        tz_rng = config.child_rng(f"timezone_offset_{node_id}")
-        node.timezone_offset = tz_rng.choices(timezone_buckets, weights=tz_weights)[0]
+    return nodes
 
-        # Set initial online status
-        initial_status = behavior_profile.is_online(0, node)
-        node.online = initial_status
-        node.was_online_last_tick = False
 
-        nodes.append(node)
+def _choice(gen, population, weights, size):
+    weights = np.asarray(weights, dtype=np.float64)
+    return np.asarray(population)[gen.choice(len(population), size=size, p=weights / weights.sum())]
 
-    return nodes
+def generate_nodes_bulk(rng, count, config, nal):
+    """
+    generate_nodes drawing every attribute as a whole array. Same
+    distributions, different draws: a seed gives its own deterministic
+    population, not the sequential one. Node RNGs stay lazy; the initial
+    status uses a bulk daylight draw instead of each node's first draw.
+    """
+    nodes = NodeStore(count, config, nal)
+    gen = np.random.default_rng(rng.getrandbits(64))
+    tz_gen = np.random.default_rng(config.child_rng("timezone_offset").getrandbits(64))
+
+    upload_speed = _choice(gen, UPLOAD_SPEEDS, UPLOAD_WEIGHTS, count)
+    download_speed = _choice(gen, DOWNLOAD_SPEEDS, DOWNLOAD_WEIGHTS, count)
+    total_space = gen.integers(10, 1000, size=count, endpoint=True)  # GB
+    is_new_user = gen.random(count) < 0.7  # 70% new users
+
+    profile_names = list(config.behavior_distribution.keys())
+    unknown = set(profile_names) - set(NodeStore.PROFILE_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown profile type: {sorted(unknown)[0]}")
+    codes = [NodeStore.PROFILE_TYPES.index(name) for name in profile_names]
+    profile_type = _choice(gen, codes, list(config.behavior_distribution.values()), count)
 
+    # always_online keeps cycle 1, uptime 1, offset 0
+    cycle = np.ones(count, dtype=np.int64)
+    uptime = np.ones(count, dtype=np.int64)
+    offset = np.zeros(count, dtype=np.int64)
+    for name, (low, high, fraction_low, fraction_high) in PROFILE_PARAMETERS.items():
+        rows = np.flatnonzero(profile_type == NodeStore.PROFILE_TYPES.index(name))
+        cycle[rows] = gen.integers(low, high, size=len(rows), endpoint=True)
+        uptime[rows] = (cycle[rows] * gen.uniform(fraction_low, fraction_high, size=len(rows))).astype(np.int64)
+        offset[rows] = gen.integers(0, cycle[rows], endpoint=True)
+
+    timezone_offset = _choice(tz_gen, TIMEZONE_BUCKETS, TIMEZONE_WEIGHTS, count)
+
+    rows = nodes.add_many(upload_speed, download_speed, total_space, is_new_user,
+                          profile_type, cycle, uptime, offset, timezone_offset)
+
+    # Set initial online status
+    daylight = np.asarray(config.daylight_curve)[timezone_offset % 86400]
+    if nodes.daylight_stream is not None:
+        draws = nodes.daylight_stream.uniform(np.arange(rows.start, rows.stop), 0)
+    else:
+        draws = gen.random(count)
+    nodes.online[rows] = (offset % cycle < uptime) & (draws < daylight)
+
+    return nodes
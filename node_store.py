@@ -0,0 +1,150 @@
+import numpy as np
+
+from sim_node import SimNode
+from network.chunk_ids import ChunkRangeSet
+from event_log import NO_EVENTS
+
+class NodeStore(list):
+    """
+    Struct-of-arrays storage for every simulated node.
+
+    Per-node scalars live in typed NumPy arrays indexed by node position, so
+    vectorized code can read and write them directly. The store itself is
+    the list of SimNode views, one per position, so it drops in wherever a
+    list of nodes was used.
+
+    Missing values use sentinels: -1 for timezone_offset, join_tick and
+    last_bootstrap_tick, 0 for force_offline_until (same as the availability
+    engine). Chunk sets, upload lists and node RNGs are created on first use.
+    """
+
+    PROFILE_TYPES = ("always_online", "mostly_online", "balanced", "flaky", "erratic")
+
+    def __init__(self, capacity, config, nal):
+        super().__init__()
+        self.config = config
+        self.nal = nal
+        self.position = {}  # node_id -> position
+        self.events = NO_EVENTS  # EventLog for join events
+
+        self.upload_speed_mb_s = np.zeros(capacity)
+        self.download_speed_mb_s = np.zeros(capacity)
+        self.free_space_gb = np.zeros(capacity)
+        self.total_space_gb = np.zeros(capacity)
+        self.is_new_user = np.zeros(capacity, dtype=bool)
+        self.score = np.zeros(capacity)
+
+        self.profile_type = np.zeros(capacity, dtype=np.int8)  # index into PROFILE_TYPES
+        self.cycle_length = np.ones(capacity, dtype=np.int64)
+        self.uptime_ticks = np.zeros(capacity, dtype=np.int64)
+        self.offset = np.zeros(capacity, dtype=np.int64)
+        self.timezone_offset = np.full(capacity, -1, dtype=np.int64)
+        self.force_offline_until = np.zeros(capacity, dtype=np.int64)
+
+        self.online = np.zeros(capacity, dtype=bool)
+        self.was_online_last_tick = np.zeros(capacity, dtype=bool)
+        self.has_joined = np.zeros(capacity, dtype=bool)
+        self.join_tick = np.full(capacity, -1, dtype=np.int64)
+        self.last_bootstrap_tick = np.full(capacity, -1, dtype=np.int64)
+
+        self.hosted_chunks = {}   # position -> chunk id set
+        self.files_uploaded = {}  # position -> [SimFile, ...]
+        self.rngs = {}            # position -> random.Random
+        self.owed_draws = {}      # position -> values consumed before its RNG was built
+
+        # With counter streams the daylight coin no longer comes from the node RNGs
+        counter = getattr(config, "random_streams", "sequential") == "counter"
+        self.daylight_stream = config.counter_rng("availability") if counter else None
+
+    def add(self, node_id, upload_speed_mb_s, download_speed_mb_s, total_space_gb, is_new_user,
+            behavior_profile, profile_instance, timezone_offset=None):
+        i = len(self)
+        self.upload_speed_mb_s[i] = upload_speed_mb_s
+        self.download_speed_mb_s[i] = download_speed_mb_s
+        self.free_space_gb[i] = total_space_gb
+        self.total_space_gb[i] = total_space_gb
+        self.is_new_user[i] = is_new_user
+
+        self.profile_type[i] = self.PROFILE_TYPES.index(behavior_profile)
+        self.cycle_length[i] = profile_instance.cycle_length
+        self.uptime_ticks[i] = profile_instance.uptime_ticks
+        self.offset[i] = profile_instance.offset
+        if timezone_offset is not None:
+            self.timezone_offset[i] = timezone_offset
+
+        # Uptime estimate (still used for analytics or modeling)
+        uptime = self.config.profile_uptime_estimates.get(behavior_profile, 0.5)
+        normalized_download = download_speed_mb_s / 500
+        normalized_space = 1.0  # free == total at creation
+        self.score[i] = round(
+            0.5 * normalized_download +
+            0.3 * normalized_space +
+            0.2 * uptime,
+            2
+        )
+
+        node = SimNode(self, i, node_id)
+        self.append(node)
+        self.position[node_id] = i
+        return node
+
+    def add_many(self, upload_speed_mb_s, download_speed_mb_s, total_space_gb, is_new_user,
+                 profile_type, cycle_length, uptime_ticks, offset, timezone_offset):
+        """
+        Append len(upload_speed_mb_s) nodes from whole arrays, ids node_<position>.
+        profile_type holds PROFILE_TYPES indices. Same scoring as `add`.
+        """
+        start = len(self)
+        stop = start + len(upload_speed_mb_s)
+        rows = slice(start, stop)
+
+        self.upload_speed_mb_s[rows] = upload_speed_mb_s
+        self.download_speed_mb_s[rows] = download_speed_mb_s
+        self.free_space_gb[rows] = total_space_gb
+        self.total_space_gb[rows] = total_space_gb
+        self.is_new_user[rows] = is_new_user
+
+        self.profile_type[rows] = profile_type
+        self.cycle_length[rows] = cycle_length
+        self.uptime_ticks[rows] = uptime_ticks
+        self.offset[rows] = offset
+        self.timezone_offset[rows] = timezone_offset
+
+        estimates = self.config.profile_uptime_estimates
+        uptime = np.array([estimates.get(name, 0.5) for name in self.PROFILE_TYPES])[profile_type]
+        self.score[rows] = np.round(0.5 * (download_speed_mb_s / 500) + 0.3 * 1.0 + 0.2 * uptime, 2)
+
+        for i in range(start, stop):
+            node_id = f"node_{i}"
+            self.append(SimNode(self, i, node_id))
+            self.position[node_id] = i
+        return rows
+
+    def node_rng(self, i):
+        rng = self.rngs.get(i)
+        if rng is None:
+            rng = self.rngs[i] = self.config.child_rng(f"node_rng_{self[i].id}")
+            for _ in range(self.owed_draws.pop(i, 0)):
+                rng.random()
+        return rng
+
+    def skip_draw(self, i):
+        """Consume one value of node `i`'s RNG; before the RNG exists, just count it for node_rng to replay."""
+        rng = self.rngs.get(i)
+        if rng is not None:
+            rng.random()
+        else:
+            self.owed_draws[i] = self.owed_draws.get(i, 0) + 1
+
+    def daylight_draw(self, i, tick):
+        """Node `i`'s daylight coin at `tick`: its next RNG value, or the counter-based draw."""
+        if self.daylight_stream is not None:
+            return self.daylight_stream.uniform(i, tick)
+        return self.node_rng(i).random()
+
+    def chunk_set(self, i):
+        chunks = self.hosted_chunks.get(i)
+        if chunks is None:
+            metadata = getattr(self.config, "chunk_storage", "payload") == "metadata"
+            chunks = self.hosted_chunks[i] = ChunkRangeSet() if metadata else set()
+        return chunks
@@ -0,0 +1,122 @@
+from bisect import bisect_left
+
+from network.chunk_extents import ChunkExtentIndex
+
+class OnlineHostIndex:
+    """
+    Answers "which replica holders of this chunk are online right now".
+
+    Holders are kept per chunk as sorted node positions, and online state as a
+    bytearray flipped from the availability transitions. A lookup costs
+    O(replicas) and returns hosts in node order, the same order a scan over
+    every node would produce.
+
+    With `extents=True` (interned int chunk ids) holders are a
+    ChunkExtentIndex of position tuples, one entry per run of chunks with
+    the same holders, and a lookup is an extent search.
+    """
+
+    def __init__(self, nodes, extents=False):
+        self.nodes = nodes
+        self.position = {node.id: i for i, node in enumerate(nodes)}
+        self.online = bytearray(bool(node.online) for node in nodes)
+        self.extents = extents
+        self.holders = ChunkExtentIndex() if extents else {}  # chunk_id -> sorted node positions
+
+    def add_replica(self, chunk_id, peer_id):
+        if self.extents:
+            self.holders.add(chunk_id, chunk_id + 1, self.position[peer_id])
+            return
+        holders = self.holders.setdefault(chunk_id, [])
+        pos = self.position[peer_id]
+        i = bisect_left(holders, pos)
+        if i == len(holders) or holders[i] != pos:
+            holders.insert(i, pos)
+
+    def add_replicas(self, chunk_ids, peer_id):
+        pos = self.position[peer_id]
+        if self.extents:
+            if isinstance(chunk_ids, range) and chunk_ids.step == 1:
+                self.holders.add(chunk_ids.start, chunk_ids.stop, pos)
+            else:
+                for chunk_id in chunk_ids:
+                    self.holders.add(chunk_id, chunk_id + 1, pos)
+            return
+        holders_of = self.holders
+        for chunk_id in chunk_ids:
+            holders = holders_of.get(chunk_id)
+            if holders is None:
+                holders_of[chunk_id] = [pos]
+                continue
+            i = bisect_left(holders, pos)
+            if i == len(holders) or holders[i] != pos:
+                holders.insert(i, pos)
+
+    def remove_replica(self, chunk_id, peer_id):
+        if self.extents:
+            self.holders.discard(chunk_id, self.position[peer_id])
+            return
+        holders = self.holders.get(chunk_id)
+        if not holders:
+            return
+        pos = self.position[peer_id]
+        i = bisect_left(holders, pos)
+        if i < len(holders) and holders[i] == pos:
+            del holders[i]
+
+    def apply_transitions(self, came_online, went_offline):
+        online = self.online
+        for i in came_online:
+            online[i] = 1
+        for i in went_offline:
+            online[i] = 0
+
+    def holder_positions(self, chunk_ids):
+        """Sorted positions of every node holding any of `chunk_ids`, online or not."""
+        positions = set()
+        if not self.extents:
+            holders = self.holders
+            for chunk_id in chunk_ids:
+                positions.update(holders.get(chunk_id, ()))
+            return sorted(positions)
+
+        start = stop = 0
+        for chunk_id in chunk_ids:
+            if not start <= chunk_id < stop:
+                extent = self.holders.extent(chunk_id)
+                if extent is None:
+                    start = stop = 0
+                    continue
+                start, stop, held = extent
+                positions.update(held)
+        return sorted(positions)
+
+    def online_hosts(self, chunk_id):
+        online = self.online
+        nodes = self.nodes
+        return [nodes[i] for i in self.holders.get(chunk_id, ()) if online[i]]
+
+    def online_hosts_each(self, chunk_ids):
+        """
+        online_hosts for each of `chunk_ids`, in order. With extents, chunks in
+        the same extent share one host list, built once.
+        """
+        if not self.extents:
+            for chunk_id in chunk_ids:
+                yield self.online_hosts(chunk_id)
+            return
+
+        online = self.online
+        nodes = self.nodes
+        start = stop = 0
+        hosts = []
+        for chunk_id in chunk_ids:
+            if not start <= chunk_id < stop:
+                extent = self.holders.extent(chunk_id)
+                if extent is None:
+                    start = stop = 0
+                    yield []
+                    continue
+                start, stop, positions = extent
+                hosts = [nodes[i] for i in positions if online[i]]
+            yield hosts
@@ -0,0 +1,104 @@
+import numpy as np
+
+DRAWS_PER_BLOCK = 4_000_000  # daylight draws generated per bulk block
+SCAN_TICKS = 4096            # ticks read per step when scanning one node's bits
+
+class OnlineSchedule:
+    """
+    Online status of every node over the ticks [start, stop), minus
+    blackout overrides.
+
+    The rolling cycle is analytic. Nodes with the same (cycle_length,
+    uptime_ticks, offset) share one row of parameters. The daylight coin is
+    drawn once in bulk and packed into a tick-major bitset `lit`, one row of
+    N bits per tick, so a tick's status for every node is one contiguous
+    row. `draws(start, stop)` returns the (stop - start, N) draws of ticks
+    [start, stop), in the order the per-tick engine uses them.
+
+    The bitset takes (stop - start) * ceil(N / 8) bytes; `window_ticks`
+    sizes a window to a memory budget, and the engine builds the next
+    window when a run passes the end of this one.
+    """
+
+    def __init__(self, cycle_length, uptime_ticks, offset, timezone_offset, daylight_curve, draws, start, stop):
+        self.start = start
+        self.stop = stop
+        count = len(cycle_length)
+
+        params, self.profile_id = np.unique(
+            np.stack([cycle_length, uptime_ticks, offset], axis=1), axis=0, return_inverse=True
+        )
+        self.profile_id = self.profile_id.reshape(-1)
+        self.cycle_length, self.uptime_ticks, self.offset = (np.ascontiguousarray(c) for c in params.T)
+        self.count = count
+
+        self.has_timezone = timezone_offset >= 0
+        self.lit = np.zeros((stop - start, (count + 7) // 8), dtype=np.uint8)
+
+        block = max(1, DRAWS_PER_BLOCK // max(1, count))
+        for first in range(start, stop, block):
+            last = min(first + block, stop)
+            local_time = (np.arange(first, last)[:, None] + timezone_offset[None, :]) % 86400
+            lit = (draws(first, last) < daylight_curve[local_time]) | ~self.has_timezone
+            self.lit[first - start:last - start] = np.packbits(lit, axis=1)
+
+    @staticmethod
+    def window_ticks(count, memory_mb):
+        """Ticks of a `count`-node bitset that fit in `memory_mb` (at least one)."""
+        return max(1, int(memory_mb * 2**20) // ((count + 7) // 8))
+
+    def covers(self, tick):
+        return self.start <= tick < self.stop
+
+    def base_online(self, tick):
+        """Rolling-cycle status of every node at `tick`."""
+        shared = (tick + self.offset) % self.cycle_length < self.uptime_ticks
+        return shared[self.profile_id]
+
+    def lit_at(self, tick):
+        """Daylight coin of every node at `tick`."""
+        return np.unpackbits(self.lit[tick - self.start], count=self.count).view(bool)
+
+    def lit_of(self, indices, tick):
+        """Daylight coin of the nodes at `indices` at `tick`."""
+        row = self.lit[tick - self.start]
+        return (row[indices >> 3] >> (7 - (indices & 7))) & 1 == 1
+
+    def online_mask(self, tick, force_offline_until=None):
+        online = self.base_online(tick) & self.lit_at(tick)
+        if force_offline_until is not None:
+            online &= tick >= force_offline_until
+        return online
+
+    def _first_lit(self, i, start, stop):
+        byte, shift = i >> 3, 7 - (i & 7)
+        while start < stop:
+            end = min(stop, start + SCAN_TICKS)
+            column = self.lit[start - self.start:end - self.start, byte]
+            hits = np.flatnonzero((column >> shift) & 1)
+            if len(hits):
+                return start + int(hits[0])
+            start = end
+        return None
+
+    def first_online(self, i, start, stop, forced_until=0):
+        """First tick in [start, stop) at which node `i` is online, or None; `start` must be covered."""
+        p = self.profile_id[i]
+        cycle, uptime, offset = int(self.cycle_length[p]), int(self.uptime_ticks[p]), int(self.offset[p])
+        stop = min(stop, self.stop)
+
+        tick = max(start, forced_until)
+        while tick < stop:
+            position = (tick + offset) % cycle
+            if position >= uptime:
+                tick += cycle - position
+                continue
+
+            end = min(tick + uptime - position, stop)
+            if not self.has_timezone[i]:
+                return tick
+            hit = self._first_lit(i, tick, end)
+            if hit is not None:
+                return hit
+            tick = end
+        return None
@@ -0,0 +1,234 @@
+from event_log import NO_EVENTS
+
+class PlacementRecord:
+    """A run of one file's chunks stored on the same holders (node positions)."""
+
+    __slots__ = ("file", "chunk_ids", "index", "holders", "live")
+
+    def __init__(self, file, chunk_ids, index, holders, live):
+        self.file = file
+        self.chunk_ids = chunk_ids  # slice of the file's chunk ids
+        self.index = index          # file chunk index of chunk_ids[0]
+        self.holders = holders
+        self.live = live            # holders currently online
+
+
+class RepairScheduler:
+    """
+    Background re-replication of chunks that lost online replicas.
+
+    Placements are tracked as PlacementRecords, so a file uploaded to one
+    set of peers is a single record however many chunks it has. Records
+    with fewer live holders than the replication factor sit in `buckets`,
+    keyed by live count. A node flipping online or offline shifts only the
+    records it holds, so keeping the index current costs O(churn), not
+    O(stored chunks).
+
+    Every `repair_interval_ticks` a round copies chunks to new peers, the
+    fewest live holders first, until `repair_bandwidth_mb_s` worth of the
+    interval is spent. Chunks with no online holder wait for one to come
+    back. Erasure-coded files are not tracked; rebuilding a fragment needs
+    a k-fragment decode rather than a copy.
+    """
+
+    def __init__(self, config, nodes, nal, host_index, registry, rng, events=None):
+        self.config = config
+        self.nodes = nodes
+        self.nal = nal
+        self.host_index = host_index
+        self.registry = registry
+        self.rng = rng
+        self.events = events if events is not None else NO_EVENTS
+
+        self.target = config.replication_factor
+        # Offline holders still count toward this cap, so flapping nodes don't pile up copies
+        self.max_holders = self.target * config.repair_holder_limit
+        self.interval = config.repair_interval_ticks
+        self.chunk_gb = config.chunk_size_mb / 1024
+        self.budget_chunks = int(config.repair_bandwidth_mb_s * self.interval // config.chunk_size_mb)
+
+        self.records = {}   # record id -> PlacementRecord
+        self.holding = {}   # node position -> record ids it holds
+        self.buckets = {}   # live holders -> ids of records below the target
+        self.next_record = 0
+
+        self.rounds = 0
+        self.chunks_repaired = 0
+        self.budget_exhausted_rounds = 0
+        self.last_at_risk = (0, 0)  # at_risk() after the latest round
+
+    def track(self, file, chunk_ids, placed, peers):
+        """
+        Start tracking one replicated upload: `placed` is upload_chunks'
+        peer_id -> (stored, skipped, failed) over `chunk_ids`. Each peer holds
+        a prefix, so the chunks split into runs by prefix length.
+        """
+        position = self.host_index.position
+        stored = {position[peer.id]: placed[peer.id][0] for peer in peers}
+        start = 0
+        for stop in sorted(set(stored.values())):
+            if stop > start:
+                holders = sorted(p for p, count in stored.items() if count >= stop)
+                self._add(file, chunk_ids[start:stop], start, holders)
+                start = stop
+
+    def _add(self, file, chunk_ids, index, holders, live=None):
+        rid = self.next_record
+        self.next_record += 1
+        if live is None:
+            online = self.host_index.online
+            live = sum(online[p] for p in holders)
+        self.records[rid] = PlacementRecord(file, chunk_ids, index, holders, live)
+        for p in holders:
+            self.holding.setdefault(p, set()).add(rid)
+        if live < self.target:
+            self.buckets.setdefault(live, set()).add(rid)
+        return rid
+
+    def _shift(self, rid, delta):
+        record = self.records[rid]
+        old = record.live
+        record.live = new = old + delta
+        if old < self.target:
+            bucket = self.buckets[old]
+            bucket.discard(rid)
+            if not bucket:
+                del self.buckets[old]
+        if new < self.target:
+            self.buckets.setdefault(new, set()).add(rid)
+
+    def apply_transitions(self, came_online, went_offline):
+        """Shift the live count of every record held by a node that flipped."""
+        holding = self.holding
+        for i in came_online:
+            for rid in holding.get(int(i), ()):
+                self._shift(rid, 1)
+        for i in went_offline:
+            for rid in holding.get(int(i), ()):
+                self._shift(rid, -1)
+
+    def run(self, current_tick):
+        """One repair round: copy at-risk chunks until the bandwidth budget is spent."""
+        self.rounds += 1
+        budget = self.budget_chunks
+        repaired = 0
+
+        for live in sorted(self.buckets):
+            if live == 0:
+                continue  # no online source; wait for a holder to return
+            for rid in sorted(self.buckets.get(live, ())):
+                if budget <= 0:
+                    break
+                copied = self._repair(rid, budget)
+                budget -= copied
+                repaired += copied
+            if budget <= 0:
+                self.budget_exhausted_rounds += 1
+                break
+
+        self.chunks_repaired += repaired
+        self.last_at_risk = under, unavailable = self.at_risk()
+        if repaired and self.events.repair:
+            self.events.emit(current_tick, "repair", "round", chunks=repaired,
+                             under_replicated=under, unavailable=unavailable)
+        return repaired
+
+    def _repair(self, rid, budget):
+        """Copy record `rid` to new peers until it reaches the target or `budget` chunks are used."""
+        record = self.records[rid]
+        nodes = self.nodes
+        online = self.host_index.online
+        wanted = min(self.target - record.live, self.max_holders - len(record.holders))
+        if wanted <= 0:
+            return 0
+
+        targets = self.nal.sample_upload_targets(
+            self.rng, wanted,
+            exclude_ids={nodes[p].id for p in record.holders},
+            min_free_gb=self.chunk_gb
+        )
+        if not targets:
+            return 0
+        source = nodes[self.rng.choice([p for p in record.holders if online[p]])]
+
+        copied = 0
+        for peer in targets:
+            count = self._copy(record, source, peer, budget - copied)
+            if count == 0:
+                break
+            copied += count
+            if count < len(record.chunk_ids):
+                # Only a prefix made it; the rest keeps the old holders
+                self._add(record.file, record.chunk_ids[count:], record.index + count,
+                          list(record.holders), record.live)
+                record.chunk_ids = record.chunk_ids[:count]
+
+            pos = self.host_index.position[peer.id]
+            record.holders.append(pos)
+            self.holding.setdefault(pos, set()).add(rid)
+            self._shift(rid, 1 if online[pos] else 0)
+            if budget - copied <= 0:
+                break
+        return copied
+
+    def _copy(self, record, source, peer, budget):
+        """Copy up to `budget` chunks of `record` from `source` to `peer`; returns the count copied."""
+        nal = self.nal
+        file_id = record.file.file_name
+        chunk_gb = self.chunk_gb
+        hosted = peer.hosted_chunks
+
+        count = 0
+        for chunk_id in record.chunk_ids[:budget]:
+            if peer.free_space_gb < chunk_gb:
+                break
+            data = nal.download_chunk(chunk_id, source.id) if nal.store_payloads else None
+            if not nal.upload_chunk(chunk_id, data, peer.id, source.id):
+                break  # transfer failed; the copied prefix still counts
+            nal.update_manifest_chunk_location(file_id, chunk_id, peer.id)
+            hosted.add(chunk_id)
+            peer.free_space_gb -= chunk_gb
+            count += 1
+
+        if count:
+            self.host_index.add_replicas(record.chunk_ids[:count], peer.id)
+            self.registry.record_replicas(record.file, count, record.index)
+            nal.update_free_space(peer)
+        return count
+
+    def at_risk(self):
+        """(under-replicated chunks with an online holder, chunks with none)."""
+        records = self.records
+        under = unavailable = 0
+        for live, bucket in self.buckets.items():
+            chunks = sum(len(records[rid].chunk_ids) for rid in bucket)
+            if live:
+                under += chunks
+            else:
+                unavailable += chunks
+        return under, unavailable
+
+    def summary(self, total_ticks):
+        # As of the latest round: the event engine only syncs node state on visited ticks
+        under, unavailable = self.last_at_risk
+        return {
+            "rounds": self.rounds,
+            "chunks_repaired": self.chunks_repaired,
+            "data_repaired_gb": self.chunks_repaired * self.chunk_gb,
+            "budget_exhausted_rounds": self.budget_exhausted_rounds,
+            "tracked_runs": len(self.records),
+            "under_replicated_chunks": under,
+            "unavailable_chunks": unavailable,
+        }
+
+    def print_summary(self, total_ticks):
+        summary = self.summary(total_ticks)
+
+        print(f"\n[REPAIR]")
+        print(f"  Repair rounds        : {summary['rounds']}")
+        print(f"  Chunks repaired      : {summary['chunks_repaired']}")
+        print(f"  Data repaired        : {summary['data_repaired_gb']:.2f} GB")
+        print(f"  Budget-bound rounds  : {summary['budget_exhausted_rounds']}")
+        print(f"  Tracked runs         : {summary['tracked_runs']}")
+        print(f"  Under-replicated     : {summary['under_replicated_chunks']} chunk(s) at the last round")
+        print(f"  No online replica    : {summary['unavailable_chunks']} chunk(s)")
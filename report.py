@@ -0,0 +1,74 @@
+"""
+Offline reporting stage. Reads what a run left in logs/ and renders plots or
+summaries; the only module that needs pandas and matplotlib, so the
+simulation itself never imports them.
+
+    python report.py                      # show the connected-nodes plot
+    python report.py --output plot.png    # render to a file instead
+    python report.py --summary            # print the saved run summary
+"""
+import os
+import json
+import argparse
+
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from metrics_sink import read_metrics
+
+def load_metrics(path="logs/metrics.bin"):
+    """The run's sampled time series as a DataFrame, plus a smoothed connected-nodes column."""
+    df = pd.DataFrame(read_metrics(path))
+    df["smoothed"] = df["connected_nodes"].rolling(window=100, min_periods=1).mean()
+    return df
+
+def plot_connected_counts(df, output=None):
+    """Plot raw and smoothed connected-node counts; show it, or save it to `output`."""
+    plt.plot(df["tick"], df["connected_nodes"], alpha=0.3, label="Raw Data", linewidth=0.5)
+    plt.plot(df["tick"], df["smoothed"], label="Smoothed (100 tick avg)", linewidth=1.5)
+
+    plt.xlabel("Tick")
+    plt.ylabel("Connected Nodes")
+    plt.title("Connected Node Count Over Time")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+
+    if output:
+        plt.savefig(output, dpi=150)
+        plt.close()
+    else:
+        plt.show()
+
+def print_run_summary(path="logs/run_summary.json"):
+    with open(path) as f:
+        summary = json.load(f)
+
+    print(f"\n[RUN] seed {summary['seed']}, {summary['ticks']} ticks, engine {summary['engine']}")
+    for section in ("upload", "download"):
+        print(f"\n[{section.upper()}]")
+        for key, value in summary[section].items():
+            print(f"  {key:20s}: {value:.2f}" if isinstance(value, float) else f"  {key:20s}: {value}")
+
+    comparison = summary.get("storage_comparison")
+    if comparison:
+        print(f"\n[STORAGE COMPARISON]")
+        for key in comparison["replication"]:
+            print(f"  {key:26s}: {comparison['replication'][key]:12.2f}  {comparison['erasure'][key]:12.2f}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report on a finished Wormhole simulation run.")
+    parser.add_argument("--logs-dir", default="logs", help="directory the run wrote its output to")
+    parser.add_argument("--output", metavar="FILE", help="save the plot to FILE instead of showing it")
+    parser.add_argument("--summary", action="store_true", help="print the run summary instead of plotting")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.summary:
+        print_run_summary(os.path.join(args.logs_dir, "run_summary.json"))
+        return
+    plot_connected_counts(load_metrics(os.path.join(args.logs_dir, "metrics.bin")), args.output)
+
+if __name__ == "__main__":
+    main()
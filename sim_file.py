@@ -1,8 +1,25 @@
+from array import array
+
 class SimFile:
     def __init__(self, file_name: str, file_size: int, owner):
         self.file_name = file_name
         self.file_size = file_size
         self.owner = owner
 
+        self.replication_status = None  # set by FileRegistry: "pending" / "replicated" / "failed"
+        self.num_chunks = 0
+        self.chunk_replicas = array("H")  # chunk index → replicas placed
+
+        # Erasure-coded files: (k, m, stripes) and the fragment chunk ids, fragment-major
+        self.erasure = None
+        self.chunk_ids = None
+
+    def init_chunks(self, num_chunks: int):
+        self.num_chunks = num_chunks
+        self.chunk_replicas = array("H", bytes(2 * num_chunks))
+
+    def min_replicas(self) -> int:
+        return min(self.chunk_replicas) if self.chunk_replicas else 0
+
     def __repr__(self):
-        return f"<File Name={self.file_name}, size={self.file_size}MB, owner={self.owner.id}>"
\ No newline at end of file
+        return f"<File Name={self.file_name}, size={self.file_size}MB, owner={self.owner.id}>"
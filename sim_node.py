@@ -1,47 +1,84 @@
+from node_behavior import RollingBehaviorProfile
+
+def _field(name, cast, missing=None):
+    """Property reading/writing position `index` of the store array `name`."""
+    def get(self):
+        value = getattr(self.store, name)[self.index]
+        return None if missing is not None and value == missing else cast(value)
+
+    def put(self, value):
+        getattr(self.store, name)[self.index] = missing if value is None else value
+
+    return property(get, put)
+
+
 class SimNode:
-    def __init__(self, node_id: str, upload_speed_mb_s: int, download_speed_mb_s: int, total_space_gb: int, is_new_user: bool, behavior_profile: str, config, nal):
-        self.config = config
-        self.cached_rng = config.child_rng(f"node_rng_{node_id}")
-        self.id = node_id
-        self.nal = nal
+    """
+    Object view of one node in a NodeStore.
 
-        self.upload_speed_mb_s = upload_speed_mb_s
-        self.download_speed_mb_s = download_speed_mb_s
+    Scalars read and write the store's arrays, so a view only carries its
+    position and id. Per-node containers and the node RNG live in the store
+    and are created on first use.
+    """
 
-        self.behavior_profile = behavior_profile
+    __slots__ = ("store", "index", "id")
 
-        self.free_space_gb = total_space_gb
-        self.total_space_gb = total_space_gb
+    auth_secret = "default"
+    password_seed = "default"
 
-        self.is_new_user = is_new_user
-        self.online = False
+    upload_speed_mb_s = _field("upload_speed_mb_s", float)
+    download_speed_mb_s = _field("download_speed_mb_s", float)
+    free_space_gb = _field("free_space_gb", float)
+    total_space_gb = _field("total_space_gb", float)
+    is_new_user = _field("is_new_user", bool)
+    score = _field("score", float)
 
-        self.replication_status = {}  # file_name → status string like "replicated"
+    online = _field("online", bool)
+    was_online_last_tick = _field("was_online_last_tick", bool)
+    has_joined = _field("has_joined", bool)
+    join_tick = _field("join_tick", int, missing=-1)
+    last_bootstrap_tick = _field("last_bootstrap_tick", int, missing=-1)
+    force_offline_until = _field("force_offline_until", int, missing=0)
+    timezone_offset = _field("timezone_offset", int, missing=-1)
 
-        # Uptime estimate (still used for analytics or modeling)
-        uptime = self.config.profile_uptime_estimates.get(self.behavior_profile, 0.5)
-        normalized_download = self.download_speed_mb_s / 500
-        normalized_space = self.free_space_gb / self.total_space_gb
+    def __init__(self, store, index, node_id):
+        self.store = store
+        self.index = index
+        self.id = node_id
 
-        # You can retain this if you want score for logging or node sorting
-        self.score = round(
-            0.5 * normalized_download +
-            0.3 * normalized_space +
-            0.2 * uptime,
-            2
+    @property
+    def config(self):
+        return self.store.config
+
+    @property
+    def nal(self):
+        return self.store.nal
+
+    @property
+    def behavior_profile(self):
+        return self.store.PROFILE_TYPES[self.store.profile_type[self.index]]
+
+    @property
+    def behavior_profile_instance(self):
+        store, i = self.store, self.index
+        return RollingBehaviorProfile(
+            int(store.cycle_length[i]), int(store.uptime_ticks[i]), int(store.offset[i])
         )
 
-        self.join_tick = None
-        self.hosted_chunks = set()
-        self.has_joined = False
-        self.last_bootstrap_tick = None
-        self.was_online_last_tick = False
+    @property
+    def cached_rng(self):
+        return self.store.node_rng(self.index)
 
-        self.force_offline_until = None
-        self.auth_secret = "default"
-        self.password_seed = "default"
-        self.timezone_offset = None  # Set in generator
-        self.files_uploaded = []
+    def daylight_draw(self, tick):
+        return self.store.daylight_draw(self.index, tick)
+
+    @property
+    def hosted_chunks(self):
+        return self.store.chunk_set(self.index)
+
+    @property
+    def files_uploaded(self):
+        return self.store.files_uploaded.setdefault(self.index, [])
 
     def __repr__(self):
         return (f"<SimNode id={self.id} "
@@ -53,16 +90,15 @@ class SimNode:
     def attempt_join(self, current_tick):
         self.nal.register_peer(self.id, self)
 
-        # Simulated network delay to join
-        announce_payload_kb = self.config.join_announcement_size_kb
-        upload_speed_kbps = self.upload_speed_mb_s * 1024
-        delay_ticks = announce_payload_kb / upload_speed_kbps
-
-        jitter = self.cached_rng.uniform(0, 0.25)
-        total_delay = delay_ticks + jitter
+        # The join delay jitter (uniform(0, 0.25) from the node's RNG) feeds
+        # nothing, but later daylight draws in reference mode follow it
+        self.store.skip_draw(self.index)
 
         # Previously: known_peers = self.nal.announce_self(...) — no longer needed
         self.join_tick = current_tick
         self.has_joined = True
 
-        print(f"[JOIN] {self.id} joined at tick {current_tick}")
+        events = self.store.events
+        if events.join:
+            events.emit(current_tick, "join", "join", node=self.id,
+                        message="[JOIN] {node} joined at tick {tick}")
@@ -0,0 +1,188 @@
+import importlib
+
+from config import SimulationConfig
+from sim_clock import SimClock
+from file_uploader import FileUploader
+from node_generator import generate_nodes
+from blackout_manager import BlackoutManager
+from file_downloader import FileDownloader
+from availability_engine import AvailabilityEngine
+from online_host_index import OnlineHostIndex
+from file_registry import FileRegistry
+from repair_scheduler import RepairScheduler
+from event_scheduler import EventScheduler
+from metrics_sink import MetricsSink
+from event_log import NO_EVENTS
+
+class Simulation:
+    """
+    One seeded simulation run: builds every component from a SimulationConfig
+    and drives them with the tick loop or the event engine. Every generator
+    comes from `config.child_rng`, so a seed always gives the same run.
+    """
+
+    ENGINES = ("tick", "event")
+    # Imported on first use: the loopback backend pulls in asyncio
+    BACKENDS = {
+        "memory": "network.memory_backend:InMemoryNetwork",
+        "loopback": "network.loopback_backend:LoopbackNetwork",
+    }
+
+    def __init__(self, config, engine="tick", availability_mode="vectorized", blackout=False, metrics_path=None,
+                 events=None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}; expected one of {self.ENGINES}")
+
+        backend = self.network_class(config.network_backend)
+
+        self.config = config
+        self.engine = engine
+        self.events = events if events is not None else NO_EVENTS
+        self.nal = backend(seed=config.seed, config=config)
+        self.clock = SimClock()
+
+        node_rng = config.child_rng("nodes")
+        self.nodes = generate_nodes(node_rng, config.total_nodes, config, self.nal)
+        self.nodes.events = self.events
+
+        # chunk_id → host ids; the manifest index fills it as chunks are placed
+        reverse_index = self.nal.manifest.chunk_hosts
+        self.host_index = OnlineHostIndex(self.nodes, extents=not self.nal.store_payloads)
+        self.registry = FileRegistry()
+        self.repair = (
+            RepairScheduler(config, self.nodes, self.nal, self.host_index, self.registry,
+                            config.child_rng("repair"), self.events)
+            if config.repair_enabled else None
+        )
+        file_rng = config.child_rng("file")
+        self.uploader = FileUploader(file_rng, config, self.nodes, self.nal, reverse_index,
+                                     self.host_index, self.registry, self.events, repair=self.repair)
+
+        self.downloader = FileDownloader(
+            config=config,
+            nodes=self.nodes,
+            nal=self.nal,
+            reverse_index=reverse_index,
+            rng=config.child_rng("downloader_rng"),
+            host_index=self.host_index,
+            registry=self.registry,
+            events=self.events
+        )
+
+        self.availability = AvailabilityEngine(config, self.nodes, mode=availability_mode)
+        self.blackout_manager = (
+            BlackoutManager(config, self.nodes, self.availability, self.events) if blackout else None
+        )
+
+        self.scheduler = None  # EventScheduler, once an event run has started
+        self.profiler = None   # TickProfiler, while one is attached
+        self.uploaded_files = []
+        # Sampled every log_interval ticks; streamed to metrics_path, or kept in memory
+        self.metrics = MetricsSink(metrics_path, config.log_interval, meta={"seed": config.seed})
+
+    @classmethod
+    def network_class(cls, backend):
+        """The network class for a `network_backend` name."""
+        path = cls.BACKENDS.get(backend)
+        if path is None:
+            raise ValueError(f"Unknown network backend {backend!r}; expected one of {tuple(cls.BACKENDS)}")
+        module, name = path.split(":")
+        return getattr(importlib.import_module(module), name)
+
+    @classmethod
+    def from_seed(cls, seed, overrides=None, **kwargs):
+        """Build a run for `seed`, with config attributes replaced by `overrides`."""
+        config = SimulationConfig(seed=seed).apply_overrides(overrides or {})
+        return cls(config, **kwargs)
+
+    def run(self, until=None):
+        """
+        Run up to tick `until` (default: the configured total_ticks). A run
+        can be paused and resumed, e.g. around a snapshot, without changing
+        its results.
+        """
+        config = self.config
+        until = config.total_ticks if until is None else min(until, config.total_ticks)
+
+        if self.engine == "event":
+            if self.scheduler is None:
+                for profile, weight in config.behavior_distribution.items():
+                    print(f"  - {profile:15s}: {weight*100:.1f}%")
+
+                self.scheduler = EventScheduler(config, self.nodes, self.availability, self.downloader,
+                                                self.uploader, self.host_index, self.nal, self.blackout_manager,
+                                                sample=self.sample, repair=self.repair)
+                self.scheduler.start(config.total_ticks)
+                if self.profiler is not None:
+                    self.profiler.attach_scheduler(self.scheduler)
+                self.uploaded_files = self.scheduler.uploaded_files
+
+            self.scheduler.advance(until)
+            self.clock.tick = max(self.clock.tick, until)
+        else:
+            while self.clock.tick < until:
+                self.step()
+
+        if self.clock.tick >= config.total_ticks:
+            self.metrics.flush()
+        return self.metrics
+
+    def step(self):
+        """Advance the tick loop by one tick."""
+        current_tick = self.clock.current()
+        self.downloader.tick(current_tick)
+
+        if current_tick == 0:
+            for profile, weight in self.config.behavior_distribution.items():
+                print(f"  - {profile:15s}: {weight*100:.1f}%")
+
+        if self.blackout_manager:
+            self.blackout_manager.apply_blackout(current_tick)
+
+        came_online, went_offline = self.availability.step(current_tick)
+        self.host_index.apply_transitions(came_online, went_offline)
+        self.nal.apply_transitions(self.nodes, came_online, went_offline)
+        if self.repair is not None:
+            self.repair.apply_transitions(came_online, went_offline)
+            if current_tick % self.repair.interval == 0:
+                self.repair.run(current_tick)
+
+        if current_tick % self.config.log_interval == 0:
+            self.sample(current_tick)
+        self.nal.config.current_tick = current_tick
+
+        new_files = self.uploader.tick(current_tick)
+        self.uploaded_files.extend(new_files)
+
+        self.clock.advance()
+
+    def sample(self, tick):
+        """Record the metrics row for `tick`; both engines call this on log ticks."""
+        nodes = self.nodes
+        count = len(nodes)
+        online = nodes.online[:count]
+        self.metrics.record(
+            tick,
+            self.availability.connected_count,
+            self.uploader.total_files_successful,
+            self.downloader.successful_downloads,
+            len(self.downloader.pending_downloads),
+            float(nodes.free_space_gb[:count][online].sum()),
+        )
+
+    def summary(self):
+        """Uploader, downloader and (when enabled) repair summary metrics for the ticks run so far."""
+        summary = {
+            "upload": self.uploader.summary(self.clock.tick),
+            "download": self.downloader.summary(self.clock.tick),
+        }
+        if self.repair is not None:
+            summary["repair"] = self.repair.summary(self.clock.tick)
+        return summary
+
+    def print_summary(self):
+        self.uploader.print_summary(self.clock.tick)
+        self.downloader.print_summary(self.clock.tick)
+        if self.repair is not None:
+            self.repair.print_summary(self.clock.tick)
+        self.nal.print_summary()
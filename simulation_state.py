@@ -0,0 +1,125 @@
+import os
+import json
+import mmap
+import pickle
+import shutil
+
+import numpy as np
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_ENTRIES = {"snapshot.json", "state.pkl", "arrays"}
+MIN_ARRAY_BYTES = 1024  # smaller arrays stay inline in the pickle
+
+class _SnapshotPickler(pickle.Pickler):
+    """Pickler that writes every sizeable NumPy array to its own .npy file."""
+
+    def __init__(self, file, array_dir):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.array_dir = array_dir
+        self.array_ids = {}  # id(array) -> file name, so shared arrays stay shared
+        self.arrays = []     # keeps saved arrays alive while their ids are in use
+
+    def persistent_id(self, obj):
+        if type(obj) not in (np.ndarray, np.memmap) or obj.dtype.hasobject or obj.nbytes < MIN_ARRAY_BYTES:
+            return None
+        # Only arrays that own their memory (or a loaded snapshot's mapping);
+        # views pickle inline, and their owners rebind them on load
+        if obj.base is not None and not isinstance(obj.base, mmap.mmap):
+            return None
+
+        name = self.array_ids.get(id(obj))
+        if name is None:
+            name = f"{len(self.array_ids)}.npy"
+            np.save(os.path.join(self.array_dir, name), obj, allow_pickle=False)
+            self.array_ids[id(obj)] = name
+            self.arrays.append(obj)
+        return ("ndarray", name)
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, array_dir, mmap_arrays):
+        super().__init__(file)
+        self.array_dir = array_dir
+        self.mmap_mode = "c" if mmap_arrays else None
+        self.arrays = {}  # file name -> loaded array
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != "ndarray":
+            raise pickle.UnpicklingError(f"Unknown snapshot reference {pid!r}")
+        array = self.arrays.get(name)
+        if array is None:
+            array = self.arrays[name] = np.load(os.path.join(self.array_dir, name), mmap_mode=self.mmap_mode)
+        return array
+
+
+def _check_replaceable(path):
+    """
+    Raise unless `path` is missing or a directory holding nothing but
+    snapshot files (a finished snapshot, or one a crashed save left behind),
+    the only things a save may overwrite.
+    """
+    if not os.path.lexists(path):
+        return
+    if os.path.islink(path) or not os.path.isdir(path):
+        raise FileExistsError(f"{path} exists and is not a snapshot directory")
+    if os.path.isfile(os.path.join(path, "snapshot.json")):
+        return
+    if not set(os.listdir(path)) <= SNAPSHOT_ENTRIES:
+        raise FileExistsError(f"{path} is not empty and holds no snapshot.json; refusing to replace it")
+
+def save_snapshot(sim, path):
+    """
+    Write the full state of `sim` (a Simulation) at its current tick to the
+    directory `path`, replacing any snapshot already there. Raises
+    FileExistsError if `path` holds anything other than a snapshot.
+
+    Layout: snapshot.json (format, seed, tick, engine), state.pkl (every
+    object, RNG state and table) and arrays/*.npy (the NodeStore columns and
+    other NumPy arrays, one raw file each).
+    """
+    tmp = f"{path.rstrip(os.sep)}.tmp"
+    _check_replaceable(path)
+    _check_replaceable(tmp)
+    shutil.rmtree(tmp, ignore_errors=True)
+    array_dir = os.path.join(tmp, "arrays")
+    os.makedirs(array_dir)
+
+    with open(os.path.join(tmp, "state.pkl"), "wb") as f:
+        pickler = _SnapshotPickler(f, array_dir)
+        pickler.dump(sim)
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "seed": sim.config.seed,
+        "tick": sim.clock.tick,
+        "engine": sim.engine,
+        "arrays": len(pickler.array_ids),
+    }
+    with open(os.path.join(tmp, "snapshot.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap in whole so a crash mid-save never leaves a half-written snapshot
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return meta
+
+def load_snapshot(path, mmap_arrays=True):
+    """
+    Rebuild the Simulation saved at `path`; `run()` on it continues exactly
+    where the saved run stopped. With `mmap_arrays` the NumPy arrays are
+    mapped copy-on-write instead of read, so forks of one snapshot start
+    instantly and share its pages until they write to them.
+    """
+    with open(os.path.join(path, "snapshot.json")) as f:
+        meta = json.load(f)
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {meta.get('format')!r} in {path}")
+
+    with open(os.path.join(path, "state.pkl"), "rb") as f:
+        return _SnapshotUnpickler(f, os.path.join(path, "arrays"), mmap_arrays).load()
+
+def read_snapshot_info(path):
+    """The snapshot.json metadata, without loading the state."""
+    with open(os.path.join(path, "snapshot.json")) as f:
+        return json.load(f)
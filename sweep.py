@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from config import SimulationConfig
+from batch_runner import run_seed, aggregate, parse_override
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+_code_version = None
+
+def code_version():
+    """Hash of every .py source file in the simulator, computed once per process."""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(SOURCE_DIR):
+            dirs[:] = sorted(d for d in dirs if d not in ("__pycache__", "logs") and not d.startswith("."))
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    digest.update(os.path.relpath(path, SOURCE_DIR).encode())
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+class ResultCache:
+    """
+    Content-addressed store of per-seed summary records, one JSON file per
+    run under `directory`. The key hashes the full resolved config settings,
+    the seed, the run options and the code version, so any change to one of
+    them is a miss rather than a stale hit.
+
+    Hits refresh the entry's mtime; `evict` drops entries older than
+    `max_age_s`, then the least recently used ones until the cache fits in
+    `max_bytes`.
+    """
+
+    def __init__(self, directory="logs/sweep_cache", max_bytes=256 * 1024 * 1024, max_age_s=30 * 86400):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(seed, overrides=None, **run_kwargs):
+        settings = SimulationConfig(seed=seed).apply_overrides(overrides or {}).settings()
+        # Storage layout and engine give the same summaries for a seed
+        settings.pop("chunk_storage", None)
+        run = {name: value for name, value in run_kwargs.items() if name != "engine"}
+        blob = json.dumps(
+            {"seed": seed, "settings": settings, "run": run, "code": code_version()},
+            sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return record
+
+    def put(self, key, record):
+        # Write-then-rename so a concurrent reader never sees half an entry
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp, path)
+
+    def evict(self, now=None):
+        """Apply the age and size limits; returns the number of entries removed."""
+        now = time.time() if now is None else now
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()  # oldest first
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = self.max_age_s is not None and now - mtime > self.max_age_s
+            oversize = self.max_bytes is not None and total > self.max_bytes
+            if not (expired or oversize):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def grid(space):
+    """Every combination of `space` ({setting: [values, ...]}), in a fixed order."""
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+def random_points(space, n, seed=0):
+    """
+    `n` points drawn from `space`. A list value is a set of choices; a
+    (low, high) tuple is a uniform range, integer when both ends are ints.
+    The same `seed` always draws the same points.
+    """
+    rng = random.Random(seed)
+    points = []
+    for _ in range(n):
+        point = {}
+        for name in sorted(space):
+            values = space[name]
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    point[name] = rng.randint(low, high)
+                else:
+                    point[name] = rng.uniform(low, high)
+            else:
+                point[name] = rng.choice(values)
+        points.append(point)
+    return points
+
+def run_sweep(points, seeds, cache=None, processes=None, **run_kwargs):
+    """
+    Run every (point, seed) pair not already in `cache` across a process
+    pool and return one result per point, in order:
+    {"params": point, "records": [...], "aggregate": {...}}.
+    """
+    seeds = list(seeds)
+    records = {}
+    missing = []
+    for p, point in enumerate(points):
+        for seed in seeds:
+            key = ResultCache.key(seed, point, **run_kwargs)
+            record = cache.get(key) if cache is not None else None
+            if record is None:
+                missing.append((p, seed, key))
+            else:
+                records[p, seed] = record
+
+    # Overlapping points share a key, so each distinct run happens once
+    unique = {}
+    for p, seed, key in missing:
+        unique.setdefault(key, (points[p], seed))
+
+    if unique:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {
+                key: pool.submit(run_seed, seed, point, **run_kwargs)
+                for key, (point, seed) in unique.items()
+            }
+            for key, future in futures.items():
+                record = future.result()
+                unique[key] = record
+                if cache is not None:
+                    cache.put(key, record)
+
+        for p, seed, key in missing:
+            records[p, seed] = unique[key]
+
+    if cache is not None:
+        cache.evict()
+
+    results = []
+    for p, point in enumerate(points):
+        point_records = [records[p, seed] for seed in seeds]
+        results.append({"params": point, "records": point_records, "aggregate": aggregate(point_records)})
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep SimulationConfig settings over many seeds.")
+    parser.add_argument("--param", dest="params", type=parse_override, action="append", default=[],
+                        metavar="KEY=[V1,V2,...]", help="values to sweep for a setting, e.g. replication_factor=[5,10]")
+    parser.add_argument("--range", dest="ranges", type=parse_override, action="append", default=[],
+                        metavar="KEY=[LOW,HIGH]", help="uniform range for a setting (random search only)")
+    parser.add_argument("--random", type=int, default=None, metavar="N",
+                        help="draw N random points instead of the full grid")
+    parser.add_argument("--search-seed", type=int, default=0, help="seed for --random point draws")
+    parser.add_argument("--seeds", type=int, default=4, help="simulation seeds per point")
+    parser.add_argument("--start-seed", type=int, default=1)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--engine", choices=("tick", "event"), default="event")
+    parser.add_argument("--blackout", action="store_true")
+    parser.add_argument("--cache-dir", default="logs/sweep_cache")
+    parser.add_argument("--max-cache-mb", type=float, default=256)
+    parser.add_argument("--max-cache-age-days", type=float, default=30)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print every point's records and aggregates as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    space = {}
+    for key, values in args.params:
+        space[key] = values if isinstance(values, list) else [values]
+    for key, bounds in args.ranges:
+        if not (isinstance(bounds, list) and len(bounds) == 2):
+            raise SystemExit(f"--range {key} needs [low,high]")
+        space[key] = tuple(bounds)
+
+    if args.random is not None:
+        points = random_points(space, args.random, args.search_seed)
+    elif args.ranges:
+        raise SystemExit("--range needs --random N")
+    else:
+        points = grid(space)
+
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_dir, int(args.max_cache_mb * 1024 * 1024),
+                            args.max_cache_age_days * 86400)
+
+    seeds = range(args.start_seed, args.start_seed + args.seeds)
+    results = run_sweep(points, seeds, cache, args.processes, engine=args.engine, blackout=args.blackout)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"\n[SWEEP] {len(points)} point(s) x {len(seeds)} seed(s)")
+    if cache is not None:
+        print(f"  Cache hits / misses : {cache.hits} / {cache.misses}")
+    for result in results:
+        stats = result["aggregate"]
+        print(f"\n  {result['params']}")
+        for key in ("upload_success_rate", "upload_data_uploaded_gb", "download_success_rate",
+                    "download_avg_download_time"):
+            s = stats[key]
+            print(f"    {key:28s}: {s['mean']:10.2f}  [{s['ci_low']:.2f}, {s['ci_high']:.2f}]")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import json
+import time
+import pstats
+import cProfile
+
+from event_scheduler import CHUNK_READY, DOWNLOAD, BLACKOUT, JOIN, REPAIR, SAMPLE, UPLOAD
+
+EVENT_PHASES = {
+    CHUNK_READY: "chunk_ready", DOWNLOAD: "download", BLACKOUT: "blackout",
+    JOIN: "join", REPAIR: "repair", SAMPLE: "sample", UPLOAD: "upload",
+}
+
+# (phase, Simulation attribute, method) for each top-level call in a tick-loop step
+TICK_PHASES = (
+    ("download", "downloader", "tick"),
+    ("blackout", "blackout_manager", "apply_blackout"),
+    ("availability", "availability", "step"),
+    ("host_index", "host_index", "apply_transitions"),
+    ("network", "nal", "apply_transitions"),
+    ("repair", "repair", "run"),
+    ("metrics", None, "sample"),
+    ("upload", "uploader", "tick"),
+)
+
+# Component methods counted and timed wherever they are called from
+CALLS = (
+    ("uploader", "upload"),
+    ("downloader", "visit"),
+    ("downloader", "complete_ready"),
+    ("availability", "sync"),
+    ("availability", "first_online"),
+)
+
+NAL_SKIP = {"print_summary", "storage_footprint", "transfer_stats", "close"}  # reporting and lifecycle, not traffic
+
+class LatencyHistogram:
+    """Power-of-two nanosecond buckets; bucket b holds durations in [2**(b-1), 2**b)."""
+
+    def __init__(self):
+        self.buckets = [0] * 64
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        self.buckets[min(int(ns).bit_length(), 63)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q):
+        """Upper bucket edge below which a fraction `q` of the samples fall, in ns."""
+        target = q * self.count
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(2 ** b, self.max_ns)
+        return self.max_ns
+
+    def export(self):
+        us = 1e-3
+        return {
+            "count": self.count,
+            "total_ms": self.total_ns * 1e-6,
+            "mean_us": self.total_ns / self.count * us if self.count else 0.0,
+            "p50_us": self.percentile(0.5) * us,
+            "p90_us": self.percentile(0.9) * us,
+            "p99_us": self.percentile(0.99) * us,
+            "max_us": self.max_ns * us,
+            "buckets_ns": {2 ** b: n for b, n in enumerate(self.buckets) if n},
+        }
+
+
+class TickProfiler:
+    """
+    Opt-in instrumentation for a Simulation.
+
+    `attach` wraps the per-tick phase calls, the component hot paths and every
+    public InMemoryNetwork method in timing shims on the instances; `detach`
+    removes them. Nothing is wrapped until then, so a run without a profiler
+    pays nothing.
+
+    Records, per phase, the wall time it took in each tick (a histogram over
+    ticks), call counts and latency histograms for NAL and component calls,
+    and working-set sizes on log ticks. `cprofile_window=(start, stop)` also
+    runs cProfile over ticks [start, stop).
+    """
+
+    def __init__(self, cprofile_window=None):
+        self.phases = {}       # phase -> LatencyHistogram of per-tick totals
+        self.calls = {}        # "component.method" -> LatencyHistogram per call
+        self.sizes = {}        # working set -> [(tick, size), ...]
+        self.tick_totals = {}  # phase -> ns spent in the current tick
+        self.current_tick = None
+        self.ticks = 0
+
+        self.cprofile_window = cprofile_window
+        self.cprofile = None
+        self.cprofile_stats = None
+
+        self.sim = None
+        self.wrapped = []  # (object, attribute) pairs to restore on detach
+        self.scheduler_handlers = None
+
+    # -- wiring --
+
+    def attach(self, sim):
+        self.sim = sim
+        sim.profiler = self
+
+        # The event engine's phases are its handlers; see attach_scheduler
+        if sim.engine == "tick":
+            for phase, component, method in TICK_PHASES:
+                obj = sim if component is None else getattr(sim, component)
+                if obj is not None:
+                    self._wrap(obj, method, self._phase_shim(phase, getattr(obj, method)))
+            self._wrap(sim, "step", self._step_shim(sim.step))
+
+        for component, method in CALLS:
+            obj = getattr(sim, component)
+            if obj is not None:
+                self._wrap(obj, method, self._call_shim(f"{component}.{method}", getattr(obj, method)))
+
+        nal = sim.nal
+        # dir() rather than vars() so a subclass backend keeps its inherited methods timed
+        for name in dir(type(nal)):
+            value = getattr(type(nal), name)
+            if callable(value) and not name.startswith("_") and name not in NAL_SKIP:
+                self._wrap(nal, name, self._call_shim(f"nal.{name}", getattr(nal, name)))
+
+        if sim.scheduler is not None:
+            self.attach_scheduler(sim.scheduler)
+        return self
+
+    def attach_scheduler(self, scheduler):
+        """Time event-engine handlers as phases; called once the scheduler exists."""
+        self.scheduler_handlers = (scheduler, dict(scheduler.handlers))
+        for phase, handler in scheduler.handlers.items():
+            scheduler.handlers[phase] = self._event_shim(EVENT_PHASES[phase], handler)
+
+    def detach(self):
+        """Remove every shim, e.g. before pickling the simulation."""
+        for obj, name in self.wrapped:
+            vars(obj).pop(name, None)  # falls back to the class method again
+        self.wrapped = []
+        if self.scheduler_handlers is not None:
+            scheduler, handlers = self.scheduler_handlers
+            scheduler.handlers.update(handlers)
+            self.scheduler_handlers = None
+        if self.sim is not None:
+            self.sim.profiler = None
+
+    def _wrap(self, obj, name, shim):
+        setattr(obj, name, shim)
+        self.wrapped.append((obj, name))
+
+    # -- shims --
+
+    def _phase_shim(self, phase, fn):
+        totals = self.tick_totals
+        clock = time.perf_counter_ns
+
+        def shim(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                totals[phase] = totals.get(phase, 0) + clock() - start
+
+        return shim
+
+    def _call_shim(self, name, fn):
+        histogram = self.calls.setdefault(name, LatencyHistogram())
+        clock = time.perf_counter_ns
+
+        def shim(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.add(clock() - start)
+
+        return shim
+
+    def _step_shim(self, step):
+        sim = self.sim
+
+        def shim():
+            self._begin_tick(sim.clock.tick)
+            step()
+            self._end_tick()
+
+        return shim
+
+    def _event_shim(self, phase, handler):
+        timed = self._phase_shim(phase, handler)
+
+        def shim(tick, payload):
+            if tick != self.current_tick:
+                if self.current_tick is not None:
+                    self._end_tick()
+                self._begin_tick(tick)
+            return timed(tick, payload)
+
+        return shim
+
+    # -- per tick --
+
+    def _begin_tick(self, tick):
+        self.current_tick = tick
+        window = self.cprofile_window
+        if self.cprofile is not None and tick >= window[1]:
+            self._stop_cprofile()  # the event engine can jump past the window's last tick
+        if window is not None and self.cprofile is None and window[0] <= tick < window[1]:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def _end_tick(self):
+        tick = self.current_tick
+        for phase, ns in self.tick_totals.items():
+            self.phases.setdefault(phase, LatencyHistogram()).add(ns)
+        self.tick_totals.clear()
+        self.ticks += 1
+
+        if tick % self.sim.config.log_interval == 0:
+            self._record_sizes(tick)
+
+        window = self.cprofile_window
+        if self.cprofile is not None and tick >= window[1] - 1:
+            self._stop_cprofile()
+
+    def _record_sizes(self, tick):
+        sim = self.sim
+        sizes = {
+            "pending_downloads": len(sim.downloader.pending_downloads),
+            "active_downloads": len(sim.downloader.active_downloads),
+            "reverse_index": len(sim.nal.manifest.chunk_hosts),
+            "eligible_peers": len(sim.nal.upload_pool),
+            "hosted_chunks": len(sim.host_index.holders),
+        }
+        if sim.scheduler is not None:
+            sizes["event_queue"] = len(sim.scheduler.queue)
+        for name, size in sizes.items():
+            self.sizes.setdefault(name, []).append((tick, size))
+
+    def _stop_cprofile(self):
+        self.cprofile.disable()
+        self.cprofile_stats = pstats.Stats(self.cprofile)
+        self.cprofile = None
+
+    def finish(self):
+        """Close the last open tick; call once the run is over."""
+        if self.current_tick is not None and self.tick_totals:
+            self._end_tick()
+        self.current_tick = None
+        if self.cprofile is not None:
+            self._stop_cprofile()
+
+    # -- reporting --
+
+    def export(self):
+        working_sets = {}
+        for name, series in self.sizes.items():
+            values = [size for _, size in series]
+            working_sets[name] = {
+                "max": max(values),
+                "mean": sum(values) / len(values),
+                "last": values[-1],
+                "series": series,
+            }
+        return {
+            "ticks": self.ticks,
+            "phases": {phase: h.export() for phase, h in self.phases.items()},
+            "calls": {name: h.export() for name, h in self.calls.items() if h.count},
+            "working_sets": working_sets,
+            "cprofile_window": self.cprofile_window,
+        }
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.export(), f, indent=2)
+        if self.cprofile_stats is not None:
+            self.cprofile_stats.dump_stats(path.rsplit(".", 1)[0] + ".pstats")
+
+    def print_summary(self, top=10):
+        print(f"\n[PROFILE] {self.ticks} ticks")
+        total = sum(h.total_ns for h in self.phases.values()) or 1
+        for phase, h in sorted(self.phases.items(), key=lambda item: -item[1].total_ns):
+            e = h.export()
+            print(f"  {phase:14s}: {e['total_ms']:10.1f} ms ({100 * h.total_ns / total:5.1f}%)  "
+                  f"per tick p50 {e['p50_us']:.0f} us, p99 {e['p99_us']:.0f} us, max {e['max_us']:.0f} us")
+
+        print(f"\n[PROFILE CALLS]")
+        busiest = sorted((item for item in self.calls.items() if item[1].count), key=lambda item: -item[1].total_ns)
+        for name, h in busiest[:top]:
+            e = h.export()
+            print(f"  {name:36s}: {h.count:10d} calls, {e['total_ms']:10.1f} ms, p99 {e['p99_us']:.1f} us")
+
+        print(f"\n[PROFILE WORKING SETS]")
+        for name, series in self.sizes.items():
+            values = [size for _, size in series]
+            print(f"  {name:20s}: max {max(values)}, last {values[-1]}")
+
+        if self.cprofile_stats is not None:
+            start, stop = self.cprofile_window
+            print(f"\n[CPROFILE] ticks {start}-{stop - 1}")
+            self.cprofile_stats.sort_stats("cumulative").print_stats(top)